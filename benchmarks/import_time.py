@@ -0,0 +1,55 @@
+"""
+Benchmark of the time taken to import the library and to create a client, each
+measured in fresh interpreters, along with the HTTP backends they load.
+
+    python -m benchmarks.import_time [--runs 10]
+
+Use `python -X importtime -c "import hubble_shuttle"` to break the time down by
+module.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+STATEMENTS = {
+    "exceptions": "import hubble_shuttle.exceptions",
+    "package": "import hubble_shuttle",
+    "client_class": "from hubble_shuttle import ShuttleAPI",
+    "client": "from hubble_shuttle import ShuttleAPI; ShuttleAPI(api_endpoint='http://localhost/')",
+}
+
+# Modules which should only be imported when the first request is sent
+BACKENDS = ["requests", "urllib3", "httpx", "h2"]
+
+MEASURE = """
+import json, sys, time
+start = time.perf_counter()
+exec({statement!r})
+seconds = time.perf_counter() - start
+print(json.dumps({{"ms": seconds * 1000, "backends": [name for name in {backends!r} if name in sys.modules]}}))
+"""
+
+def measure(statement, runs):
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", MEASURE.format(statement=statement, backends=BACKENDS)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output)
+        timings.append(result["ms"])
+    return {"median_ms": round(statistics.median(timings), 2), "backends": result["backends"]}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="Interpreters started per statement")
+    args = parser.parse_args()
+
+    for name, statement in STATEMENTS.items():
+        result = measure(statement, args.runs)
+        print("{:<14} {:>8.1f} ms   backends loaded: {}".format(name, result["median_ms"], ", ".join(result["backends"]) or "none"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Micro-benchmark of the per-request preparation done by the transport before
+sending a request: building the URL, and merging the headers and query
+parameters with the client-level ones.
+
+    python -m benchmarks.prepare_request
+"""
+import timeit
+
+from hubble_shuttle.http import RequestsShuttleTransport
+
+CASES = {
+    "defaults": lambda transport: (
+        transport._prepare_request_url("/users/123"),
+        transport._prepare_request_args(headers=None, query=None),
+    ),
+    "overrides": lambda transport: (
+        transport._prepare_request_url("/users/123"),
+        transport._prepare_request_args(headers={"X-Request-Id": "abc"}, query={"page": "2"}),
+    ),
+    "route": lambda transport: (
+        transport._prepare_request_url(transport._prepare_route("/users/{id}", {"id": 123})[0]),
+        transport._prepare_request_args(headers=None, query=None),
+    ),
+}
+
+def main(number=200000):
+    transport = RequestsShuttleTransport(
+        api_endpoint="https://api.example.com/v1",
+        headers={"Authorization": "Bearer token", "Accept": "application/json", "Accept-Language": "en-gb"},
+        query={"api_key": "key", "format": "json"},
+        request_content_type="application/json",
+    )
+    for name, case in CASES.items():
+        seconds = min(timeit.repeat(lambda: case(transport), number=number, repeat=5))
+        print("{:<10} {:>8.3f} us/request".format(name, seconds / number * 1e6))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Local HTTP/1.1 servers for the benchmarks, serving canned responses so that
+the measures only depend on the client:
+
+* `GET /small`: a small JSON object
+* `GET /large`: a multi-MB JSON array
+* `GET /gzip`: the large JSON array, gzip-encoded
+* `GET /error`: a 500 error with a JSON body
+* `GET /download`: 64MB of binary data, also served by byte ranges
+* `POST /echo`: a small JSON object, after reading the request body in chunks
+
+`ThreadedServer` uses a thread per connection, `AsyncioServer` a single event
+loop. Both run in a background thread and support keep-alive connections.
+"""
+import asyncio
+import gzip
+import json
+import re
+import threading
+
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def _json(data):
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+def _large_payload(size=4 * 1024 * 1024):
+    item = {"id": 0, "name": "Shuttle", "tags": ["benchmark", "json"], "price": 12.5, "available": True}
+    count = size // len(_json(item))
+    return _json([{**item, "id": index} for index in range(count)])
+
+def build_routes():
+    """
+    Returns the canned `(status, headers, body)` responses, by method and path.
+    """
+    small = _json({"id": 1, "name": "Shuttle", "tags": ["benchmark"]})
+    large = _large_payload()
+    download = bytes(range(256)) * (64 * 1024 * 1024 // 256)
+    return {
+        ("GET", "/small"): (200, {"Content-Type": "application/json"}, small),
+        ("GET", "/large"): (200, {"Content-Type": "application/json"}, large),
+        ("GET", "/gzip"): (200, {"Content-Type": "application/json", "Content-Encoding": "gzip"}, gzip.compress(large, 6)),
+        ("GET", "/error"): (500, {"Content-Type": "application/json"}, _json({"error": "Internal error"})),
+        ("GET", "/download"): (200, {"Content-Type": "application/octet-stream", "Accept-Ranges": "bytes", "ETag": '"download"'}, download),
+        ("POST", "/echo"): (200, {"Content-Type": "application/json"}, small),
+    }
+
+# Request bodies are read and dropped in chunks, so uploads don't use the memory of the server
+READ_CHUNK_SIZE = 64 * 1024
+
+NOT_FOUND = (404, {"Content-Type": "text/plain"}, b"Not found")
+
+RANGE = re.compile(r"bytes=(\d+)-(\d*)")
+
+def select_range(response, range_header):
+    """
+    Answers a `Range: bytes=<start>-<end>` request for a route supporting it with
+    a 206 response with that part of the body.
+    """
+    status, headers, body = response
+    match = RANGE.fullmatch(range_header or "")
+    if match is None or headers.get("Accept-Ranges") != "bytes":
+        return response
+    start = int(match.group(1))
+    end = min(int(match.group(2) or len(body) - 1), len(body) - 1)
+    headers = {**headers, "Content-Range": "bytes {}-{}/{}".format(start, end, len(body))}
+    return 206, headers, memoryview(body)[start:end + 1]
+
+class ThreadedServer:
+
+    def __init__(self, host="127.0.0.1", port=0):
+        routes = build_routes()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # The headers and the body are written separately
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                self._respond()
+
+            def do_POST(self):
+                remaining = int(self.headers.get("Content-Length", 0))
+                while remaining > 0:
+                    chunk = self.rfile.read(min(remaining, READ_CHUNK_SIZE))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                self._respond()
+
+            def _respond(self):
+                status, headers, body = select_range(
+                    routes.get((self.command, self.path.split("?", 1)[0]), NOT_FOUND),
+                    self.headers.get("Range"),
+                )
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}/".format(host, port)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+class AsyncioServer:
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self._routes = build_routes()
+        self._host = host
+        self._port = port
+        self._loop = asyncio.new_event_loop()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return "http://{}:{}/".format(host, port)
+
+    def __enter__(self):
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self._host, self._port, backlog=1024)
+        )
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._server.close()
+        self._loop.run_until_complete(self._server.wait_closed())
+        self._loop.close()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+
+                content_length = 0
+                keep_alive = True
+                range_header = None
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    name = name.strip().lower()
+                    if name == "content-length":
+                        content_length = int(value)
+                    elif name == "connection" and value.strip().lower() == "close":
+                        keep_alive = False
+                    elif name == "range":
+                        range_header = value.strip()
+                while content_length > 0:
+                    content_length -= len(await reader.readexactly(min(content_length, READ_CHUNK_SIZE)))
+
+                status, headers, body = select_range(self._routes.get((method, target.split("?", 1)[0]), NOT_FOUND), range_header)
+                head = ["HTTP/1.1 {} {}".format(status, HTTPStatus(status).phrase)]
+                head += ["{}: {}".format(name, value) for name, value in headers.items()]
+                head.append("Content-Length: {}".format(len(body)))
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+                writer.write(body)
+                await writer.drain()
+
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+SERVERS = {
+    "threaded": ThreadedServer,
+    "asyncio": AsyncioServer,
+}
@@ -0,0 +1,275 @@
+"""
+Benchmarks of the transport against a local HTTP/1.1 server, measuring the
+throughput, the latency percentiles, the memory allocated by the client and the
+peak RSS of `ShuttleAPI.http_get` and `http_post` in a few scenarios.
+
+Each scenario runs in a fresh process, so that the peak RSS is its own. The
+results can be saved as a JSON baseline, and compared with a previous baseline
+to detect regressions:
+
+    python -m benchmarks.transport --save baseline.json
+    python -m benchmarks.transport --compare baseline.json --tolerance 0.2
+
+Baselines are only comparable when recorded on the same machine.
+"""
+import argparse
+import asyncio
+import json
+import mmap
+import multiprocessing
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+
+from hubble_shuttle import AsyncShuttleAPI, ShuttleAPI
+from hubble_shuttle.bodies import MultipartEncoder, MultipartFile
+from hubble_shuttle.downloads import ShuttleDownload
+from hubble_shuttle.exceptions import HTTPServerError
+
+from .server import SERVERS
+
+class Scenario:
+
+    def __init__(self, method, path, requests, concurrency=1, data=None, upload_size=None, asynchronous=False):
+        self.method = method
+        self.path = path
+        self.requests = requests
+        # Number of requests running at the same time
+        self.concurrency = concurrency
+        self.data = data
+        # Size of a file uploaded as a multipart body instead of sending `data`
+        self.upload_size = upload_size
+        # Whether to use AsyncShuttleAPI instead of ShuttleAPI
+        self.asynchronous = asynchronous
+
+SCENARIOS = {
+    "small_json": Scenario("get", "/small", requests=2000),
+    "post_json": Scenario("post", "/echo", requests=2000, data={"id": 1, "name": "Shuttle"}),
+    "large_json": Scenario("get", "/large", requests=20),
+    "gzip": Scenario("get", "/gzip", requests=20),
+    "errors": Scenario("get", "/error", requests=2000),
+    "download": Scenario("download", "/download", requests=5),
+    "async_download": Scenario("download", "/download", requests=5, asynchronous=True),
+    "upload": Scenario("post", "/echo", requests=5, upload_size=256 * 1024 * 1024),
+    "async_upload": Scenario("post", "/echo", requests=5, upload_size=256 * 1024 * 1024, asynchronous=True),
+    "high_concurrency": Scenario("get", "/small", requests=2000, concurrency=64),
+    "async_high_concurrency": Scenario("get", "/small", requests=2000, concurrency=64, asynchronous=True),
+}
+
+# Metrics compared with the baseline, and whether higher values are better
+COMPARED_METRICS = {
+    "throughput": True,
+    "p95_ms": False,
+    "allocated_peak_kb": False,
+    "peak_rss_kb": False,
+}
+
+# Size of the body of the /download route of the servers
+DOWNLOAD_SIZE = 64 * 1024 * 1024
+
+# Requests sent before measuring, to open the connections
+WARMUP_REQUESTS = 10
+
+# Requests traced to measure the memory allocations, as tracing slows them down
+TRACED_REQUESTS = 10
+
+class BenchmarkClient(ShuttleAPI):
+    request_content_type = "application/json"
+    # Enough connections for the highest concurrency of the scenarios
+    pool_maxsize = 64
+
+class AsyncBenchmarkClient(AsyncShuttleAPI):
+    request_content_type = "application/json"
+    pool_maxsize = 64
+
+def run_scenario(name, api_endpoint):
+    """
+    Runs a scenario against the server, and returns its measures.
+    """
+    scenario = SCENARIOS[name]
+    run = _run_async if scenario.asynchronous else _run_sync
+
+    run(scenario, api_endpoint, WARMUP_REQUESTS)
+
+    start = time.perf_counter()
+    latencies = run(scenario, api_endpoint, scenario.requests)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    run(scenario, api_endpoint, TRACED_REQUESTS)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "requests": scenario.requests,
+        "concurrency": scenario.concurrency,
+        "seconds": seconds,
+        "throughput": scenario.requests / seconds,
+        "p50_ms": _percentile(latencies, 0.5) * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "allocated_peak_kb": traced_peak / 1024,
+        "peak_rss_kb": _peak_rss_kb(),
+    }
+
+@contextmanager
+def _request_kwargs(scenario):
+    if scenario.method == "download":
+        # Downloaded to anonymous memory, which isn't counted in the allocations of the client
+        with mmap.mmap(-1, DOWNLOAD_SIZE) as target:
+            yield {"target": target}
+        return
+
+    if scenario.upload_size is None:
+        yield {"data": scenario.data} if scenario.data is not None else {}
+        return
+
+    # A sparse file, so that creating it is quick
+    with tempfile.NamedTemporaryFile() as upload_file:
+        upload_file.truncate(scenario.upload_size)
+        yield {"data": MultipartEncoder({"file": MultipartFile(upload_file.name)})}
+
+def _run_sync(scenario, api_endpoint, requests):
+    with _request_kwargs(scenario) as kwargs:
+        return _run_sync_requests(scenario, api_endpoint, requests, kwargs)
+
+def _run_sync_requests(scenario, api_endpoint, requests, kwargs):
+    client = BenchmarkClient(api_endpoint=api_endpoint)
+    send = getattr(client, "http_{}".format(scenario.method))
+
+    def request(_):
+        start = time.perf_counter()
+        try:
+            _read(send(scenario.path, **kwargs))
+        except HTTPServerError as error:
+            error.response
+        return time.perf_counter() - start
+
+    with client:
+        if scenario.concurrency == 1:
+            return [request(index) for index in range(requests)]
+        with ThreadPoolExecutor(max_workers=scenario.concurrency) as executor:
+            return list(executor.map(request, range(requests)))
+
+def _run_async(scenario, api_endpoint, requests):
+    async def run(kwargs):
+        semaphore = asyncio.Semaphore(scenario.concurrency)
+
+        async with AsyncBenchmarkClient(api_endpoint=api_endpoint) as client:
+            send = getattr(client, "http_{}".format(scenario.method))
+
+            async def request():
+                async with semaphore:
+                    start = time.perf_counter()
+                    try:
+                        _read(await send(scenario.path, **kwargs))
+                    except HTTPServerError as error:
+                        error.response
+                    return time.perf_counter() - start
+
+            return list(await asyncio.gather(*[request() for _ in range(requests)]))
+
+    with _request_kwargs(scenario) as kwargs:
+        return asyncio.run(run(kwargs))
+
+def _peak_rss_kb():
+    # On Linux, ru_maxrss is kept across the exec starting the scenario process, so
+    # it would be the RSS of the parent process if higher
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # Kilobytes on Linux, bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def _read(response):
+    # Responses are parsed when their data is first accessed
+    if not isinstance(response, ShuttleDownload):
+        response.data
+
+def _percentile(sorted_values, quantile):
+    return sorted_values[min(int(quantile * len(sorted_values)), len(sorted_values) - 1)]
+
+def run_benchmarks(server="threaded", scenarios=None):
+    """
+    Runs the scenarios against a local server, each in a fresh process.
+    """
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    with SERVERS[server]() as local_server:
+        for name in scenarios or SCENARIOS:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                results[name] = executor.submit(run_scenario, name, local_server.url).result()
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "server": server,
+        "scenarios": results,
+    }
+
+def compare(baseline, results, tolerance=0.2):
+    """
+    Returns the regressions of the results compared to the baseline: the metrics
+    worse by more than `tolerance` (a fraction of the baseline value).
+    """
+    regressions = []
+    for name, measures in results["scenarios"].items():
+        baseline_measures = baseline["scenarios"].get(name)
+        if baseline_measures is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            expected, actual = baseline_measures.get(metric), measures.get(metric)
+            if not expected or actual is None:
+                continue
+            change = (actual - expected) / expected
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append("{} {}: {:.2f} -> {:.2f} ({:+.0%})".format(name, metric, expected, actual, change))
+    return regressions
+
+def print_results(results):
+    print("{:<24} {:>10} {:>9} {:>9} {:>9} {:>12} {:>12}".format(
+        "scenario", "req/s", "p50 ms", "p95 ms", "p99 ms", "alloc peak KB", "peak RSS KB",
+    ))
+    for name, measures in results["scenarios"].items():
+        print("{:<24} {:>10.0f} {:>9.2f} {:>9.2f} {:>9.2f} {:>12.1f} {:>12}".format(
+            name, measures["throughput"], measures["p50_ms"], measures["p95_ms"], measures["p99_ms"],
+            measures["allocated_peak_kb"], measures["peak_rss_kb"],
+        ))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the Shuttle transport against a local server")
+    parser.add_argument("--server", choices=sorted(SERVERS), default="threaded")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Scenario to run, all by default")
+    parser.add_argument("--save", metavar="PATH", help="Save the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Fail if the results regressed from a JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression, as a fraction of the baseline")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.server, args.scenario)
+    print_results(results)
+
+    if args.save:
+        with open(args.save, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(json.load(baseline_file), results, args.tolerance)
+        for regression in regressions:
+            print("Regression: {}".format(regression))
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,16 @@
+import importlib
 
-from .api import ShuttleAPI
+__all__ = ["ShuttleAPI", "AsyncShuttleAPI"]
 
+def __getattr__(name):
+    # The clients, and the HTTP stack behind them, are imported on first use, so
+    # that importing a submodule such as `hubble_shuttle.exceptions` stays cheap
+    if name in __all__:
+        from . import api
+        return getattr(api, name)
+    try:
+        return importlib.import_module("." + name, __name__)
+    except ModuleNotFoundError as error:
+        if error.name != __name__ + "." + name:
+            raise
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name)) from None
@@ -1,5 +1,17 @@
 
-from .http import RequestsShuttleTransport
+import asyncio
+import contextvars
+import inspect
+
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from .async_http import HTTPXAsyncShuttleTransport
+from .deadline import deadline, time_remaining
+from .downloads import DEFAULT_PART_SIZE, RangedDownload, download_target
+from .exceptions import APIError, DeadlineExceededError, HTTPClientError
+from .http import RequestDefaults, RequestsShuttleTransport
+from .pagination import LinkHeaderPagination
+from .registry import TRANSPORTS, TransportOverlay, settings_key
 
 class ShuttleAPI:
 
@@ -9,8 +21,85 @@ class ShuttleAPI:
     headers = {}
     query = {}
     request_content_type = "application/x-www-form-urlencoded"
+    # Content encoding of large JSON request bodies (`gzip`, `deflate`, `br` or `zstd`),
+    # None to send them uncompressed, and the minimum size in bytes of compressed bodies
+    request_compression = None
+    request_compression_threshold = 1024
+    # Response encodings accepted, in order of preference, e.g. `["zstd", "br", "gzip"]`.
+    # Encodings the transport can't decode are ignored. None for the transport defaults.
+    response_encodings = None
     locale = None
 
+    # Connection pool settings for the transport
+    pool_connections = 10
+    pool_maxsize = 10
+    pool_keepalive_timeout = None
+
+    # Whether the instances of the client share a process-wide transport and its
+    # connection pool (see hubble_shuttle.registry). Instances with their own
+    # headers, query parameters or locale send them over the shared transport.
+    share_transport = True
+
+    # Optional hubble_shuttle.cache.ResponseCache used for GET requests. Set at the
+    # class level, the cache is shared by all the instances of the client.
+    response_cache = None
+
+    # Whether identical concurrent GET requests (same URL, query and headers) are
+    # only sent once, with all the callers sharing the same response or error
+    coalesce_requests = False
+
+    # Codec used to encode and decode JSON bodies (see hubble_shuttle.json_codecs).
+    # By default, uses the standard library; set OrjsonJSONCodec() for large payloads.
+    json_codec = None
+
+    # Response body decoders, `decoder(content, media_type)`, by media type such as
+    # `application/xml` or by subtype suffix such as `+xml` (see hubble_shuttle.content_types).
+    # They take precedence over the built-in JSON and text decoders.
+    decoders = {}
+
+    # Error classes by HTTP status code, or range of status codes, taking precedence
+    # over the ones of hubble_shuttle.exceptions, e.g. `{429: TooManyRequestsError}`
+    status_errors = {}
+
+    # Optional hubble_shuttle.retry.RetryPolicy, to retry requests on transient failures
+    retry_policy = None
+
+    # Optional hubble_shuttle.rate_limit.RateLimiter. Set at the class level, the
+    # buckets are shared by all the instances of the client.
+    rate_limiter = None
+
+    # Instrumentation hooks (see hubble_shuttle.instrumentation) notified of each
+    # request sent by the client, for example a LatencyHistograms aggregator
+    instrumentation = ()
+
+    # Default timeouts in seconds for connecting and for reading the response, None
+    # to wait forever. Requests can also override them with the `timeout` argument.
+    connect_timeout = None
+    read_timeout = None
+
+    # Request header sending the number of milliseconds left before the current
+    # deadline (see hubble_shuttle.deadline) to the service, if set
+    deadline_header = None
+
+    # Optional hubble_shuttle.circuit_breaker.CircuitBreaker. Set at the class level,
+    # the state of the circuit is shared by all the instances of the client.
+    circuit_breaker = None
+
+    # Default pagination strategy for `http_paginate` (see hubble_shuttle.pagination)
+    pagination = LinkHeaderPagination()
+
+    # Maximum number of requests running at the same time in `http_batch`
+    batch_concurrency = 10
+
+    # Size in bytes of the ranges `http_download` splits downloads into, and number
+    # of ranges downloaded at the same time
+    download_part_size = DEFAULT_PART_SIZE
+    download_concurrency = 4
+
+    # Number of attempts at downloading each range, each resuming where the
+    # previous one was interrupted
+    download_part_attempts = 3
+
     def __init__(self, **kwargs):
         if "api_endpoint" in kwargs:
             self.api_endpoint = kwargs["api_endpoint"]
@@ -23,20 +112,109 @@ class ShuttleAPI:
         if "locale" in kwargs:
             self.locale = kwargs["locale"]
 
+        self.http = None
+        if self.share_transport:
+            self.http = self._shared_transport()
+        # Instances with settings the shared transports can't be keyed on have their own
+        self._owns_transport = self.http is None
+        if self._owns_transport:
+            self.http = self._create_transport(self._default_headers(self.headers, self.locale), self.query)
+
+    def _shared_transport(self):
+        client_class = type(self)
+        # The shared transport carries the defaults set on the class, so it is replaced
+        # when they changed since it was created. Headers, query parameters or locale
+        # computed by properties are sent by the overlay of each instance instead.
+        class_headers = self._class_setting("headers", {})
+        class_query = self._class_setting("query", {})
+        class_locale = self._class_setting("locale", None)
+        settings = self._transport_settings(
+            self._default_headers(class_headers, class_locale),
+            dict(class_query),
+        )
+        # Other settings set on the instance, or computed by properties, select the
+        # transport, so that instances overriding them don't replace the one of the class
+        try:
+            overrides = tuple(
+                (name, settings_key(value))
+                for name, value in settings.items()
+                if name not in self._transport_key_settings and self._overrides_setting(name)
+            )
+            hash(overrides)
+        except TypeError:
+            return None
+        transport = TRANSPORTS.get(
+            client_class,
+            (self.transport, self.api_endpoint, self.request_content_type, overrides),
+            lambda: self.transport(**settings),
+            settings,
+        )
+
+        if self.headers is class_headers and self.query is class_query and self.locale == class_locale:
+            return transport
+        return TransportOverlay(transport, RequestDefaults(self._default_headers(self.headers, self.locale), self.query))
+
+    # Settings already part of the key of the shared transports, or sent by their overlay
+    _transport_key_settings = ("api_endpoint", "headers", "query", "request_content_type", "service_name")
+
+    def _class_setting(self, name, default):
+        # The value set on the class, or the default if it is computed by a property
+        value = inspect.getattr_static(type(self), name)
+        return default if hasattr(type(value), "__get__") else value
+
+    def _overrides_setting(self, name):
+        return name in vars(self) or hasattr(type(inspect.getattr_static(type(self), name)), "__get__")
+
+    def _default_headers(self, headers, locale):
         # Create a copy of the headers to avoid modifying the original
         headers = {
-            **self.headers,
+            **headers,
         }
-        if self.locale is not None:
-            headers["Accept-Language"] = self.locale
-
-        self.http = self.transport(
-            api_endpoint = self.api_endpoint,
-            headers = headers,
-            query = self.query,
-            request_content_type = self.request_content_type,
-            service_name = type(self).__name__,
-        )
+        if locale is not None:
+            headers["Accept-Language"] = locale
+        return headers
+
+    def _create_transport(self, headers, query):
+        return self.transport(**self._transport_settings(headers, query))
+
+    def _transport_settings(self, headers, query):
+        return {
+            "api_endpoint": self.api_endpoint,
+            "headers": headers,
+            "query": query,
+            "request_content_type": self.request_content_type,
+            "request_compression": self.request_compression,
+            "request_compression_threshold": self.request_compression_threshold,
+            "response_encodings": self.response_encodings,
+            "service_name": type(self).__name__,
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "pool_keepalive_timeout": self.pool_keepalive_timeout,
+            "response_cache": self.response_cache,
+            "coalesce_requests": self.coalesce_requests,
+            "json_codec": self.json_codec,
+            "decoders": self.decoders,
+            "status_errors": self.status_errors,
+            "retry_policy": self.retry_policy,
+            "circuit_breaker": self.circuit_breaker,
+            "rate_limiter": self.rate_limiter,
+            "instrumentation": self.instrumentation,
+            "connect_timeout": self.connect_timeout,
+            "read_timeout": self.read_timeout,
+            "deadline_header": self.deadline_header,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        # Shared transports keep their connections for the other instances of the
+        # client, until hubble_shuttle.registry.close_transports() is called
+        if self._owns_transport:
+            self.http.close()
 
     def http_get(self, url, **kwargs):
         return self.http.get(url, **kwargs)
@@ -53,3 +231,354 @@ class ShuttleAPI:
     def http_delete(self, url, **kwargs):
         return self.http.delete(url, **kwargs)
 
+    def http_batch(self, requests, concurrency=None, timeout=None):
+        """
+        Runs independent requests concurrently, and returns their results in order.
+
+        Each request is either a URL to GET, or a dict with the `url`, the `method`
+        (`get` by default) and any other argument of the matching `http_X` method.
+        Each result is either a response, or the `APIError` raised by the request.
+        The requests run within a `timeout` seconds deadline, and the result of
+        requests still running when it expires is a `DeadlineExceededError`.
+        """
+        specs = self._batch_specs(requests)
+        if not specs:
+            return []
+
+        executor = ThreadPoolExecutor(max_workers=min(concurrency or self.batch_concurrency, len(specs)))
+        try:
+            with deadline(timeout):
+                # Run each request in a copy of the context, to propagate the deadline
+                futures = [
+                    executor.submit(contextvars.copy_context().run, getattr(self, "http_{}".format(method)), url, **kwargs)
+                    for method, url, kwargs in specs
+                ]
+                wait(futures, timeout=self._batch_wait_timeout())
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        results = []
+        for (method, url, kwargs), future in zip(specs, futures):
+            # Requests still queued when the timeout expired were cancelled by the shutdown
+            if not future.done() or future.cancelled():
+                future.cancel()
+                results.append(self._batch_timeout_error(url))
+            elif isinstance(future.exception(), APIError):
+                results.append(future.exception())
+            else:
+                results.append(future.result())
+        return results
+
+    def http_paginate(self, url, pagination=None, prefetch=False, **kwargs):
+        """
+        Yields the items of all the pages of a list endpoint, fetching pages as
+        they are needed, using the `pagination` strategy (defaults to the
+        `pagination` class attribute). Other arguments are passed to `http_get`.
+
+        With `prefetch`, the next page is requested in the background while the
+        items of the current page are consumed.
+        """
+        pagination = pagination or self.pagination
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+
+        try:
+            request = pagination.first_request(url, kwargs)
+            response = self.http_get(request[0], **request[1])
+            while True:
+                next_request = pagination.next_request(response, request)
+                if next_request is not None and executor is not None:
+                    next_response = executor.submit(
+                        contextvars.copy_context().run, self.http_get, next_request[0], **next_request[1]
+                    )
+
+                yield from pagination.items(response)
+
+                if next_request is None:
+                    return
+                if executor is not None:
+                    response = next_response.result()
+                else:
+                    response = self.http_get(next_request[0], **next_request[1])
+                request = next_request
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def http_download(self, url, target, headers=None, part_size=None, concurrency=None, **kwargs):
+        """
+        Downloads the body of a GET request to `target`: a path, a binary file
+        object, or a writable buffer such as a `mmap`, which the body is read into
+        without being copied. Other arguments are passed to `http_get`.
+
+        When the server supports range requests, the body is split into
+        `part_size` byte ranges, downloaded `concurrency` at a time over the
+        pooled connections, and ranges interrupted by a networking error are
+        resumed where they stopped. Returns a ShuttleDownload.
+        """
+        concurrency = concurrency or self.download_concurrency
+
+        with download_target(target) as target:
+            download = RangedDownload(self.http.service_name, url, target, headers, part_size or self.download_part_size, self.download_part_attempts)
+            try:
+                response = self.http_get(url, stream=True, headers=download.first_request_headers(), **kwargs)
+            except HTTPClientError as error:
+                result = download.empty(error)
+                if result is None:
+                    raise
+                return result
+
+            try:
+                ranges = download.ranges(response)
+            except ValueError:
+                # The download doesn't fit in the target
+                response.close()
+                raise
+            if ranges is None:
+                return self._download_body(url, download, response, kwargs)
+
+            executor = ThreadPoolExecutor(max_workers=min(concurrency - 1, len(ranges) - 1)) if len(ranges) > 1 and concurrency > 1 else None
+            try:
+                futures = [
+                    executor.submit(contextvars.copy_context().run, self._download_range, url, part, None, kwargs)
+                    for part in ranges[1:]
+                ] if executor is not None else []
+
+                # The first range is read from the response which sized the download
+                self._download_range(url, ranges[0], response, kwargs)
+                if executor is None:
+                    for part in ranges[1:]:
+                        self._download_range(url, part, None, kwargs)
+                for future in futures:
+                    future.result()
+            finally:
+                if executor is not None:
+                    executor.shutdown(wait=True, cancel_futures=True)
+
+            return download.result(response, ranges)
+
+    def _download_body(self, url, download, response, kwargs):
+        if response.status_code == 206:
+            # The size of the download is needed to split it
+            response.close()
+            response = self.http_get(url, stream=True, headers=download.headers, **kwargs)
+
+        with response:
+            part = download.body(response)
+            self._read_range(part, response)
+        part.check_complete()
+        return download.result(response, [part])
+
+    def _download_range(self, url, part, response, kwargs):
+        attempts = 1
+        while True:
+            try:
+                if response is None:
+                    response = self.http_get(url, stream=True, headers=part.request_headers(), **kwargs)
+                with response:
+                    part.check(response)
+                    self._read_range(part, response)
+                part.check_complete()
+                return
+            except APIError as error:
+                if not part.download.can_resume(error, attempts):
+                    raise
+                attempts += 1
+                response = None
+
+    def _read_range(self, part, response):
+        buffer = part.buffer()
+        while buffer is not None:
+            read = response.readinto(buffer)
+            if not read:
+                return
+            part.advance(buffer, read)
+            buffer = part.buffer()
+
+    def _batch_specs(self, requests):
+        return [self._batch_spec(request) for request in requests]
+
+    def _batch_spec(self, request):
+        if isinstance(request, str):
+            return "get", request, {}
+
+        kwargs = dict(request)
+        method = kwargs.pop("method", "get").lower()
+        url = kwargs.pop("url")
+        return method, url, kwargs
+
+    def _batch_wait_timeout(self):
+        remaining = time_remaining()
+        return None if remaining is None else max(remaining, 0)
+
+    def _batch_timeout_error(self, url):
+        return DeadlineExceededError(self.http.service_name, url, TimeoutError("Batch timeout exceeded"))
+
+class AsyncShuttleAPI(ShuttleAPI):
+    """
+    asyncio flavour of ShuttleAPI, where the `http_X` methods are coroutines.
+    """
+
+    transport = HTTPXAsyncShuttleTransport
+
+    # httpx connection pools are bound to the event loop they were used in, and
+    # closed by `async with`, so each instance has its own transport
+    share_transport = False
+
+    def __enter__(self):
+        raise TypeError("AsyncShuttleAPI must be used with 'async with'")
+
+    def __exit__(self, *args):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        await self.http.close()
+
+    async def http_get(self, url, **kwargs):
+        return await self.http.get(url, **kwargs)
+
+    async def http_post(self, url, **kwargs):
+        return await self.http.post(url, **kwargs)
+
+    async def http_put(self, url, **kwargs):
+        return await self.http.put(url, **kwargs)
+
+    async def http_patch(self, url, **kwargs):
+        return await self.http.patch(url, **kwargs)
+
+    async def http_delete(self, url, **kwargs):
+        return await self.http.delete(url, **kwargs)
+
+    async def http_paginate(self, url, pagination=None, prefetch=False, **kwargs):
+        pagination = pagination or self.pagination
+        next_response = None
+
+        try:
+            request = pagination.first_request(url, kwargs)
+            response = await self.http_get(request[0], **request[1])
+            while True:
+                next_request = pagination.next_request(response, request)
+                if next_request is not None and prefetch:
+                    next_response = asyncio.ensure_future(self.http_get(next_request[0], **next_request[1]))
+
+                for item in pagination.items(response):
+                    yield item
+
+                if next_request is None:
+                    return
+                if next_response is not None:
+                    response = await next_response
+                    next_response = None
+                else:
+                    response = await self.http_get(next_request[0], **next_request[1])
+                request = next_request
+        finally:
+            if next_response is not None:
+                next_response.cancel()
+
+    async def http_download(self, url, target, headers=None, part_size=None, concurrency=None, **kwargs):
+        concurrency = concurrency or self.download_concurrency
+
+        with download_target(target) as target:
+            download = RangedDownload(self.http.service_name, url, target, headers, part_size or self.download_part_size, self.download_part_attempts)
+            try:
+                response = await self.http_get(url, stream=True, headers=download.first_request_headers(), **kwargs)
+            except HTTPClientError as error:
+                result = download.empty(error)
+                if result is None:
+                    raise
+                return result
+
+            try:
+                ranges = download.ranges(response)
+            except ValueError:
+                await response.close()
+                raise
+            if ranges is None:
+                return await self._download_body(url, download, response, kwargs)
+
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def download_range(part, response=None):
+                async with semaphore:
+                    await self._download_range(url, part, response, kwargs)
+
+            # The first range is read from the response which sized the download
+            tasks = [asyncio.ensure_future(download_range(ranges[0], response))]
+            tasks += [asyncio.ensure_future(download_range(part)) for part in ranges[1:]]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+            return download.result(response, ranges)
+
+    async def _download_body(self, url, download, response, kwargs):
+        if response.status_code == 206:
+            await response.close()
+            response = await self.http_get(url, stream=True, headers=download.headers, **kwargs)
+
+        async with response:
+            part = download.body(response)
+            await self._read_range(part, response)
+        part.check_complete()
+        return download.result(response, [part])
+
+    async def _download_range(self, url, part, response, kwargs):
+        attempts = 1
+        while True:
+            try:
+                if response is None:
+                    response = await self.http_get(url, stream=True, headers=part.request_headers(), **kwargs)
+                async with response:
+                    part.check(response)
+                    await self._read_range(part, response)
+                part.check_complete()
+                return
+            except APIError as error:
+                if not part.download.can_resume(error, attempts):
+                    raise
+                attempts += 1
+                response = None
+
+    async def _read_range(self, part, response):
+        buffer = part.buffer()
+        while buffer is not None:
+            read = await response.readinto(buffer)
+            if not read:
+                return
+            part.advance(buffer, read)
+            buffer = part.buffer()
+
+    async def http_batch(self, requests, concurrency=None, timeout=None):
+        specs = self._batch_specs(requests)
+        if not specs:
+            return []
+
+        semaphore = asyncio.Semaphore(concurrency or self.batch_concurrency)
+
+        async def run(method, url, kwargs):
+            async with semaphore:
+                return await getattr(self, "http_{}".format(method))(url, **kwargs)
+
+        # Tasks run in a copy of the current context, including the deadline
+        with deadline(timeout):
+            tasks = [asyncio.ensure_future(run(*spec)) for spec in specs]
+            await asyncio.wait(tasks, timeout=self._batch_wait_timeout())
+
+        results = []
+        for (method, url, kwargs), task in zip(specs, tasks):
+            if not task.done():
+                task.cancel()
+                results.append(self._batch_timeout_error(url))
+            elif isinstance(task.exception(), APIError):
+                results.append(task.exception())
+            else:
+                results.append(task.result())
+        return results
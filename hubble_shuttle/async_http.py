@@ -0,0 +1,322 @@
+import time
+
+from collections.abc import AsyncIterable
+from functools import partial
+
+
+from .bodies import AsyncBody, BufferBody, body_length
+from .cache import cache_key
+from .compression import is_available
+from .exceptions import *
+from .http import ShuttleHeaders, ShuttleTransport
+from .instrumentation import CURRENT_EVENT, instrument_async
+from .singleflight import AsyncSingleFlight
+from .streaming import AsyncShuttleStreamingResponse
+
+# httpx is slow to import, so it is only imported when the first transport using it is created
+httpx = None
+
+def import_httpx():
+    """
+    Imports httpx, returning None if it isn't installed.
+    """
+    global httpx
+    if httpx is None:
+        try:
+            import httpx
+        except ImportError:
+            return None
+    return httpx
+
+# GET requests currently running in the process, when coalescing requests
+IN_FLIGHT_REQUESTS = AsyncSingleFlight()
+
+# Phases of the request timings, by httpcore trace step
+TRACE_PHASES = {
+    "connect_tcp": "connect",
+    "start_tls": "tls",
+    "receive_response_headers": "ttfb",
+    "receive_response_body": "download",
+}
+
+class HTTPXTransportMixin:
+    """
+    Request arguments, connection pool settings and error mapping shared by the
+    transports using httpx.
+    """
+
+    def _prepare_request_args(self, url=None, **kwargs):
+        request_args = super()._prepare_request_args(url, **kwargs)
+
+        # httpx expects encoded bodies as `content`, and only form data as `data`
+        if isinstance(request_args.get("data"), bytes):
+            request_args["content"] = request_args.pop("data")
+
+        return request_args
+
+    def _with_query(self, request_url, request_args):
+        """
+        Returns the URL of the request with its query parameters merged into it,
+        and the arguments without them. httpx would replace the query string of the
+        URL with `params`, while requests appends them to it.
+        """
+        params = request_args.get("params")
+        if not params:
+            return request_url, request_args
+        request_args = {name: value for name, value in request_args.items() if name != "params"}
+        return httpx.URL(request_url).copy_merge_params(params), request_args
+
+    def _prepare_request_body(self, body, content_type, headers):
+        request_args = super()._prepare_request_body(body, content_type, headers)
+        body = request_args.pop("data")
+        if not isinstance(body, bytes):
+            # httpx doesn't send the length of iterables, and would send buffers byte by byte
+            length = body_length(body)
+            if length is not None:
+                request_args["headers"] = {**request_args["headers"], "Content-Length": str(length)}
+            if isinstance(body, memoryview):
+                body = BufferBody(body)
+        request_args["content"] = body
+        return request_args
+
+    def _trace_recorder(self, event):
+        """
+        Returns a function recording the timings of the request in the event,
+        from the steps traced by httpcore.
+        """
+        started = {}
+
+        def record(name, info):
+            step, _, state = name.rpartition(".")
+            phase = TRACE_PHASES.get(step.rpartition(".")[2])
+            if phase is None:
+                return
+            if state == "started":
+                started[phase] = time.perf_counter()
+            elif phase in started:
+                event.timings[phase] = event.timings.get(phase, 0) + time.perf_counter() - started.pop(phase)
+
+        return record
+
+    def _timeout_arg(self, connect_timeout, read_timeout):
+        # httpx also applies the read timeout to writes and to waiting for a pooled connection
+        return httpx.Timeout(read_timeout, connect=connect_timeout)
+
+    def _client_options(self):
+        # httpx limits are global to the client rather than per host, so size the
+        # pool to hold `pool_maxsize` connections for each of the `pool_connections` hosts.
+        max_connections = self.pool_connections * self.pool_maxsize
+        headers = {}
+        if self.response_encodings is not None:
+            headers["Accept-Encoding"] = self._accept_encoding()
+
+        return {
+            "headers": headers,
+            "limits": httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=self.pool_keepalive_timeout,
+            ),
+            # Match requests' behaviour: follow redirects and never time out by default
+            "follow_redirects": True,
+            "timeout": None,
+        }
+
+    def _supported_response_encodings(self):
+        # httpx decodes `br` and `zstd` with the same optional libraries as the request compression
+        return [encoding for encoding in ("identity", "gzip", "deflate", "br", "zstd") if is_available(encoding)]
+
+    def _raise_for_status(self, url, response):
+        if not response.is_error:
+            return
+
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as error:
+            error_class = self._map_http_error_class(error)
+            raise error_class(self.service_name, url, error, self._parse_response(url, response))
+
+class HTTPXAsyncShuttleTransport(HTTPXTransportMixin, ShuttleTransport):
+    """
+    Asynchronous transport using a shared `httpx.AsyncClient` connection pool.
+    Requires the `async` extra: `pip install hubble_shuttle[async]`.
+    """
+
+    def __init__(self, **kwargs):
+        if import_httpx() is None:
+            raise ImportError("HTTPXAsyncShuttleTransport requires httpx: pip install hubble_shuttle[async]")
+
+        super().__init__(**kwargs)
+
+        self._client = None
+
+    def _prepare_request_body(self, body, content_type, headers):
+        request_args = super()._prepare_request_body(body, content_type, headers)
+        if not isinstance(request_args["content"], (bytes, AsyncIterable)):
+            request_args["content"] = AsyncBody(request_args["content"])
+        return request_args
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _http_request(self, method, url, stream=False, timeout=None, path_params=None, **kwargs):
+        url, route = self._prepare_route(url, path_params)
+        request_url = self._prepare_request_url(url)
+        request_args = self._prepare_request_args(url, **kwargs)
+
+        send = partial(self._dispatch_request, method, url, request_url, request_args, stream, timeout)
+        if self.instrumentation:
+            send = partial(self._instrumented, method, url, route, request_args, send)
+        if self.circuit_breaker is not None:
+            send = partial(self.circuit_breaker.call_async, self.service_name, url, send)
+        if self.rate_limiter is not None:
+            send = partial(self.rate_limiter.call_async, self.service_name, url, send, route=route)
+
+        if self._can_retry(request_args):
+            return await self.retry_policy.call_async(method, send)
+        return await send()
+
+    async def _instrumented(self, method, url, route, request_args, function):
+        return await instrument_async(self.instrumentation, self._request_event(method, url, route, request_args), function)
+
+    async def _dispatch_request(self, method, url, request_url, request_args, stream, timeout):
+        key = None
+        if not stream and method == "get" and (self.response_cache is not None or self.coalesce_requests):
+            key = cache_key(request_url, request_args.get("params"), request_args.get("headers"))
+
+        # Added after computing the key, as the deadline header changes with each request
+        request_args = self._with_timeout(url, request_args, timeout)
+
+        if stream:
+            return await self._stream_request(method, url, request_url, request_args)
+
+        if key is None:
+            return await self._send_request(method, url, request_url, request_args)
+
+        if self.coalesce_requests:
+            # Only coalesced with the requests of the same transport, which decode the
+            # responses and map the errors the same way
+            return await IN_FLIGHT_REQUESTS.do(
+                (self, key),
+                lambda: self._send_request(method, url, request_url, request_args, key=key),
+            )
+        return await self._send_request(method, url, request_url, request_args, key=key)
+
+    async def _send_request(self, method, url, request_url, request_args, key=None):
+        if method == "get" and self.response_cache is not None:
+            return await self._cached_http_request(method, url, request_url, request_args, key)
+
+        try:
+            request_url, request_args = self._with_query(request_url, request_args)
+            response = await self._get_client().request(method, request_url, **self._with_trace(request_args))
+
+            event = CURRENT_EVENT.get()
+            if event is not None:
+                event.response_bytes = len(response.content)
+
+            self._raise_for_status(url, response)
+
+            return self._parse_response(url, response)
+        except httpx.HTTPError as error:
+            raise self._request_error(url, error)
+
+    async def _cached_http_request(self, method, url, request_url, request_args, key):
+        # The cache backends are called from the event loop, as the rate limiter buckets are
+        entry = self.response_cache.get(key)
+        if entry is not None and entry.is_fresh():
+            return entry.get_response(partial(self._parse_content, url))
+
+        if entry is not None and entry.can_revalidate():
+            request_args = {
+                **request_args,
+                "headers": {**request_args.get("headers", {}), **entry.validation_headers()},
+            }
+
+        try:
+            request_url, request_args = self._with_query(request_url, request_args)
+            response = await self._get_client().request(method, request_url, **self._with_trace(request_args))
+
+            event = CURRENT_EVENT.get()
+            if event is not None:
+                event.response_bytes = len(response.content)
+
+            if response.status_code == 304 and entry is not None:
+                return self._revalidated_response(url, key, entry, response)
+
+            self._raise_for_status(url, response)
+
+            parsed_response = self._parse_response(url, response)
+        except httpx.HTTPError as error:
+            raise self._request_error(url, error)
+
+        entry = self.response_cache.entry_for(
+            response.status_code,
+            response.headers,
+            response.content,
+            response=parsed_response,
+        )
+        if entry is not None:
+            self.response_cache.set(key, entry)
+        return parsed_response
+
+    async def _stream_request(self, method, url, request_url, request_args):
+        client = self._get_client()
+        try:
+            request_url, request_args = self._with_query(request_url, request_args)
+            request = client.build_request(method, request_url, **self._with_trace(request_args))
+            response = await client.send(request, stream=True)
+
+            if response.is_error:
+                await response.aread()
+                await response.aclose()
+                self._raise_for_status(url, response)
+        except httpx.HTTPError as error:
+            raise self._request_error(url, error)
+
+        return AsyncShuttleStreamingResponse(
+            partial(self._iter_chunks, url, response),
+            response.status_code,
+            ShuttleHeaders(response.headers),
+            response.aclose,
+            self.json_codec,
+            self.service_name,
+            url,
+        )
+
+    async def _iter_chunks(self, url, response, chunk_size):
+        try:
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+        except httpx.HTTPError as error:
+            raise self._request_error(url, error)
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    def _with_trace(self, request_args):
+        """
+        Adds a trace callback recording the timings of the request, when instrumented.
+        """
+        event = CURRENT_EVENT.get()
+        if event is None:
+            return request_args
+
+        record = self._trace_recorder(event)
+
+        async def trace(name, info):
+            record(name, info)
+
+        return {**request_args, "extensions": {"trace": trace}}
+
+    def _create_client(self):
+        return httpx.AsyncClient(**self._client_options())
@@ -0,0 +1,205 @@
+import mimetypes
+import os
+
+from collections.abc import AsyncIterator, Iterator
+
+# Size of the chunks read from files and buffers when sending them
+CHUNK_SIZE = 64 * 1024
+
+class BufferBody:
+    """
+    A bytes-like request body, sent in chunks which are views of the buffer
+    rather than copies of it.
+    """
+
+    def __init__(self, view, chunk_size=CHUNK_SIZE):
+        self.view = view
+        self.chunk_size = chunk_size
+
+    def __len__(self):
+        return self.view.nbytes
+
+    def __iter__(self):
+        for start in range(0, self.view.nbytes, self.chunk_size):
+            yield self.view[start:start + self.chunk_size]
+
+class FileBody:
+    """
+    A seekable binary file sent as a request body, read in chunks from its
+    position when the request was made. It is read from there again when the
+    request is retried.
+    """
+
+    def __init__(self, file, chunk_size=CHUNK_SIZE, start=None):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.start = file.tell() if start is None else start
+        self.length = _file_size(file) - self.start
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        self.file.seek(self.start)
+        remaining = self.length
+        while remaining > 0:
+            chunk = self.file.read(min(self.chunk_size, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+class AsyncBody:
+    """
+    A request body iterated synchronously, sent by an asynchronous client. Files
+    are read in the event loop, one chunk at a time.
+    """
+
+    def __init__(self, body):
+        self.body = body
+
+    async def __aiter__(self):
+        for chunk in self.body:
+            yield chunk
+
+class MultipartFile:
+    """
+    A file sent as a part of a `multipart/form-data` body. `file` is either a
+    path, opened each time the body is sent, or a seekable binary file object.
+    The file name and content type default to the ones of the path.
+    """
+
+    def __init__(self, file, filename=None, content_type=None):
+        if not isinstance(file, (str, os.PathLike)) and not file.seekable():
+            raise ValueError("Multipart files must be paths or seekable file objects")
+        self.file = file
+        # Position of file objects to send them from
+        self.start = None if isinstance(file, (str, os.PathLike)) else file.tell()
+        if filename is None:
+            name = file if isinstance(file, (str, os.PathLike)) else getattr(file, "name", None)
+            filename = os.path.basename(os.fspath(name)) if isinstance(name, (str, os.PathLike)) else None
+        self.filename = filename
+        if content_type is None:
+            content_type = (filename and mimetypes.guess_type(filename)[0]) or "application/octet-stream"
+        self.content_type = content_type
+
+    def __len__(self):
+        if isinstance(self.file, (str, os.PathLike)):
+            return os.stat(self.file).st_size
+        return _file_size(self.file) - self.start
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE):
+        if isinstance(self.file, (str, os.PathLike)):
+            with open(self.file, "rb") as file:
+                yield from FileBody(file, chunk_size)
+        else:
+            yield from FileBody(self.file, chunk_size, self.start)
+
+class MultipartEncoder:
+    """
+    A `multipart/form-data` request body, encoded while it is sent. Files are
+    read lazily, one chunk at a time, so uploading them doesn't load them in
+    memory. The length of the body is known beforehand, and sent as its
+    `Content-Length`.
+
+    `fields` is a mapping, or a list of `(name, value)` pairs, whose values are
+    strings, bytes or `MultipartFile`.
+    """
+
+    def __init__(self, fields, boundary=None, chunk_size=CHUNK_SIZE):
+        self.boundary = boundary or os.urandom(16).hex()
+        self.chunk_size = chunk_size
+        self._parts = []
+        for name, value in fields.items() if hasattr(fields, "items") else fields:
+            if isinstance(value, MultipartFile):
+                self._parts.append((self._part_header(name, value.filename, value.content_type), value))
+            else:
+                if not isinstance(value, bytes):
+                    value = str(value).encode("utf-8")
+                # Small fields are sent in a single chunk with their header
+                self._parts.append((self._part_header(name) + value + b"\r\n", None))
+        self._closing = "--{}--\r\n".format(self.boundary).encode("ascii")
+
+    @property
+    def content_type(self):
+        return "multipart/form-data; boundary={}".format(self.boundary)
+
+    def __len__(self):
+        length = len(self._closing)
+        for header, file in self._parts:
+            length += len(header)
+            if file is not None:
+                length += len(file) + 2
+        return length
+
+    def __iter__(self):
+        for header, file in self._parts:
+            yield header
+            if file is not None:
+                yield from file.iter_chunks(self.chunk_size)
+                yield b"\r\n"
+        yield self._closing
+
+    def _part_header(self, name, filename=None, content_type=None):
+        disposition = 'form-data; name="{}"'.format(_quote(name))
+        if filename is not None:
+            disposition += '; filename="{}"'.format(_quote(filename))
+        header = "--{}\r\nContent-Disposition: {}\r\n".format(self.boundary, disposition)
+        if content_type is not None:
+            header += "Content-Type: {}\r\n".format(content_type)
+        return (header + "\r\n").encode("utf-8")
+
+def _quote(value):
+    # Percent-encodes the characters which would end the quoted string, as browsers do
+    return value.replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+def _file_size(file):
+    try:
+        return os.fstat(file.fileno()).st_size
+    except (AttributeError, OSError):
+        # In-memory files, or files without a descriptor
+        position = file.tell()
+        size = file.seek(0, os.SEEK_END)
+        file.seek(position)
+        return size
+
+def request_body(data, chunk_size=CHUNK_SIZE):
+    """
+    Returns the body to send for request data which is sent as is: bytes-like
+    objects, binary file objects, iterators of bytes, or a `MultipartEncoder`.
+    Returns None for data to encode in the content type of the request.
+    """
+    if isinstance(data, bytes):
+        return data
+    if isinstance(data, (bytearray, memoryview)):
+        view = memoryview(data)
+        return view if view.format == "B" and view.ndim == 1 else view.cast("B")
+    if hasattr(data, "read"):
+        if getattr(data, "seekable", lambda: False)():
+            return FileBody(data, chunk_size)
+        # Sent with chunked transfer encoding, as the length isn't known
+        return iter(lambda: data.read(chunk_size), b"")
+    if isinstance(data, (BufferBody, FileBody, MultipartEncoder, Iterator, AsyncIterator)):
+        return data
+    return None
+
+def body_length(body):
+    """
+    Returns the length in bytes of a request body, or None when it isn't known.
+    """
+    if isinstance(body, AsyncBody):
+        body = body.body
+    if isinstance(body, memoryview):
+        return body.nbytes
+    if isinstance(body, (bytes, BufferBody, FileBody, MultipartEncoder)):
+        return len(body)
+    return None
+
+def is_replayable(body):
+    """
+    Whether a request body can be sent again when retrying the request, unlike
+    iterators which are consumed by the first attempt.
+    """
+    if isinstance(body, AsyncBody):
+        body = body.body
+    return not isinstance(body, (Iterator, AsyncIterator))
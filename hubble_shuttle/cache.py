@@ -0,0 +1,397 @@
+import hashlib
+import json
+import socket
+import threading
+import time
+
+from collections import OrderedDict
+
+from .sqlite import SQLiteConnections
+
+DEFAULT_STALE_TTL = 3600
+
+class CacheEntry:
+    """
+    A cached response, stored as its status code, headers and raw body, along
+    with its expiry time.
+
+    The response is only parsed when first read from the entry, and the parsed
+    response is kept for the following reads.
+    """
+
+    def __init__(self, status_code, headers, content, expires, response=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.expires = expires
+        self._response = response
+
+    @property
+    def etag(self):
+        return self.headers.get("ETag")
+
+    @property
+    def last_modified(self):
+        return self.headers.get("Last-Modified")
+
+    def is_fresh(self):
+        return time.time() < self.expires
+
+    def can_revalidate(self):
+        return self.etag is not None or self.last_modified is not None
+
+    def validation_headers(self):
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def get_response(self, parse):
+        """
+        Returns the cached response, parsing it with `parse(status_code, headers, content)`
+        on first access.
+        """
+        if self._response is None:
+            self._response = parse(self.status_code, self.headers, self.content)
+        return self._response
+
+    def to_bytes(self):
+        metadata = json.dumps({
+            "status_code": self.status_code,
+            "headers": dict(self.headers),
+            "expires": self.expires,
+        }, separators=(",", ":")).encode("utf-8")
+        return metadata + b"\n" + self.content
+
+    @classmethod
+    def from_bytes(cls, value):
+        from requests.structures import CaseInsensitiveDict
+
+        metadata, _, content = value.partition(b"\n")
+        metadata = json.loads(metadata)
+        return cls(
+            metadata["status_code"],
+            CaseInsensitiveDict(metadata["headers"]),
+            content,
+            metadata["expires"],
+        )
+
+class ResponseCache:
+    """
+    Cache for GET responses, storing the entries in a cache backend (in-memory
+    by default, keeping up to `maxsize` entries).
+
+    Responses are kept for the duration given by their `Cache-Control: max-age`
+    header, or `default_ttl` seconds if they don't have one. Responses with
+    `Cache-Control: no-store` are never cached. Stale responses with an `ETag`
+    or `Last-Modified` header are kept for another `stale_ttl` seconds, to be
+    revalidated with the server.
+
+    Cached responses are shared between callers, and must not be modified.
+    """
+
+    def __init__(self, backend=None, maxsize=128, default_ttl=0, stale_ttl=DEFAULT_STALE_TTL):
+        self.backend = backend if backend is not None else MemoryCacheBackend(maxsize)
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, entry):
+        ttl = entry.expires - time.time()
+        if entry.can_revalidate():
+            ttl += self.stale_ttl
+        if ttl > 0:
+            self.backend.set(key, entry, ttl)
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def entry_for(self, status_code, headers, content, response=None):
+        """
+        Builds the cache entry for a response, or returns None if the response
+        shouldn't be cached.
+        """
+        if status_code != 200:
+            return None
+
+        ttl = self._response_ttl(headers)
+        if ttl is None:
+            return None
+
+        entry = CacheEntry(status_code, headers, content, time.time() + ttl, response=response)
+        if ttl <= 0 and not entry.can_revalidate():
+            return None
+        return entry
+
+    def refresh(self, entry, headers):
+        """
+        Builds the entry for a cached response after the server confirmed it is
+        still valid (304 Not Modified), or returns None if it shouldn't be cached
+        anymore.
+        """
+        ttl = self._response_ttl(headers)
+        if ttl is None:
+            return None
+
+        from requests.structures import CaseInsensitiveDict
+
+        refreshed_headers = CaseInsensitiveDict(entry.headers)
+        for name in ["Cache-Control", "Expires", "ETag", "Last-Modified"]:
+            if name in headers:
+                refreshed_headers[name] = headers[name]
+
+        return CacheEntry(
+            entry.status_code,
+            refreshed_headers,
+            entry.content,
+            time.time() + ttl,
+            response=entry._response,
+        )
+
+    def _response_ttl(self, headers):
+        cache_control = parse_cache_control(headers.get("Cache-Control", ""))
+        if "no-store" in cache_control:
+            return None
+        if "no-cache" in cache_control:
+            return 0
+        if "max-age" in cache_control:
+            try:
+                return int(cache_control["max-age"])
+            except ValueError:
+                return 0
+        return self.default_ttl
+
+class MemoryCacheBackend:
+    """
+    In-process cache backend, evicting the least recently used entries once it
+    holds `maxsize` entries. Entries are kept as objects, so a cached response
+    is only parsed once.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+
+            entry, expires = item
+            if time.time() >= expires:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, ttl):
+        with self._lock:
+            self._entries[key] = (entry, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class SQLiteCacheBackend:
+    """
+    On-disk cache backend, storing the entries in a SQLite database that can be
+    shared by all the processes on a host. Once the database holds more than
+    `maxsize` entries, the least recently used ones are evicted.
+    """
+
+    def __init__(self, path, maxsize=10000):
+        self.path = path
+        self.maxsize = maxsize
+        self._connections = SQLiteConnections(path)
+
+        with self._connections.connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS shuttle_cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS shuttle_cache_accessed ON shuttle_cache (accessed)")
+
+    def __len__(self):
+        return self._connections.connect().execute("SELECT COUNT(*) FROM shuttle_cache").fetchone()[0]
+
+    def get(self, key):
+        now = time.time()
+        with self._connections.connect() as connection:
+            row = connection.execute(
+                "SELECT value FROM shuttle_cache WHERE key = ? AND expires > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE shuttle_cache SET accessed = ? WHERE key = ?", (now, key))
+        return CacheEntry.from_bytes(row[0])
+
+    def set(self, key, entry, ttl):
+        now = time.time()
+        with self._connections.connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO shuttle_cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, entry.to_bytes(), now + ttl, now),
+            )
+            connection.execute("DELETE FROM shuttle_cache WHERE expires <= ?", (now,))
+            connection.execute(
+                "DELETE FROM shuttle_cache WHERE key IN ("
+                "SELECT key FROM shuttle_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            )
+
+    def delete(self, key):
+        with self._connections.connect() as connection:
+            connection.execute("DELETE FROM shuttle_cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._connections.connect() as connection:
+            connection.execute("DELETE FROM shuttle_cache")
+
+class RedisCacheBackend:
+    """
+    Networked cache backend for servers speaking the Redis protocol, shared by
+    all the processes connecting to it. Only the `GET`, `SET`, `DEL` and `SCAN`
+    commands are used. Networking errors are treated as cache misses, so an
+    unavailable server doesn't fail the requests.
+    """
+
+    def __init__(self, host="localhost", port=6379, db=0, prefix="shuttle:", timeout=1):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.prefix = prefix
+        self.timeout = timeout
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        value = self._execute("GET", self.prefix + key)
+        if value is None:
+            return None
+        return CacheEntry.from_bytes(value)
+
+    def set(self, key, entry, ttl):
+        self._execute("SET", self.prefix + key, entry.to_bytes(), "PX", str(max(int(ttl * 1000), 1)))
+
+    def delete(self, key):
+        self._execute("DEL", self.prefix + key)
+
+    def clear(self):
+        cursor = b"0"
+        while True:
+            reply = self._execute("SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", "1000")
+            if reply is None:
+                return
+            cursor, keys = reply
+            if keys:
+                self._execute("DEL", *keys)
+            if cursor == b"0":
+                return
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+    def _execute(self, *args):
+        with self._lock:
+            try:
+                if self._connection is None:
+                    self._connect()
+                self._send(*args)
+                return self._read_reply()
+            except (OSError, RedisProtocolError):
+                self._disconnect()
+                return None
+
+    def _connect(self):
+        connection = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._connection = connection
+        self._reader = connection.makefile("rb")
+        if self.db:
+            self._send("SELECT", str(self.db))
+            self._read_reply()
+
+    def _disconnect(self):
+        if self._connection is not None:
+            self._reader.close()
+            self._connection.close()
+            self._connection = None
+
+    def _send(self, *args):
+        command = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if isinstance(arg, str):
+                arg = arg.encode("utf-8")
+            command.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        self._connection.sendall(b"".join(command))
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise RedisProtocolError("Connection closed")
+
+        kind, value = line[:1], line[1:-2]
+        if kind == b"+":
+            return value
+        if kind == b"-":
+            raise RedisProtocolError(value.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(value)
+        if kind == b"$":
+            length = int(value)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(value)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RedisProtocolError("Unexpected reply: {!r}".format(line))
+
+class RedisProtocolError(Exception):
+    pass
+
+def cache_key(url, params, headers):
+    """
+    Builds the cache key of a request from its URL, and its query parameters and
+    headers, once merged with the client-level ones.
+    """
+    if not isinstance(params, str):
+        # Query parameters are either a dict, or the encoded client-level parameters
+        params = sorted((key, value) for key, value in (params or {}).items())
+    key = [
+        url,
+        params,
+        sorted((key.lower(), value) for key, value in (headers or {}).items()),
+    ]
+    return hashlib.sha256(json.dumps(key, default=str).encode("utf-8")).hexdigest()
+
+def parse_cache_control(value):
+    directives = {}
+    for directive in value.split(","):
+        name, _, argument = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"')
+    return directives
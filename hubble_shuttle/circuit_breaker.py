@@ -0,0 +1,189 @@
+import threading
+import time
+
+from collections import deque
+
+from .exceptions import APIError, CircuitOpenError, HTTPServerError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """
+    Fails fast with a `CircuitOpenError` while a service is failing, instead of
+    sending requests that are likely to fail or time out.
+
+    Each service has its own circuit, keyed by service name. The circuit opens
+    when, over the last `window` seconds and at least `minimum_calls` requests,
+    the rate of failed requests reaches `failure_rate_threshold`. Networking
+    errors and 5xx responses are failures, as well as requests taking longer than
+    `slow_call_threshold` seconds when set.
+
+    After `reset_timeout` seconds, the circuit is half-open: up to
+    `half_open_probes` requests are let through, and the circuit closes again
+    once they all succeed, or opens again as soon as one of them fails.
+    """
+
+    def __init__(
+        self,
+        failure_rate_threshold=0.5,
+        slow_call_threshold=None,
+        window=60,
+        minimum_calls=20,
+        reset_timeout=30,
+        half_open_probes=1,
+    ):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.window = window
+        self.minimum_calls = minimum_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def state(self, service_name):
+        """
+        Returns the state of the circuit of a service: "closed", "open" or "half_open".
+        """
+        with self._lock:
+            return self._circuit(service_name).state
+
+    def reset(self, service_name=None):
+        """
+        Closes the circuit of a service, or of all the services.
+        """
+        with self._lock:
+            if service_name is None:
+                self._circuits.clear()
+            else:
+                self._circuits.pop(service_name, None)
+
+    def call(self, service_name, url, function):
+        """
+        Calls `function()` if the circuit of the service allows it, and records its outcome.
+        """
+        probe = self._acquire(service_name, url)
+        start = time.monotonic()
+        try:
+            response = function()
+        except APIError as error:
+            self._record(service_name, probe, self.is_failure(error))
+            raise
+        except BaseException:
+            self._record(service_name, probe, None)
+            raise
+        self._record(service_name, probe, self._is_slow(start))
+        return response
+
+    async def call_async(self, service_name, url, function):
+        """
+        Awaits `function()` if the circuit of the service allows it, and records its outcome.
+        """
+        probe = self._acquire(service_name, url)
+        start = time.monotonic()
+        try:
+            response = await function()
+        except APIError as error:
+            self._record(service_name, probe, self.is_failure(error))
+            raise
+        except BaseException:
+            self._record(service_name, probe, None)
+            raise
+        self._record(service_name, probe, self._is_slow(start))
+        return response
+
+    def is_failure(self, error):
+        # Networking errors are plain APIErrors, client errors don't mean the service is failing
+        return isinstance(error, HTTPServerError) or type(error) is APIError
+
+    def _is_slow(self, start):
+        return self.slow_call_threshold is not None and time.monotonic() - start > self.slow_call_threshold
+
+    def _circuit(self, service_name):
+        circuit = self._circuits.get(service_name)
+        if circuit is None:
+            circuit = self._circuits[service_name] = _Circuit()
+        return circuit
+
+    def _acquire(self, service_name, url):
+        """
+        Returns whether the request is a half-open probe, or raises a CircuitOpenError
+        if the request isn't allowed.
+        """
+        with self._lock:
+            circuit = self._circuit(service_name)
+            if circuit.state == OPEN:
+                if time.monotonic() - circuit.opened_at < self.reset_timeout:
+                    raise CircuitOpenError(service_name, url, None)
+                circuit.half_open()
+
+            if circuit.state == HALF_OPEN:
+                if circuit.probes + circuit.probe_successes >= self.half_open_probes:
+                    raise CircuitOpenError(service_name, url, None)
+                circuit.probes += 1
+                return True
+
+            return False
+
+    def _record(self, service_name, probe, failed):
+        """
+        Records the outcome of a request, or only releases its probe if `failed` is None.
+        """
+        with self._lock:
+            circuit = self._circuit(service_name)
+            if probe:
+                circuit.probes = max(circuit.probes - 1, 0)
+                if failed is None or circuit.state != HALF_OPEN:
+                    return
+                if failed:
+                    circuit.open()
+                else:
+                    circuit.probe_successes += 1
+                    if circuit.probe_successes >= self.half_open_probes:
+                        circuit.close()
+            elif failed is not None and circuit.state == CLOSED:
+                calls, failures = circuit.add(failed, self.window)
+                if calls >= self.minimum_calls and failures >= calls * self.failure_rate_threshold:
+                    circuit.open()
+
+class _Circuit:
+
+    def __init__(self):
+        self.close()
+
+    def close(self):
+        self.state = CLOSED
+        self.opened_at = None
+        # Outcomes of the requests in the rolling window, as [second, calls, failures] buckets
+        self.buckets = deque()
+        self.probes = 0
+        self.probe_successes = 0
+
+    def open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.buckets.clear()
+
+    def half_open(self):
+        self.state = HALF_OPEN
+        self.probes = 0
+        self.probe_successes = 0
+
+    def add(self, failed, window):
+        """
+        Adds the outcome of a request, and returns the number of requests and
+        failures in the window.
+        """
+        second = int(time.monotonic())
+        while self.buckets and self.buckets[0][0] <= second - window:
+            self.buckets.popleft()
+
+        if not self.buckets or self.buckets[-1][0] != second:
+            self.buckets.append([second, 0, 0])
+        self.buckets[-1][1] += 1
+        self.buckets[-1][2] += int(failed)
+
+        return sum(bucket[1] for bucket in self.buckets), sum(bucket[2] for bucket in self.buckets)
@@ -0,0 +1,76 @@
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Extra required by each optional content encoding
+ENCODING_EXTRAS = {
+    "br": "brotli",
+    "zstd": "zstd",
+}
+
+# Minimum size in bytes of the request bodies to compress, as compressing small
+# bodies costs more than sending them
+DEFAULT_COMPRESSION_THRESHOLD = 1024
+
+def _compress_gzip(data):
+    # Level 6 compresses JSON almost as well as 9, several times faster
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+def _compress_deflate(data):
+    # HTTP's `deflate` is the zlib format, not raw deflate
+    return zlib.compress(data, 6)
+
+def _compress_brotli(data):
+    # Higher qualities are too slow for compressing on the fly
+    return brotli.compress(data, quality=4)
+
+def _compress_zstd(data):
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+def is_available(encoding):
+    """
+    Returns whether the library needed for a content encoding is installed.
+    """
+    if encoding == "br":
+        return brotli is not None
+    if encoding == "zstd":
+        return zstandard is not None
+    return encoding in ("gzip", "deflate", "identity")
+
+def compressor(encoding):
+    """
+    Returns the function compressing request bodies with a content encoding.
+    """
+    compressors = {
+        "gzip": _compress_gzip,
+        "deflate": _compress_deflate,
+        "br": _compress_brotli,
+        "zstd": _compress_zstd,
+    }
+    if encoding not in compressors:
+        raise ValueError("Unknown content encoding for requests: {}".format(encoding))
+    if not is_available(encoding):
+        raise ImportError("Compressing requests with {} requires the {} extra: pip install hubble_shuttle[{}]".format(
+            encoding, ENCODING_EXTRAS[encoding], ENCODING_EXTRAS[encoding],
+        ))
+    return compressors[encoding]
+
+def accept_encoding(encodings, supported):
+    """
+    Returns the `Accept-Encoding` header value for the response encodings, in
+    order of preference, keeping the ones the transport can decode.
+    """
+    encodings = [encoding for encoding in encodings if encoding in supported]
+    return ", ".join(encodings) or "identity"
@@ -0,0 +1,88 @@
+from functools import lru_cache
+
+# Default charset for text content types, as in requests
+DEFAULT_TEXT_CHARSET = "ISO-8859-1"
+
+class MediaType:
+    """
+    A parsed `Content-Type` header value, such as `application/problem+json; charset=utf-8`.
+    """
+
+    __slots__ = ("mime_type", "suffix", "params")
+
+    def __init__(self, mime_type, suffix, params):
+        # Lowercase type and subtype, e.g. `application/problem+json`
+        self.mime_type = mime_type
+        # Structured syntax suffix of the subtype, e.g. `+json`, or None
+        self.suffix = suffix
+        # Parameters, with lowercase names
+        self.params = params
+
+    @property
+    def charset(self):
+        return self.params.get("charset")
+
+@lru_cache(maxsize=256)
+def parse_media_type(value):
+    """
+    Parses a `Content-Type` header value. Responses of an API only use a few
+    distinct values, so they are only parsed once.
+    """
+    mime_type, _, params = value.partition(";")
+    mime_type = mime_type.strip().lower()
+
+    subtype = mime_type.partition("/")[2]
+    suffix = "+" + subtype.rpartition("+")[2] if "+" in subtype else None
+
+    parsed_params = {}
+    for param in params.split(";"):
+        name, _, param_value = param.partition("=")
+        name = name.strip().lower()
+        if name:
+            parsed_params[name] = param_value.strip().strip('"')
+
+    return MediaType(mime_type, suffix, parsed_params)
+
+def decode_text(content, media_type):
+    try:
+        return content.decode(media_type.charset or DEFAULT_TEXT_CHARSET, errors="replace")
+    except LookupError:
+        return content.decode("utf-8", errors="replace")
+
+class ContentDecoders:
+    """
+    Dispatches response bodies to a decoder by media type.
+
+    Decoders are callables `decoder(content, media_type)` taking the raw body and
+    its parsed MediaType, registered by media type (`application/json`) or by
+    subtype suffix (`+json`). The exact media type takes precedence. Decoders
+    raise ValueError for invalid bodies, and bodies without a decoder are
+    returned as bytes.
+    """
+
+    def __init__(self, decoders):
+        self._decoders = {media_type.lower(): decoder for media_type, decoder in decoders.items()}
+        # Decoder by Content-Type header value, None for raw bodies
+        self._by_header = {}
+
+    def decode(self, content, content_type):
+        try:
+            decoder, media_type = self._by_header[content_type]
+        except KeyError:
+            decoder, media_type = self._resolve(content_type)
+
+        if decoder is None:
+            return content
+        return decoder(content, media_type)
+
+    def _resolve(self, content_type):
+        media_type = parse_media_type(content_type)
+        decoder = self._decoders.get(media_type.mime_type)
+        if decoder is None and media_type.suffix is not None:
+            decoder = self._decoders.get(media_type.suffix)
+
+        # Bounded, as the header values come from the server
+        if len(self._by_header) >= 256:
+            self._by_header.clear()
+        self._by_header[content_type] = (decoder, media_type)
+        return decoder, media_type
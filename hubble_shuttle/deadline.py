@@ -0,0 +1,41 @@
+import contextvars
+import time
+
+from contextlib import contextmanager
+
+# Monotonic time by which the requests of the current context must complete
+_DEADLINE = contextvars.ContextVar("hubble_shuttle_deadline", default=None)
+
+@contextmanager
+def deadline(seconds):
+    """
+    Caps the time left for the requests sent within the block, including their
+    retries and batched requests, to `seconds`. Nested deadlines can only reduce
+    the time left. A `None` deadline leaves the current one unchanged.
+
+    Requests sent after the deadline raise a `DeadlineExceededError`.
+    """
+    if seconds is None:
+        yield
+        return
+
+    expires = time.monotonic() + seconds
+    current = _DEADLINE.get()
+    if current is not None:
+        expires = min(expires, current)
+
+    token = _DEADLINE.set(expires)
+    try:
+        yield
+    finally:
+        _DEADLINE.reset(token)
+
+def time_remaining():
+    """
+    Returns the number of seconds left before the current deadline, which can be
+    negative once expired, or None if there isn't any deadline.
+    """
+    expires = _DEADLINE.get()
+    if expires is None:
+        return None
+    return expires - time.monotonic()
@@ -0,0 +1,284 @@
+import io
+import os
+import re
+import threading
+
+from contextlib import contextmanager
+
+from .exceptions import (
+    APIError,
+    CircuitOpenError,
+    DeadlineExceededError,
+    DownloadRangeError,
+    HTTPError,
+    RateLimitExceededError,
+)
+
+# Size of the byte ranges of a download, each fetched by a request
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+# Size of the buffer the parts are read into before being written to a file
+FILE_BUFFER_SIZE = 1024 * 1024
+
+CONTENT_RANGE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+class ShuttleDownload:
+    """
+    Result of `http_download`: the number of bytes written to the target, the
+    status code and headers of the first response, and the number of byte ranges
+    downloaded, which is 1 when the server doesn't support range requests.
+    """
+
+    def __init__(self, size, status_code, headers, parts):
+        self.size = size
+        self.status_code = status_code
+        self.headers = headers
+        self.parts = parts
+
+class BufferTarget:
+    """
+    Writable buffer, such as a `mmap` or a `bytearray`, which the body is read
+    into directly.
+    """
+
+    def __init__(self, buffer):
+        self.view = memoryview(buffer).cast("B")
+        if self.view.readonly:
+            raise ValueError("Download targets must be writable")
+        self.capacity = self.view.nbytes
+
+    def allocate(self, size):
+        if size > self.capacity:
+            raise ValueError("The {} bytes download doesn't fit in the {} bytes target".format(size, self.capacity))
+
+    def buffer(self, offset, length=None):
+        return self.view[offset:] if length is None else self.view[offset:offset + length]
+
+    def write(self, offset, data):
+        # The body was read into the buffer itself
+        pass
+
+class FileTarget:
+    """
+    Binary file, which the parts of the body are written to at their offset.
+    They are written with `os.pwrite` when the file has a descriptor, so that
+    the parts are written concurrently. Each thread reads the body into its own
+    buffer, reused for all its chunks.
+    """
+
+    capacity = None
+
+    def __init__(self, file):
+        self.file = file
+        try:
+            self._fd = file.fileno() if hasattr(os, "pwrite") else None
+        except (AttributeError, io.UnsupportedOperation):
+            self._fd = None
+        self._lock = threading.Lock()
+        self._buffers = threading.local()
+
+    def allocate(self, size):
+        # Written data must not stay in the buffer of the file object
+        self.file.flush()
+        self.file.truncate(size)
+
+    def buffer(self, offset, length=None):
+        buffer = getattr(self._buffers, "buffer", None)
+        if buffer is None:
+            buffer = self._buffers.buffer = memoryview(bytearray(FILE_BUFFER_SIZE))
+        return buffer[:length]
+
+    def write(self, offset, data):
+        if self._fd is None:
+            with self._lock:
+                self.file.seek(offset)
+                self.file.write(data)
+            return
+
+        while data:
+            written = os.pwrite(self._fd, data, offset)
+            data = data[written:]
+            offset += written
+
+@contextmanager
+def download_target(target):
+    """
+    Yields the target of a download given as a path, a binary file object or a
+    writable buffer. Paths are opened, and truncated, for the download.
+    """
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, "wb") as file:
+            yield FileTarget(file)
+        return
+
+    try:
+        # Buffers, including mmaps which also have the methods of files
+        target = BufferTarget(target)
+    except TypeError:
+        target.flush()
+        target = FileTarget(target)
+    yield target
+
+def range_header(start, end):
+    # Ranges are inclusive of their last byte
+    return "bytes={}-{}".format(start, end - 1)
+
+def content_range(headers):
+    """
+    Returns the start, exclusive end and total size of the range sent by a 206
+    response, where the total size is None when the server doesn't know it.
+    """
+    match = CONTENT_RANGE.fullmatch(headers.get("Content-Range", "").strip())
+    if match is None:
+        return None
+    start, last, total = match.groups()
+    return int(start), int(last) + 1, None if total == "*" else int(total)
+
+def split_ranges(start, end, part_size):
+    return [(part_start, min(part_start + part_size, end)) for part_start in range(start, end, part_size)]
+
+def validator(headers):
+    """
+    Returns the `If-Range` validator sent with the next ranges, so that they
+    aren't mixed with the ranges of another version of the resource.
+    """
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+def is_resumable(error):
+    # Only interrupted transfers are resumed, as other errors would happen again
+    return not isinstance(error, (HTTPError, CircuitOpenError, RateLimitExceededError, DeadlineExceededError, DownloadRangeError))
+
+class RangedDownload:
+    """
+    State of a download by `http_download`, shared by the synchronous and
+    asynchronous clients, which send the requests and read the responses into
+    the `DownloadRange` buffers.
+    """
+
+    def __init__(self, service_name, url, target, headers, part_size, part_attempts):
+        self.service_name = service_name
+        self.url = url
+        self.target = target
+        # Ranges are offsets in the encoded body
+        self.headers = {**(headers or {}), "Accept-Encoding": "identity"}
+        self.part_size = part_size
+        self.part_attempts = part_attempts
+        # Size of the body, once known
+        self.size = None
+
+    def first_request_headers(self):
+        return {**self.headers, "Range": range_header(0, self.part_size)}
+
+    def empty(self, error):
+        """
+        Returns the download of an empty resource, whose first range servers
+        reject with a 416, or None for other HTTP errors.
+        """
+        if error.internal_status_code != 416 or error.headers.get("Content-Range", "").strip() != "bytes */0":
+            return None
+        self.target.allocate(0)
+        return ShuttleDownload(0, error.internal_status_code, error.headers, 0)
+
+    def ranges(self, response):
+        """
+        Returns the ranges of the download, the first of which is read from the
+        response to the first request, or None when the body is downloaded in a
+        single request, as the server doesn't support ranges or the size isn't known.
+        """
+        received = content_range(response.headers) if response.status_code == 206 else None
+        if received is None or received[2] is None:
+            return None
+
+        _, first_end, self.size = received
+        self.target.allocate(self.size)
+        if validator(response.headers):
+            self.headers["If-Range"] = validator(response.headers)
+        return [DownloadRange(self, 0, first_end)] + [
+            DownloadRange(self, start, end) for start, end in split_ranges(first_end, self.size, self.part_size)
+        ]
+
+    def body(self, response):
+        """
+        Returns the range of a download in a single request, up to the length of
+        the response when known.
+        """
+        length = response.headers.get("Content-Length")
+        if length is not None and response.headers.get("Content-Encoding", "identity") == "identity":
+            self.size = int(length)
+            self.target.allocate(self.size)
+        return DownloadRange(self, 0, self.size)
+
+    def result(self, response, ranges):
+        """
+        Returns the ShuttleDownload once its ranges are downloaded, given the
+        response to the first request.
+        """
+        if self.size is None:
+            # The size of a body without a length is only known once downloaded
+            self.size = ranges[0].position
+            self.target.allocate(self.size)
+        return ShuttleDownload(self.size, response.status_code, response.headers, len(ranges))
+
+    def can_resume(self, error, attempts):
+        return is_resumable(error) and attempts < self.part_attempts
+
+class DownloadRange:
+    """
+    Byte range of a download, from `start` to `end` exclusive, or to the end of
+    the body when None. `position` is the next byte to download, from which the
+    range is resumed when its transfer is interrupted.
+    """
+
+    def __init__(self, download, start, end):
+        self.download = download
+        self.start = start
+        self.end = end
+        self.position = start
+        # Read into when the target is full, to check that the body fits it
+        self._overflow = None
+
+    def request_headers(self):
+        return {**self.download.headers, "Range": range_header(self.position, self.end)}
+
+    def check(self, response):
+        """
+        Checks that a response is the requested range of the resource.
+        """
+        if response.status_code != 206:
+            raise DownloadRangeError(self.download.service_name, self.download.url, ValueError("The resource changed during the download"))
+        received = content_range(response.headers)
+        if received is None or received[0] != self.position:
+            raise DownloadRangeError(
+                self.download.service_name,
+                self.download.url,
+                ValueError("Unexpected Content-Range: {}".format(response.headers.get("Content-Range"))),
+            )
+
+    def buffer(self):
+        """
+        Returns the buffer to read the next bytes of the range into, or None once
+        the range is complete.
+        """
+        if self.end is not None and self.position >= self.end:
+            return None
+        buffer = self.download.target.buffer(self.position, None if self.end is None else self.end - self.position)
+        if not buffer:
+            self._overflow = buffer = memoryview(bytearray(1))
+        return buffer
+
+    def advance(self, buffer, read):
+        if buffer is self._overflow:
+            raise ValueError("The download doesn't fit in the {} bytes target".format(self.download.target.capacity))
+        self.download.target.write(self.position, buffer[:read])
+        self.position += read
+
+    def check_complete(self):
+        if self.end is not None and self.position < self.end:
+            raise APIError(
+                self.download.service_name,
+                self.download.url,
+                EOFError("The response ended at byte {} instead of {}".format(self.position, self.end)),
+            )
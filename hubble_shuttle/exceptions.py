@@ -11,7 +11,32 @@ class HTTPError(APIError):
     def __init__(self, service_name, source, original_error, response):
         super().__init__(service_name, source, original_error)
         self.internal_status_code = response.status_code
-        self.response = response.data
+        self.headers = response.headers
+        # Raw body of the error response
+        self.content = response.content
+        self._response = response
+
+    @property
+    def response(self):
+        # The body is only parsed when accessed, as callers often only need the status code
+        return self._response.data
+
+# Raised without sending the request while the circuit breaker of the service is open
+class CircuitOpenError(APIError):
+    pass
+
+# Raised without sending the request when the client-side rate limit of the service is exceeded
+class RateLimitExceededError(APIError):
+    pass
+
+# Raised when the deadline of a request expires (see hubble_shuttle.deadline)
+class DeadlineExceededError(APIError):
+    pass
+
+# Raised by `http_download` when the server doesn't send the requested byte range,
+# for example because the resource changed during the download
+class DownloadRangeError(APIError):
+    pass
 
 # For 4xx class errors
 class HTTPClientError(HTTPError):
@@ -49,3 +74,19 @@ HTTP_STATUS_CODE_ERRORS = {
     500: InternalServerError,
 }
 
+
+def status_error_table(status_errors=None):
+    """
+    Returns the error class of each 4xx and 5xx HTTP status code, with
+    `status_errors` overriding the defaults by status code or range of codes.
+    """
+    table = {}
+    for errors in [HTTP_STATUS_CODE_CLASS_ERRORS, HTTP_STATUS_CODE_ERRORS, status_errors or {}]:
+        # Ranges first, so that single status codes take precedence
+        for status, error_class in sorted(errors.items(), key=lambda item: isinstance(item[0], int)):
+            for status_code in ([status] if isinstance(status, int) else status):
+                table[status_code] = error_class
+    return table
+
+# Error class by HTTP status code, built once
+HTTP_STATUS_ERRORS = status_error_table()
@@ -1,16 +1,50 @@
-import re
+import os
+import threading
+import time
 
-import requests
-from requests.exceptions import RequestException
-from requests.exceptions import HTTPError as RequestsHTTPError
+from functools import partial
 
 from collections.abc import Mapping
 
-from urllib.parse import urljoin
+from urllib.parse import urlencode
 
+from .bodies import body_length, is_replayable, request_body
+from .cache import cache_key
+from .compression import DEFAULT_COMPRESSION_THRESHOLD, accept_encoding, compressor
+from .content_types import ContentDecoders, decode_text
+from .deadline import time_remaining
+from .instrumentation import CURRENT_EVENT, RequestEvent, instrument, timed_parse
 from .exceptions import *
+from .json_codecs import default_json_codec
+from .routes import compile_route, join_url
+from .singleflight import SingleFlight
+from .streaming import ShuttleStreamingResponse
 
-class RequestsShuttleTransport:
+# requests, and the urllib3, charset detection and ssl modules it imports, are slow
+# to import, so they are only imported when the first request is sent
+requests = None
+
+def import_requests():
+    global requests
+    if requests is None:
+        import requests
+    return requests
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+
+# GET requests currently running in the process, when coalescing requests
+IN_FLIGHT_REQUESTS = SingleFlight()
+
+class ShuttleTransport:
+    """
+    Base class for transports, holding the logic shared by all HTTP backends:
+    building URLs, merging headers and query parameters, encoding request bodies,
+    parsing responses and mapping HTTP errors.
+
+    Subclasses implement `_http_request`, which can be a coroutine function for
+    asynchronous transports.
+    """
 
     def __init__(self, **kwargs):
         self.api_endpoint = kwargs["api_endpoint"]
@@ -22,121 +56,576 @@ class RequestsShuttleTransport:
         self.query = kwargs["query"]
         self.request_content_type = kwargs["request_content_type"]
 
+        # Content encoding of the request bodies of at least `request_compression_threshold`
+        # bytes, such as `gzip`, or None to send them uncompressed
+        self.request_compression = kwargs.get("request_compression")
+        self.request_compression_threshold = kwargs.get("request_compression_threshold", DEFAULT_COMPRESSION_THRESHOLD)
+        self._compress = compressor(self.request_compression) if self.request_compression else None
+
+        # Response encodings accepted, in order of preference, or None for the defaults of the backend
+        self.response_encodings = kwargs.get("response_encodings")
+
+        # Client-level headers and query parameters, prepared once for all the requests
+        self.defaults = RequestDefaults(self.headers, self.query)
+
         if "service_name" in kwargs:
             self.service_name = kwargs["service_name"]
         else:
             self.service_name = type(self).__name__
 
-    def get(self, url, query=None, headers=None):
-        return self._http_request("get", url, query=query, headers=headers)
+        # Connection pool settings. `pool_connections` is the number of hosts to keep
+        # pools for, `pool_maxsize` the number of connections kept per host, and
+        # `pool_keepalive_timeout` the number of seconds the pool can stay idle before
+        # its connections are dropped (None to keep them until `close()`).
+        self.pool_connections = kwargs.get("pool_connections", DEFAULT_POOL_CONNECTIONS)
+        self.pool_maxsize = kwargs.get("pool_maxsize", DEFAULT_POOL_MAXSIZE)
+        self.pool_keepalive_timeout = kwargs.get("pool_keepalive_timeout")
 
-    def post(self, url, query=None, headers=None, data=None, content_type=None):
-        return self._http_request("post", url, query=query, headers=headers, data=data, content_type=content_type)
+        # Optional ResponseCache for GET requests
+        self.response_cache = kwargs.get("response_cache")
 
-    def put(self, url, query=None, headers=None, data=None, content_type=None):
-        return self._http_request("put", url, query=query, headers=headers, data=data, content_type=content_type)
+        # Whether identical concurrent GET requests are sent only once, sharing the response
+        self.coalesce_requests = kwargs.get("coalesce_requests", False)
 
-    def patch(self, url, query=None, headers=None, data=None, content_type=None):
-        return self._http_request("patch", url, query=query, headers=headers, data=data, content_type=content_type)
+        # Codec used to encode JSON request bodies and decode JSON responses
+        self.json_codec = kwargs.get("json_codec") or default_json_codec()
 
-    def delete(self, url, query=None, headers=None):
-        return self._http_request("delete", url, query=query, headers=headers)
+        # Response body decoders by media type, or by `+suffix` for structured syntax
+        # types such as `application/problem+json`. Other bodies are kept as bytes.
+        self.content_decoders = ContentDecoders({
+            "application/json": self._decode_json,
+            "+json": self._decode_json,
+            "text/plain": decode_text,
+            **(kwargs.get("decoders") or {}),
+        })
 
-    def _http_request(self, method, url, **kwargs):
-        try:
-            response = requests.request(
-                method,
-                self._prepare_request_url(url),
-                **self._prepare_request_args(**kwargs),
-            )
+        # Error classes by HTTP status code, on top of the default ones
+        status_errors = kwargs.get("status_errors")
+        self._status_errors = status_error_table(status_errors) if status_errors else HTTP_STATUS_ERRORS
 
-            self._raise_for_status(url, response)
+        # Optional RetryPolicy for transient failures
+        self.retry_policy = kwargs.get("retry_policy")
 
-            return self._parse_response(response)
-        except RequestException as error:
-            raise APIError(self.service_name, url, error)
+        # Optional CircuitBreaker, failing fast while the service is failing
+        self.circuit_breaker = kwargs.get("circuit_breaker")
 
-    def _prepare_request_url(self, url):
-        while url.startswith('/'):
-            url = url[1:]
+        # Optional RateLimiter, throttling the requests sent to the service
+        self.rate_limiter = kwargs.get("rate_limiter")
 
-        return urljoin(
-            self.api_endpoint,
-            url
-        )
+        # Instrumentation hooks notified of each request sent
+        self.instrumentation = tuple(kwargs.get("instrumentation") or ())
+
+        # Default timeouts in seconds, None to wait forever. The time left before the
+        # current deadline is sent in the `deadline_header` request header when set.
+        self.connect_timeout = kwargs.get("connect_timeout")
+        self.read_timeout = kwargs.get("read_timeout")
+        self.deadline_header = kwargs.get("deadline_header")
+
+    def get(self, url, query=None, headers=None, stream=False, timeout=None, path_params=None, defaults=None):
+        return self._http_request("get", url, query=query, headers=headers, stream=stream, timeout=timeout, path_params=path_params, defaults=defaults)
+
+    def post(self, url, query=None, headers=None, data=None, content_type=None, timeout=None, path_params=None, defaults=None):
+        return self._http_request("post", url, query=query, headers=headers, data=data, content_type=content_type, timeout=timeout, path_params=path_params, defaults=defaults)
 
-    def _prepare_request_args(self, **kwargs):
+    def put(self, url, query=None, headers=None, data=None, content_type=None, timeout=None, path_params=None, defaults=None):
+        return self._http_request("put", url, query=query, headers=headers, data=data, content_type=content_type, timeout=timeout, path_params=path_params, defaults=defaults)
+
+    def patch(self, url, query=None, headers=None, data=None, content_type=None, timeout=None, path_params=None, defaults=None):
+        return self._http_request("patch", url, query=query, headers=headers, data=data, content_type=content_type, timeout=timeout, path_params=path_params, defaults=defaults)
+
+    def delete(self, url, query=None, headers=None, timeout=None, path_params=None, defaults=None):
+        return self._http_request("delete", url, query=query, headers=headers, timeout=timeout, path_params=path_params, defaults=defaults)
+
+    def _http_request(self, method, url, **kwargs):
+        raise NotImplementedError()
+
+    def _prepare_request_url(self, url):
+        # Fast path for plain relative paths, which urljoin would only append to the endpoint
+        if ":" not in url and "." not in url:
+            return self.api_endpoint + url.lstrip("/")
+        return join_url(self.api_endpoint, url)
+
+    def _prepare_route(self, url, path_params=None):
+        """
+        Returns the URL of the request relative to the endpoint, used as the error
+        source, and its route template if any, used as a stable label. The template
+        is only parsed once.
+        """
+        if path_params is None:
+            return url, None
+        return compile_route(url).format(path_params), url
+
+    def _prepare_request_args(self, url=None, **kwargs):
         request_args = {}
 
-        request_headers = self._prepare_request_headers(kwargs.get("headers", {}))
+        # Defaults of the client instance, when it has its own headers or query parameters
+        defaults = kwargs.get("defaults") or self.defaults
+
+        request_headers = self._prepare_request_headers(kwargs.get("headers"), defaults)
         if request_headers:
-            request_args.update({"headers": request_headers})
+            request_args["headers"] = request_headers
 
-        request_query = self._prepare_request_query(kwargs.get("query", {}))
+        request_query = self._prepare_request_query(kwargs.get("query"), defaults)
         if request_query:
-            request_args.update({"params": request_query})
+            request_args["params"] = request_query
 
         if "data" in kwargs:
+            body = request_body(kwargs["data"])
+            if body is not None:
+                request_args.update(self._prepare_request_body(body, kwargs.get("content_type"), request_args.get("headers", {})))
+                return request_args
+
             content_type = kwargs.get("content_type") or self.request_content_type
             if content_type == "application/x-www-form-urlencoded":
                 request_args.update({"data": kwargs["data"]})
             elif content_type == "application/json":
-                request_args.update({"json": kwargs["data"]})
+                if kwargs["data"] is not None:
+                    try:
+                        body = self.json_codec.dumps(kwargs["data"])
+                    except ValueError as error:
+                        raise APIError(self.service_name, url, error)
+                    body, headers = self._compressed(
+                        body,
+                        self._with_content_type(request_args.get("headers", {}), content_type),
+                    )
+                    request_args.update({"data": body, "headers": headers})
             else:
                 raise ValueError("Unknown content type for request: {}".format(content_type))
 
         return request_args
 
-    def _prepare_request_headers(self, headers):
-        request_headers = {}
-        if self.headers:
-            request_headers.update(self.headers)
-        if headers:
-            request_headers.update(headers)
-        return request_headers
-
-    def _prepare_request_query(self, query):
-        request_query = {}
-        if self.query:
-            request_query.update(self.query)
-        if query:
-            request_query.update(query)
-        return request_query
+    def _prepare_request_body(self, body, content_type, headers):
+        """
+        Returns the arguments sending a body which isn't encoded: bytes-like
+        objects, file objects and iterators are sent as they are, with the given
+        content type or the one of the body. Only bodies already in memory are
+        compressed, so that streamed bodies are never read in memory.
+        """
+        content_type = content_type or getattr(body, "content_type", "application/octet-stream")
+        headers = self._with_content_type(headers, content_type)
+        if isinstance(body, (bytes, memoryview)):
+            body, headers = self._compressed(body, headers)
+        return {"data": body, "headers": headers}
+
+    def _can_retry(self, request_args):
+        return self.retry_policy is not None and is_replayable(request_args.get("data", request_args.get("content")))
+
+    def _with_timeout(self, url, request_args, timeout=None):
+        """
+        Adds the timeouts of the request to its arguments, capped to the time left
+        before the current deadline.
+        """
+        if timeout is None:
+            connect_timeout, read_timeout = self.connect_timeout, self.read_timeout
+        elif isinstance(timeout, tuple):
+            connect_timeout, read_timeout = timeout
+        else:
+            connect_timeout, read_timeout = timeout, timeout
+
+        remaining = time_remaining()
+        if remaining is not None:
+            if remaining <= 0:
+                raise DeadlineExceededError(self.service_name, url, TimeoutError("Deadline exceeded"))
+            connect_timeout = remaining if connect_timeout is None else min(connect_timeout, remaining)
+            read_timeout = remaining if read_timeout is None else min(read_timeout, remaining)
+            if self.deadline_header:
+                request_args = {
+                    **request_args,
+                    "headers": {**request_args.get("headers", {}), self.deadline_header: str(int(remaining * 1000))},
+                }
+
+        if connect_timeout is None and read_timeout is None:
+            return request_args
+        return {**request_args, "timeout": self._timeout_arg(connect_timeout, read_timeout)}
+
+    def _timeout_arg(self, connect_timeout, read_timeout):
+        return connect_timeout, read_timeout
+
+    def _request_error(self, url, error):
+        """
+        Wraps a networking error, which is due to the deadline once it has expired.
+        """
+        remaining = time_remaining()
+        if remaining is not None and remaining <= 0:
+            return DeadlineExceededError(self.service_name, url, error)
+        return APIError(self.service_name, url, error)
+
+    def _request_event(self, method, url, route, request_args):
+        body = request_args.get("data", request_args.get("content"))
+        return RequestEvent(
+            self.service_name,
+            method,
+            url,
+            path=route,
+            request_bytes=body_length(body),
+        )
 
-    def _raise_for_status(self, url, response):
-        try:
-            response.raise_for_status()
-        except RequestsHTTPError as error:
-            error_class = self._map_http_error_class(error)
-            raise error_class(self.service_name, url, error, self._parse_response(response))
+    def _compressed(self, body, headers):
+        """
+        Compresses an encoded request body when it is large enough.
+        """
+        if self._compress is None or len(body) < self.request_compression_threshold:
+            return body, headers
+        if any(name.lower() == "content-encoding" for name in headers):
+            return body, headers
+        return self._compress(body), {**headers, "Content-Encoding": self.request_compression}
+
+    def _accept_encoding(self):
+        return accept_encoding(self.response_encodings, self._supported_response_encodings())
+
+    def _supported_response_encodings(self):
+        return ("gzip", "deflate", "identity")
+
+    def _with_content_type(self, headers, content_type):
+        if any(name.lower() == "content-type" for name in headers):
+            return headers
+        return {**headers, "Content-Type": content_type}
+
+    def _prepare_request_headers(self, headers, defaults):
+        if not headers:
+            # Shared by all the requests without header overrides, so it must never be modified
+            return defaults.headers
+        return {**defaults.headers, **headers}
+
+    def _prepare_request_query(self, query, defaults):
+        if not query:
+            return defaults.encoded_query
+        return {**defaults.query, **query}
 
     def _map_http_error_class(self, error):
-        if error.response.status_code in HTTP_STATUS_CODE_ERRORS:
-            return HTTP_STATUS_CODE_ERRORS[error.response.status_code]
-
-        for status_range in HTTP_STATUS_CODE_CLASS_ERRORS:
-            if error.response.status_code in status_range:
-                return HTTP_STATUS_CODE_CLASS_ERRORS[status_range]
+        return self._status_errors.get(error.response.status_code, HTTPError)
 
-        return HTTPError
+    def _parse_response(self, url, response):
+        return self._parse_content(url, response.status_code, response.headers, response.content)
 
-    def _parse_response(self, response):
-        content_type = response.headers.get('Content-Type', '')
-        if re.match(r"^application/json( ?;.+)?$", content_type):
-            data = response.json()
-        elif re.match(r"^text/plain( ?;.+)?$", content_type):
-            data = response.text
+    def _revalidated_response(self, url, key, entry, response):
+        refreshed_entry = self.response_cache.refresh(entry, response.headers)
+        if refreshed_entry is None:
+            self.response_cache.delete(key)
         else:
-            data = response.content
+            self.response_cache.set(key, refreshed_entry)
+        return entry.get_response(partial(self._parse_content, url))
+
+    def _parse_content(self, url, status_code, headers, content):
+        """
+        Builds the response from its raw content. The content is only parsed when
+        the response data is first accessed.
+        """
+        parse_data = lambda: self._parse_data(url, headers, content)
+
+        event = CURRENT_EVENT.get()
+        if event is not None and self.instrumentation:
+            parse_data = timed_parse(self.instrumentation, event, parse_data)
+
+        return ShuttleResponse.lazy(
+            parse_data,
+            status_code,
+            headers,
+            content,
+        )
+
+    def _parse_data(self, url, headers, content):
+        try:
+            return self.content_decoders.decode(content, headers.get("Content-Type", ""))
+        except ValueError as error:
+            raise APIError(self.service_name, url, error)
+
+    def _decode_json(self, content, media_type):
+        return self.json_codec.loads(content)
 
-        return ShuttleResponse(data, response.status_code, response.headers)
+class RequestDefaults:
+    """
+    Headers and query parameters sent with all the requests of a client, with the
+    query parameters encoded once.
+    """
+
+    __slots__ = ("headers", "query", "encoded_query")
+
+    def __init__(self, headers, query):
+        self.headers = dict(headers)
+        self.query = query
+        self.encoded_query = urlencode(
+            [(key, value) for key, value in query.items() if value is not None],
+            doseq=True,
+        )
+
+class RequestsShuttleTransport(ShuttleTransport):
+
+    @property
+    def request_errors(self):
+        # Networking errors of the HTTP backend, wrapped in APIError
+        return import_requests().exceptions.RequestException
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        self._session = None
+        self._session_last_used = None
+        self._session_lock = threading.Lock()
+        # Process owning the session, as connections can't be shared with forked processes
+        self._session_pid = os.getpid()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def _http_request(self, method, url, stream=False, timeout=None, path_params=None, **kwargs):
+        url, route = self._prepare_route(url, path_params)
+        request_url = self._prepare_request_url(url)
+        request_args = self._prepare_request_args(url, **kwargs)
+
+        send = partial(self._dispatch_request, method, url, request_url, request_args, stream, timeout)
+        if self.instrumentation:
+            send = partial(self._instrumented, method, url, route, request_args, send)
+        if self.circuit_breaker is not None:
+            send = partial(self.circuit_breaker.call, self.service_name, url, send)
+        if self.rate_limiter is not None:
+            send = partial(self.rate_limiter.call, self.service_name, url, send, route=route)
+
+        if self._can_retry(request_args):
+            return self.retry_policy.call(method, send)
+        return send()
+
+    def _instrumented(self, method, url, route, request_args, function):
+        return instrument(self.instrumentation, self._request_event(method, url, route, request_args), function)
+
+    def _dispatch_request(self, method, url, request_url, request_args, stream, timeout):
+        key = None
+        if not stream and method == "get" and (self.response_cache is not None or self.coalesce_requests):
+            key = cache_key(request_url, request_args.get("params"), request_args.get("headers"))
+
+        # Added after computing the key, as the deadline header changes with each request
+        request_args = self._with_timeout(url, request_args, timeout)
+
+        if stream:
+            return self._stream_request(method, url, request_url, request_args)
+
+        if key is None:
+            return self._send_request(method, url, request_url, request_args)
+
+        if self.coalesce_requests:
+            # Only coalesced with the requests of the same transport, which decode the
+            # responses and map the errors the same way
+            return IN_FLIGHT_REQUESTS.do(
+                (self, key),
+                lambda: self._send_request(method, url, request_url, request_args, key=key),
+            )
+        return self._send_request(method, url, request_url, request_args, key=key)
+
+    def _send_request(self, method, url, request_url, request_args, key=None):
+        if method == "get" and self.response_cache is not None:
+            return self._cached_http_request(method, url, request_url, request_args, key)
+
+        try:
+            response = self._send(method, request_url, request_args)
+
+            self._raise_for_status(url, response)
+
+            return self._parse_response(url, response)
+        except self.request_errors as error:
+            raise self._request_error(url, error)
+
+    def _stream_request(self, method, url, request_url, request_args):
+        try:
+            response = self._send(method, request_url, request_args, stream=True)
+        except self.request_errors as error:
+            raise self._request_error(url, error)
+
+        try:
+            self._raise_for_status(url, response)
+        except self.request_errors as error:
+            response.close()
+            raise self._request_error(url, error)
+        except HTTPError:
+            response.close()
+            raise
+
+        return ShuttleStreamingResponse(
+            partial(self._iter_chunks, url, response),
+            response.status_code,
+            ShuttleHeaders(response.headers),
+            response.close,
+            self.json_codec,
+            self.service_name,
+            url,
+            readinto=self._body_reader(url, response),
+        )
+
+    def _iter_chunks(self, url, response, chunk_size):
+        try:
+            yield from response.iter_content(chunk_size)
+        except self.request_errors as error:
+            raise self._request_error(url, error)
+
+    def _body_reader(self, url, response):
+        """
+        Returns a function reading the body of a streamed response straight into
+        a buffer, without the copies made by urllib3, unless the body has to be
+        decoded.
+        """
+        from http.client import HTTPException
+
+        raw = response.raw
+        fp = getattr(raw, "_fp", None)
+        if fp is None or not hasattr(fp, "readinto") or response.headers.get("Content-Encoding", "identity") != "identity":
+            return None
+
+        def readinto(buffer):
+            try:
+                read = fp.readinto(buffer)
+            except (OSError, HTTPException) as error:
+                raise self._request_error(url, error)
+            if fp.isclosed():
+                # The body was fully read, so the connection can be reused
+                raw.release_conn()
+            return read
+
+        return readinto
+
+    def _cached_http_request(self, method, url, request_url, request_args, key):
+        entry = self.response_cache.get(key)
+        if entry is not None and entry.is_fresh():
+            return entry.get_response(partial(self._parse_content, url))
+
+        if entry is not None and entry.can_revalidate():
+            request_args = {
+                **request_args,
+                "headers": {**request_args.get("headers", {}), **entry.validation_headers()},
+            }
+
+        try:
+            response = self._send(method, request_url, request_args)
+
+            if response.status_code == 304 and entry is not None:
+                return self._revalidated_response(url, key, entry, response)
+
+            self._raise_for_status(url, response)
+
+            parsed_response = self._parse_response(url, response)
+        except self.request_errors as error:
+            raise self._request_error(url, error)
+
+        entry = self.response_cache.entry_for(
+            response.status_code,
+            response.headers,
+            response.content,
+            response=parsed_response,
+        )
+        if entry is not None:
+            self.response_cache.set(key, entry)
+        return parsed_response
+
+    def _send(self, method, request_url, request_args, stream=False):
+        if stream:
+            request_args = {**request_args, "stream": True}
+
+        start = time.perf_counter()
+        response = self._get_session().request(method, request_url, **request_args)
+
+        event = CURRENT_EVENT.get()
+        if event is not None:
+            # requests only measures the time until the response headers, including connecting
+            ttfb = response.elapsed.total_seconds()
+            event.timings["ttfb"] = ttfb
+            if not stream:
+                event.timings["download"] = max(time.perf_counter() - start - ttfb, 0)
+                event.response_bytes = len(response.content)
+        return response
+
+    def _get_session(self):
+        if self._session_pid != os.getpid():
+            self._reset_after_fork()
+
+        with self._session_lock:
+            now = time.monotonic()
+            if self._session is not None and self._session_expired(now):
+                self._session.close()
+                self._session = None
+            if self._session is None:
+                self._session = self._create_session()
+            self._session_last_used = now
+            return self._session
+
+    def _reset_after_fork(self):
+        # The connections belong to the parent process: drop them without closing
+        # them, and replace the lock, which another thread may have held when forking.
+        self._session_lock = threading.Lock()
+        self._session = None
+        self._session_pid = os.getpid()
+
+    def _session_expired(self, now):
+        if self.pool_keepalive_timeout is None:
+            return False
+        return now - self._session_last_used > self.pool_keepalive_timeout
+
+    def _create_session(self):
+        from http.cookiejar import DefaultCookiePolicy
+
+        import_requests()
+        session = requests.Session()
+
+        # Each request used to run in its own session, so don't let cookies leak
+        # from one request to the next now that the session is shared.
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+        if self.response_encodings is not None:
+            session.headers["Accept-Encoding"] = self._accept_encoding()
+
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _supported_response_encodings(self):
+        # urllib3 decodes the encodings it advertises by default, including `br` and
+        # `zstd` when the optional libraries are installed
+        from urllib3.util.request import ACCEPT_ENCODING
+        return [encoding.strip() for encoding in ACCEPT_ENCODING.split(",")] + ["identity"]
+
+    def _raise_for_status(self, url, response):
+        try:
+            response.raise_for_status()
+        except import_requests().exceptions.HTTPError as error:
+            error_class = self._map_http_error_class(error)
+            raise error_class(self.service_name, url, error, self._parse_response(url, response))
 
 class ShuttleResponse:
 
-    def __init__(self, data, status_code, headers):
-        self.data = data
+    def __init__(self, data, status_code, headers, content=None):
+        self._data = data
+        self._parse_data = None
         self.status_code = status_code
         self.headers = ShuttleHeaders(headers)
+        # Raw body of the response
+        self.content = content
+
+    @classmethod
+    def lazy(cls, parse_data, status_code, headers, content):
+        """
+        Builds a response whose data is only parsed, by calling `parse_data()`,
+        when first accessed.
+        """
+        response = cls(None, status_code, headers, content)
+        response._parse_data = parse_data
+        return response
+
+    @property
+    def data(self):
+        if self._parse_data is not None:
+            self._data = self._parse_data()
+            self._parse_data = None
+        return self._data
 
 class ShuttleHeaders(Mapping):
     """
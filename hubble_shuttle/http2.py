@@ -0,0 +1,92 @@
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+from . import async_http
+from .async_http import HTTPXAsyncShuttleTransport, HTTPXTransportMixin, import_httpx
+from .http import RequestsShuttleTransport
+from .instrumentation import CURRENT_EVENT
+
+def _check_http2_dependencies(transport_class):
+    if import_httpx() is None or h2 is None:
+        raise ImportError("{} requires httpx and h2: pip install hubble_shuttle[http2]".format(transport_class.__name__))
+
+def _http2_options(api_endpoint):
+    # Plain HTTP connections can't negotiate the protocol, so HTTP/2 is sent
+    # straight away (h2c with prior knowledge). TLS connections negotiate it with
+    # ALPN, and fall back to HTTP/1.1 for hosts without HTTP/2 support.
+    return {"http2": True, "http1": not api_endpoint.startswith("http://")}
+
+class HTTP2ShuttleTransport(HTTPXTransportMixin, RequestsShuttleTransport):
+    """
+    Transport speaking HTTP/2, using a shared `httpx.Client`. Concurrent requests
+    from several threads, for example in `http_batch`, are multiplexed as streams
+    of a single connection per host, with HPACK compressed headers.
+    Requires the `http2` extra: `pip install hubble_shuttle[http2]`.
+    """
+
+    @property
+    def request_errors(self):
+        return async_http.httpx.HTTPError
+
+    def __init__(self, **kwargs):
+        _check_http2_dependencies(type(self))
+        super().__init__(**kwargs)
+
+    def _send(self, method, request_url, request_args, stream=False):
+        client = self._get_session()
+        request_url, request_args = self._with_query(request_url, request_args)
+        request = client.build_request(method, request_url, **self._with_trace(request_args))
+        response = client.send(request, stream=stream)
+
+        event = CURRENT_EVENT.get()
+        if event is not None and not stream:
+            event.response_bytes = len(response.content)
+        return response
+
+    def _with_trace(self, request_args):
+        event = CURRENT_EVENT.get()
+        if event is None:
+            return request_args
+        return {**request_args, "extensions": {"trace": self._trace_recorder(event)}}
+
+    def _iter_chunks(self, url, response, chunk_size):
+        try:
+            yield from response.iter_bytes(chunk_size)
+        except self.request_errors as error:
+            raise self._request_error(url, error)
+
+    def _body_reader(self, url, response):
+        # The chunks of httpx responses are copied into the buffer
+        return None
+
+    def _raise_for_status(self, url, response):
+        if response.is_error:
+            # The body of streamed responses isn't read yet
+            response.read()
+        super()._raise_for_status(url, response)
+
+    def _create_session(self):
+        return async_http.httpx.Client(
+            # As with requests, don't let cookies leak from one request to the next
+            cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+            **self._client_options(),
+            **_http2_options(self.api_endpoint),
+        )
+
+class HTTP2AsyncShuttleTransport(HTTPXAsyncShuttleTransport):
+    """
+    Asynchronous transport speaking HTTP/2, multiplexing the concurrent requests
+    as streams of a single connection per host.
+    Requires the `http2` extra: `pip install hubble_shuttle[http2]`.
+    """
+
+    def __init__(self, **kwargs):
+        _check_http2_dependencies(type(self))
+        super().__init__(**kwargs)
+
+    def _create_client(self):
+        return async_http.httpx.AsyncClient(**self._client_options(), **_http2_options(self.api_endpoint))
@@ -0,0 +1,273 @@
+import contextvars
+import re
+import threading
+import time
+
+from bisect import bisect_left
+
+from .exceptions import HTTPError
+
+# Event of the request currently sent, for transports to record its timings
+CURRENT_EVENT = contextvars.ContextVar("hubble_shuttle_request_event", default=None)
+
+# Path segments replaced by `{id}` in endpoint labels: numbers, UUIDs and long hexadecimal identifiers
+ID_SEGMENT = re.compile(r"^(?:\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{16,})$", re.IGNORECASE)
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+class RequestEvent:
+    """
+    Describes a request to the instrumentation hooks.
+
+    `timings` holds the duration in seconds of each phase the transport could
+    measure: `connect` (including DNS resolution), `tls`, `ttfb` (waiting for
+    the response headers) and `download` (reading the body). `duration` is the
+    total duration of the request.
+    """
+
+    __slots__ = (
+        "service_name", "method", "url", "path", "status_code",
+        "request_bytes", "response_bytes", "timings", "start", "duration", "error",
+    )
+
+    def __init__(self, service_name, method, url, path=None, request_bytes=None):
+        self.service_name = service_name
+        self.method = method
+        self.url = url
+        # Templated path of the request, used as the endpoint label
+        self.path = path or path_template(url)
+        self.status_code = None
+        self.request_bytes = request_bytes
+        self.response_bytes = None
+        self.timings = {}
+        self.start = time.perf_counter()
+        self.duration = None
+        self.error = None
+
+    def span_attributes(self):
+        """
+        Returns the request attributes following the OpenTelemetry HTTP client
+        semantic conventions, with the phase timings as `shuttle.timing.X`.
+        """
+        attributes = {
+            "http.request.method": self.method.upper(),
+            "url.template": self.path,
+            "shuttle.service.name": self.service_name,
+        }
+        if self.status_code is not None:
+            attributes["http.response.status_code"] = self.status_code
+        if self.request_bytes is not None:
+            attributes["http.request.body.size"] = self.request_bytes
+        if self.response_bytes is not None:
+            attributes["http.response.body.size"] = self.response_bytes
+        if self.error is not None:
+            attributes["error.type"] = type(self.error).__name__
+        if self.duration is not None:
+            attributes["shuttle.timing.total"] = self.duration
+        for phase, seconds in self.timings.items():
+            attributes["shuttle.timing.{}".format(phase)] = seconds
+        return attributes
+
+    def _finish(self, response=None, error=None):
+        self.duration = time.perf_counter() - self.start
+        self.error = error
+        if response is not None:
+            self.status_code = response.status_code
+        elif isinstance(error, HTTPError):
+            self.status_code = error.internal_status_code
+            if error.content is not None:
+                self.response_bytes = len(error.content)
+
+class Instrumentation:
+    """
+    Base class for instrumentation hooks, called for each request sent by the
+    transport, including each retry attempt.
+    """
+
+    def on_request(self, event):
+        pass
+
+    def on_response(self, event, response):
+        pass
+
+    def on_error(self, event, error):
+        pass
+
+    def on_parse(self, event, duration):
+        # Response bodies are parsed lazily, after `on_response`
+        pass
+
+def instrument(hooks, event, function):
+    """
+    Calls `function()`, notifying the hooks of the request and of its outcome.
+    """
+    token = CURRENT_EVENT.set(event)
+    try:
+        for hook in hooks:
+            hook.on_request(event)
+        try:
+            response = function()
+        except Exception as error:
+            event._finish(error=error)
+            for hook in hooks:
+                hook.on_error(event, error)
+            raise
+        event._finish(response)
+        for hook in hooks:
+            hook.on_response(event, response)
+        return response
+    finally:
+        CURRENT_EVENT.reset(token)
+
+async def instrument_async(hooks, event, function):
+    """
+    Awaits `function()`, notifying the hooks of the request and of its outcome.
+    """
+    token = CURRENT_EVENT.set(event)
+    try:
+        for hook in hooks:
+            hook.on_request(event)
+        try:
+            response = await function()
+        except Exception as error:
+            event._finish(error=error)
+            for hook in hooks:
+                hook.on_error(event, error)
+            raise
+        event._finish(response)
+        for hook in hooks:
+            hook.on_response(event, response)
+        return response
+    finally:
+        CURRENT_EVENT.reset(token)
+
+def timed_parse(hooks, event, parse_data):
+    """
+    Wraps the lazy parsing of a response body, to report its duration to the hooks.
+    """
+    def parse():
+        start = time.perf_counter()
+        try:
+            return parse_data()
+        finally:
+            duration = time.perf_counter() - start
+            for hook in hooks:
+                hook.on_parse(event, duration)
+    return parse
+
+def path_template(url):
+    """
+    Returns the path of a URL without its query string, with the identifiers replaced by `{id}`.
+    """
+    path = url.split("?", 1)[0]
+    return "/".join("{id}" if ID_SEGMENT.match(segment) else segment for segment in path.split("/"))
+
+class Histogram:
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.sum = 0
+        self.count = 0
+
+class LatencyHistograms(Instrumentation):
+    """
+    Aggregates the latency of the requests in fixed-bucket histograms, per
+    service, method, endpoint and phase (`total`, `parse`, and the timings of
+    the transport). Recording a value is a bisection and a few increments.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def on_response(self, event, response):
+        self._observe_event(event)
+
+    def on_error(self, event, error):
+        self._observe_event(event)
+
+    def on_parse(self, event, duration):
+        self.observe(event.service_name, event.method, event.path, "parse", duration)
+
+    def observe(self, service_name, method, path, phase, seconds):
+        key = (service_name, method.upper(), path, phase)
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(len(self.buckets) + 1)
+            histogram.counts[index] += 1
+            histogram.sum += seconds
+            histogram.count += 1
+
+    def percentiles(self, service_name, method, path, phase="total"):
+        """
+        Returns the estimated p50, p95 and p99 latencies of an endpoint in
+        seconds, or None if it doesn't have any request.
+        """
+        with self._lock:
+            histogram = self._histograms.get((service_name, method.upper(), path, phase))
+            if histogram is None:
+                return None
+            counts = list(histogram.counts)
+        return {
+            "p50": self._quantile(counts, 0.5),
+            "p95": self._quantile(counts, 0.95),
+            "p99": self._quantile(counts, 0.99),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def _observe_event(self, event):
+        self.observe(event.service_name, event.method, event.path, "total", event.duration)
+        for phase, seconds in event.timings.items():
+            self.observe(event.service_name, event.method, event.path, phase, seconds)
+
+    def to_prometheus(self, name="shuttle_request_duration_seconds"):
+        """
+        Returns the histograms in the Prometheus text exposition format.
+        """
+        with self._lock:
+            histograms = [(key, list(histogram.counts), histogram.sum, histogram.count) for key, histogram in self._histograms.items()]
+
+        lines = [
+            "# HELP {} Duration of the requests sent by Shuttle clients, by phase.".format(name),
+            "# TYPE {} histogram".format(name),
+        ]
+        for (service_name, method, path, phase), counts, total, count in sorted(histograms):
+            labels = 'service="{}",method="{}",endpoint="{}",phase="{}"'.format(
+                _escape_label(service_name), method, _escape_label(path), phase,
+            )
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(name, labels, _format_bound(bound), cumulative))
+            lines.append('{}_bucket{{{},le="+Inf"}} {}'.format(name, labels, count))
+            lines.append("{}_sum{{{}}} {}".format(name, labels, repr(float(total))))
+            lines.append("{}_count{{{}}} {}".format(name, labels, count))
+        return "\n".join(lines) + "\n"
+
+    def _quantile(self, counts, quantile):
+        # Linear interpolation within the bucket holding the quantile, as Prometheus' histogram_quantile
+        rank = quantile * sum(counts)
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return None
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_bound(bound):
+    return repr(float(bound))
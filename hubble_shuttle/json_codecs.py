@@ -0,0 +1,50 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class StdlibJSONCodec:
+    """
+    JSON codec using the standard library `json` module, encoding like requests
+    does: NaN and infinity aren't valid JSON, and raise a ValueError.
+    """
+
+    def dumps(self, data):
+        return json.dumps(data, allow_nan=False).encode("utf-8")
+
+    def loads(self, content):
+        return json.loads(content)
+
+class OrjsonJSONCodec:
+    """
+    JSON codec using `orjson`, which encodes to and decodes from bytes directly
+    and is much faster than the standard library on large payloads.
+
+    Unlike the standard library, orjson encodes NaN and infinity as `null`, and
+    decodes integers beyond 64 bits as floats. Data orjson can't encode, such as
+    these integers, is encoded by the standard library instead.
+    """
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("OrjsonJSONCodec requires orjson: pip install hubble_shuttle[orjson]")
+        self._fallback = StdlibJSONCodec()
+
+    def dumps(self, data):
+        try:
+            # Non-string keys, such as integers, are converted to strings like `json` does
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            return self._fallback.dumps(data)
+
+    def loads(self, content):
+        return orjson.loads(content)
+
+def default_json_codec():
+    """
+    Returns the default JSON codec, using the standard library. orjson is opt-in,
+    as it doesn't encode and decode all the data the same way.
+    """
+    return StdlibJSONCodec()
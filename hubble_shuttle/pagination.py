@@ -0,0 +1,102 @@
+import re
+
+# Link header values, for example: `<https://host/users?page=2>; rel="next"`
+LINK_VALUE = re.compile(r'<([^>]*)>\s*((?:;\s*[^;,]*)*)')
+LINK_REL = re.compile(r';\s*rel\s*=\s*"?([^";]*)"?', re.IGNORECASE)
+
+class Pagination:
+    """
+    Base class for pagination strategies, used by `ShuttleAPI.http_paginate`.
+
+    A page request is a `(url, kwargs)` tuple, where `kwargs` are the arguments
+    passed to `http_get`. Strategies return the items of each page, and the
+    request for the next page.
+    """
+
+    def __init__(self, items_field=None):
+        # Field of the response body holding the items, or None if the body is the list of items
+        self.items_field = items_field
+
+    def first_request(self, url, kwargs):
+        return url, kwargs
+
+    def next_request(self, response, request):
+        raise NotImplementedError()
+
+    def items(self, response):
+        if self.items_field is None:
+            return response.data
+        return response.data[self.items_field]
+
+class LinkHeaderPagination(Pagination):
+    """
+    Follows the `next` URL of the `Link` response header (RFC 8288).
+    """
+
+    def next_request(self, response, request):
+        next_url = parse_link_header(response.headers.get("Link", "")).get("next")
+        if next_url is None:
+            return None
+
+        # The next URL already contains the query parameters of the request
+        url, kwargs = request
+        return next_url, {key: value for key, value in kwargs.items() if key != "query"}
+
+class CursorPagination(Pagination):
+    """
+    Sends the cursor found in the `cursor_field` of the response body as the
+    `cursor_param` query parameter, until the response doesn't have a cursor.
+    """
+
+    def __init__(self, items_field="results", cursor_field="next_cursor", cursor_param="cursor"):
+        super().__init__(items_field)
+        self.cursor_field = cursor_field
+        self.cursor_param = cursor_param
+
+    def next_request(self, response, request):
+        cursor = response.data.get(self.cursor_field)
+        if not cursor:
+            return None
+
+        url, kwargs = request
+        return url, {**kwargs, "query": {**(kwargs.get("query") or {}), self.cursor_param: cursor}}
+
+class OffsetPagination(Pagination):
+    """
+    Requests pages of `limit` items with the `offset_param` and `limit_param`
+    query parameters, until a page has less than `limit` items.
+    """
+
+    def __init__(self, items_field="results", limit=100, offset_param="offset", limit_param="limit"):
+        super().__init__(items_field)
+        self.limit = limit
+        self.offset_param = offset_param
+        self.limit_param = limit_param
+
+    def first_request(self, url, kwargs):
+        return url, self._with_offset(kwargs, 0)
+
+    def next_request(self, response, request):
+        if len(self.items(response)) < self.limit:
+            return None
+
+        url, kwargs = request
+        return url, self._with_offset(kwargs, kwargs["query"][self.offset_param] + self.limit)
+
+    def _with_offset(self, kwargs, offset):
+        return {
+            **kwargs,
+            "query": {**(kwargs.get("query") or {}), self.offset_param: offset, self.limit_param: self.limit},
+        }
+
+def parse_link_header(value):
+    """
+    Returns the URLs of a `Link` header, by relation type.
+    """
+    links = {}
+    for match in LINK_VALUE.finditer(value):
+        rel = LINK_REL.search(match.group(2))
+        if rel:
+            for rel_type in rel.group(1).split():
+                links.setdefault(rel_type.lower(), match.group(1))
+    return links
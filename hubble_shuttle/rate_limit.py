@@ -0,0 +1,227 @@
+import asyncio
+import re
+import threading
+import time
+
+from .deadline import time_remaining
+from .exceptions import DeadlineExceededError, HTTPError, RateLimitExceededError
+from .retry import parse_retry_after
+from .sqlite import SQLiteConnections
+
+class Rate:
+    """
+    Allows `limit` requests per `period` seconds, with bursts of up to `burst`
+    requests (defaults to `limit`).
+    """
+
+    def __init__(self, limit, period=1, burst=None):
+        self.limit = limit
+        self.period = period
+        self.burst = burst or max(limit, 1)
+
+    @property
+    def per_second(self):
+        return self.limit / self.period
+
+class RateLimiter:
+    """
+    Client-side token bucket rate limiter.
+
+    Each service has a bucket allowing `limit` requests per `period` seconds, and
+    requests to URLs matching one of the `endpoints` regular expressions also
+    take a token from the bucket of the pattern, configured with a `Rate`.
+
+    When a bucket is empty, requests wait for a token, for at most `max_wait`
+    seconds and until the current deadline, or raise a `RateLimitExceededError`
+    right away without `block`. Buckets adapt to the `X-RateLimit-Remaining`,
+    `X-RateLimit-Reset` and `Retry-After` headers of the responses.
+
+    Buckets are kept in memory by default, or in a `SQLiteBucketBackend` to be
+    shared by all the processes on a host.
+    """
+
+    def __init__(self, limit, period=1, burst=None, endpoints=None, block=True, max_wait=None, backend=None):
+        self.rate = Rate(limit, period, burst)
+        self.endpoints = [(re.compile(pattern), rate) for pattern, rate in (endpoints or {}).items()]
+        self.block = block
+        self.max_wait = max_wait
+        self.backend = backend or MemoryBucketBackend()
+
+    def call(self, service_name, url, function, route=None):
+        """
+        Calls `function()` once the request is allowed, and adapts the buckets to its response.
+        The endpoint patterns are matched against the `route` template when given.
+        """
+        buckets = self._buckets(service_name, route or url)
+        delay = self.acquire(service_name, url, buckets)
+        if delay > 0:
+            time.sleep(delay)
+
+        try:
+            response = function()
+        except HTTPError as error:
+            self.update(buckets, error.headers)
+            raise
+        self.update(buckets, response.headers)
+        return response
+
+    async def call_async(self, service_name, url, function, route=None):
+        """
+        Awaits `function()` once the request is allowed, and adapts the buckets to its response.
+        The endpoint patterns are matched against the `route` template when given.
+        """
+        buckets = self._buckets(service_name, route or url)
+        delay = self.acquire(service_name, url, buckets)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        try:
+            response = await function()
+        except HTTPError as error:
+            self.update(buckets, error.headers)
+            raise
+        self.update(buckets, response.headers)
+        return response
+
+    def acquire(self, service_name, url, buckets):
+        """
+        Takes a token from each bucket of the request, and returns the number of
+        seconds to wait before sending it.
+        """
+        max_wait = self.max_wait if self.block else 0
+        remaining = time_remaining()
+        if remaining is not None and (max_wait is None or remaining < max_wait):
+            max_wait = max(remaining, 0)
+            error_class = DeadlineExceededError
+        else:
+            error_class = RateLimitExceededError
+
+        delays = []
+        for key, rate in buckets:
+            delay = self.backend.update(key, lambda state, now: _reserve(state, now, rate, max_wait))
+            if delay is None:
+                # Give back the tokens taken from the other buckets
+                for reserved_key, reserved_rate in buckets[:len(delays)]:
+                    self.backend.update(reserved_key, lambda state, now: _release(state, now, reserved_rate))
+                raise error_class(service_name, url, None)
+            delays.append(delay)
+        return max(delays)
+
+    def update(self, buckets, headers):
+        """
+        Adapts the buckets of a request to the rate limit headers of its response.
+        """
+        remaining = _parse_number(headers.get("X-RateLimit-Remaining", headers.get("RateLimit-Remaining")))
+        blocked_for = parse_retry_after(headers.get("Retry-After"))
+        if blocked_for is None and remaining is not None and remaining < 1:
+            blocked_for = _parse_reset(headers.get("X-RateLimit-Reset", headers.get("RateLimit-Reset")))
+        if remaining is None and blocked_for is None:
+            return
+
+        for key, rate in buckets:
+            self.backend.update(key, lambda state, now: _adapt(state, now, rate, remaining, blocked_for))
+
+    def reset(self):
+        self.backend.clear()
+
+    def _buckets(self, service_name, url):
+        buckets = [(service_name, self.rate)]
+        for pattern, rate in self.endpoints:
+            if pattern.search(url):
+                buckets.append(("{} {}".format(service_name, pattern.pattern), rate))
+        return buckets
+
+# Buckets are stored as (tokens, updated, blocked_until) tuples, where `tokens` is
+# the number of tokens at the `updated` time, and can go negative when requests
+# wait for their token. Each function returns the new state of the bucket and a result.
+
+def _reserve(state, now, rate, max_wait):
+    tokens, updated, blocked_until = state or (rate.burst, now, 0)
+
+    # Tokens are only refilled once the bucket isn't blocked anymore
+    start = max(now, blocked_until)
+    tokens = min(rate.burst, tokens + max(start - max(updated, blocked_until), 0) * rate.per_second)
+    delay = start - now + max((1 - tokens) / rate.per_second, 0)
+    if max_wait is not None and delay > max_wait:
+        return state, None
+    return (tokens - 1, start, blocked_until), delay
+
+def _release(state, now, rate):
+    tokens, updated, blocked_until = state
+    return (min(tokens + 1, rate.burst), updated, blocked_until), None
+
+def _adapt(state, now, rate, remaining, blocked_for):
+    tokens, updated, blocked_until = state or (rate.burst, now, 0)
+    if remaining is not None:
+        tokens = min(tokens, remaining)
+    if blocked_for:
+        tokens = min(tokens, 0)
+        blocked_until = max(blocked_until, now + blocked_for)
+    return (tokens, updated, blocked_until), None
+
+def _parse_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _parse_reset(value):
+    reset = _parse_number(value)
+    if reset is None:
+        return None
+    # Either a number of seconds, or a Unix timestamp
+    if reset > 1e9:
+        reset -= time.time()
+    return max(reset, 0)
+
+class MemoryBucketBackend:
+    """
+    Keeps the buckets in memory, shared by the threads of the process.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def update(self, key, function):
+        with self._lock:
+            state, result = function(self._buckets.get(key), time.monotonic())
+            self._buckets[key] = state
+            return result
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+class SQLiteBucketBackend:
+    """
+    Keeps the buckets in a SQLite database, shared by all the processes on a host.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connections = SQLiteConnections(path)
+
+        with self._connections.connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS shuttle_rate_limit ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, blocked_until REAL NOT NULL)"
+            )
+
+    def update(self, key, function):
+        with self._connections.connect() as connection:
+            # Lock the database from the read, so that processes update buckets one at a time
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT tokens, updated, blocked_until FROM shuttle_rate_limit WHERE key = ?", (key,)
+            ).fetchone()
+            state, result = function(row, time.time())
+            connection.execute(
+                "INSERT OR REPLACE INTO shuttle_rate_limit (key, tokens, updated, blocked_until) VALUES (?, ?, ?, ?)",
+                (key, *state),
+            )
+        return result
+
+    def clear(self):
+        with self._connections.connect() as connection:
+            connection.execute("DELETE FROM shuttle_rate_limit")
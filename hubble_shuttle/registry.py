@@ -0,0 +1,109 @@
+import os
+import threading
+import weakref
+
+class TransportRegistry:
+    """
+    Transports shared by all the client instances of the process, so that creating
+    a client doesn't build a transport, and its connection pool stays warm.
+
+    Transports are kept per client class, as they carry the settings of the class,
+    and per connection settings and other settings overridden by the instance, up to `max_transports` per class,
+    after which the oldest one is dropped. They are dropped with their class, or
+    replaced when the settings of the class change. In forked processes, they
+    open new connections rather than using the ones of the parent process.
+    """
+
+    def __init__(self, max_transports=32):
+        self.max_transports = max_transports
+        self._transports = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, client_class, key, create, settings=None):
+        """
+        Returns the transport of a client class for the key, created with
+        `create()` the first time, and again when its `settings` changed.
+        """
+        transports = self._transports.get(client_class)
+        if transports is not None:
+            entry = transports.get(key)
+            if entry is not None and entry[0] == settings:
+                return entry[1]
+
+        with self._lock:
+            transports = self._transports.setdefault(client_class, {})
+            entry = transports.get(key)
+            if entry is None or entry[0] != settings:
+                # Dropped transports release their connections once the instances
+                # still using them are garbage collected
+                transports.pop(key, None)
+                while len(transports) >= self.max_transports:
+                    del transports[next(iter(transports))]
+                entry = transports[key] = (settings, create())
+            return entry[1]
+
+    def close(self):
+        """
+        Releases the connections of all the transports.
+        """
+        with self._lock:
+            transports = [transport for by_key in self._transports.values() for _, transport in by_key.values()]
+        for transport in transports:
+            transport.close()
+
+    def _after_fork(self):
+        # Another thread may have held the lock when forking. The transports drop the
+        # connections inherited from the parent process themselves.
+        self._lock = threading.Lock()
+
+class TransportOverlay:
+    """
+    A shared transport, sending the headers and query parameters of a client
+    instance instead of the ones of its class.
+    """
+
+    def __init__(self, transport, defaults):
+        self.transport = transport
+        self.defaults = defaults
+
+    def __getattr__(self, name):
+        return getattr(self.transport, name)
+
+    def get(self, url, **kwargs):
+        return self.transport.get(url, defaults=self.defaults, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.transport.post(url, defaults=self.defaults, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.transport.put(url, defaults=self.defaults, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.transport.patch(url, defaults=self.defaults, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.transport.delete(url, defaults=self.defaults, **kwargs)
+
+def settings_key(value):
+    """
+    Returns a hashable version of a setting, comparing dicts and lists by value.
+    Other values are returned as they are, and may not be hashable.
+    """
+    if isinstance(value, dict):
+        return frozenset((key, settings_key(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(settings_key(item) for item in value)
+    return value
+
+# Transports shared by the ShuttleAPI clients of the process
+TRANSPORTS = TransportRegistry()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=TRANSPORTS._after_fork)
+
+def close_transports():
+    """
+    Releases the connections of all the shared transports, for example when
+    shutting down. They are opened again by the next requests.
+    """
+    TRANSPORTS.close()
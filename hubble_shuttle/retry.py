@@ -0,0 +1,127 @@
+import asyncio
+import random
+import time
+
+from email.utils import parsedate_to_datetime
+
+from .deadline import time_remaining
+from .exceptions import APIError, HTTPError
+
+IDEMPOTENT_METHODS = frozenset(["get", "head", "options", "put", "delete"])
+RETRY_STATUS_CODES = frozenset([429, 502, 503, 504])
+
+class RetryPolicy:
+    """
+    Declarative retry policy for transient failures.
+
+    Requests are retried up to `max_attempts` times in total when they fail with
+    one of the `status_codes`, or with a networking error. Only `methods` are
+    retried, which defaults to the idempotent methods.
+
+    Retries wait for a random delay between 0 and `backoff_factor * 2 ** (attempt - 1)`
+    seconds, capped to `max_backoff` ("full jitter"), or for the delay given by a
+    `Retry-After` response header if longer. No retry is attempted if the
+    `Retry-After` delay is longer than `max_retry_after` seconds (defaults to
+    `max_backoff`), if it would take longer than `total_timeout` seconds since
+    the first attempt, or if it would start after the current deadline (see
+    hubble_shuttle.deadline).
+    """
+
+    def __init__(
+        self,
+        max_attempts=3,
+        backoff_factor=0.1,
+        max_backoff=10,
+        total_timeout=None,
+        status_codes=RETRY_STATUS_CODES,
+        methods=IDEMPOTENT_METHODS,
+        retry_network_errors=True,
+        max_retry_after=None,
+    ):
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.total_timeout = total_timeout
+        self.status_codes = frozenset(status_codes)
+        self.methods = frozenset(method.lower() for method in methods)
+        self.retry_network_errors = retry_network_errors
+        self.max_retry_after = max_backoff if max_retry_after is None else max_retry_after
+
+    def call(self, method, function):
+        """
+        Calls `function()`, retrying it according to the policy.
+        """
+        start = time.monotonic()
+        attempt = 1
+        while True:
+            try:
+                return function()
+            except APIError as error:
+                delay = self.retry_delay(method, error, attempt, time.monotonic() - start)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    async def call_async(self, method, function):
+        """
+        Awaits `function()`, retrying it according to the policy.
+        """
+        start = time.monotonic()
+        attempt = 1
+        while True:
+            try:
+                return await function()
+            except APIError as error:
+                delay = self.retry_delay(method, error, attempt, time.monotonic() - start)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def retry_delay(self, method, error, attempt, elapsed):
+        """
+        Returns the number of seconds to wait before retrying a request that
+        failed with `error`, or None if it shouldn't be retried.
+        """
+        if attempt >= self.max_attempts or not self.is_retryable(method, error):
+            return None
+
+        delay = random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** (attempt - 1)))
+        if isinstance(error, HTTPError):
+            retry_after = parse_retry_after(error.headers.get("Retry-After")) or 0
+            # Rather than blocking the caller for as long as the service asks
+            if retry_after > self.max_retry_after:
+                return None
+            delay = max(delay, retry_after)
+
+        if self.total_timeout is not None and elapsed + delay > self.total_timeout:
+            return None
+        remaining = time_remaining()
+        if remaining is not None and delay >= remaining:
+            return None
+        return delay
+
+    def is_retryable(self, method, error):
+        if method.lower() not in self.methods:
+            return False
+        if isinstance(error, HTTPError):
+            return error.internal_status_code in self.status_codes
+        # Networking errors are plain APIErrors, subclasses are raised by Shuttle itself
+        return self.retry_network_errors and type(error) is APIError
+
+def parse_retry_after(value):
+    """
+    Returns the number of seconds to wait from a `Retry-After` header, given
+    either as a number of seconds or as an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
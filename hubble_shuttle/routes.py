@@ -0,0 +1,48 @@
+from functools import lru_cache
+from string import Formatter
+from urllib.parse import quote, urljoin
+
+class Route:
+    """
+    A URL template such as `/users/{id}`, split once into its literal parts and
+    the names of its path parameters.
+    """
+
+    def __init__(self, template):
+        self.template = template
+
+        parts = list(Formatter().parse(template))
+        # printf-style format of the URL, with a `%s` placeholder for each path parameter
+        self._format = "".join(
+            literal.replace("%", "%%") + ("" if field is None else "%s")
+            for literal, field, _, _ in parts
+        )
+        self.fields = tuple(field for literal, field, _, _ in parts if field is not None)
+
+    def format(self, path_params):
+        """
+        Returns the URL with the values of the path parameters, percent-encoded.
+        """
+        try:
+            if len(self.fields) == 1:
+                return self._format % _quote(path_params[self.fields[0]])
+            return self._format % tuple([_quote(path_params[field]) for field in self.fields])
+        except KeyError as error:
+            raise ValueError("Missing path parameter for {}: {}".format(self.template, error.args[0]))
+
+def _quote(value):
+    # Integers, the most common path parameters, never need quoting
+    if type(value) is int:
+        return str(value)
+    return quote(str(value), safe="")
+
+@lru_cache(maxsize=1024)
+def compile_route(template):
+    return Route(template)
+
+@lru_cache(maxsize=1024)
+def join_url(api_endpoint, url):
+    """
+    Returns the absolute URL of a path relative to the API endpoint.
+    """
+    return urljoin(api_endpoint, url.lstrip("/"))
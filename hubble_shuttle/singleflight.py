@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls across threads: while a call for a key
+    is running, other callers for the same key wait for it and share its result
+    or exception, instead of running the call again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class AsyncSingleFlight:
+    """
+    Coalesces identical concurrent calls within an event loop. The call runs in
+    its own task, so cancelling one of the callers doesn't cancel it for the others.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, function):
+        loop = asyncio.get_running_loop()
+        task_key = (loop, key)
+        task = self._tasks.get(task_key)
+        if task is None:
+            task = loop.create_task(function())
+            self._tasks[task_key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(task_key, None))
+        return await asyncio.shield(task)
@@ -0,0 +1,24 @@
+import os
+import sqlite3
+import threading
+
+class SQLiteConnections:
+    """
+    Connections to a SQLite database shared by all the processes on a host, used
+    by the SQLite cache and rate limiter backends. SQLite connections can't be
+    shared between threads or forked processes, so each thread of each process
+    opens its own.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def connect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
@@ -0,0 +1,227 @@
+import re
+
+from .exceptions import APIError
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# Tokens that matter when splitting a JSON array into its items: complete strings
+# (skipped as a whole), structural characters, and the quote of an incomplete string
+JSON_TOKENS = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{},"]', re.DOTALL)
+
+class NDJSONDecoder:
+    """
+    Incremental decoder for newline-delimited JSON, decoding each record as soon
+    as its line is complete.
+    """
+
+    def __init__(self, loads):
+        self._loads = loads
+        self._buffer = b""
+
+    def feed(self, chunk):
+        lines = (self._buffer + chunk).split(b"\n")
+        self._buffer = lines.pop()
+        return [self._loads(line) for line in lines if line.strip()]
+
+    def close(self):
+        line, self._buffer = self._buffer, b""
+        if line.strip():
+            return [self._loads(line)]
+        return []
+
+class JSONArrayDecoder:
+    """
+    Incremental decoder for a top-level JSON array, decoding each item of the
+    array as soon as it is complete. Only the item being received is kept in
+    memory.
+    """
+
+    def __init__(self, loads):
+        self._loads = loads
+        self._buffer = bytearray()
+        # Position up to which the buffer has been scanned
+        self._position = 0
+        # Nesting depth, where 1 is directly inside the top-level array
+        self._depth = 0
+        self._finished = False
+
+    def feed(self, chunk):
+        if self._finished:
+            if chunk.strip():
+                raise ValueError("Unexpected content after the end of the JSON array")
+            return []
+
+        self._buffer += chunk
+        buffer = self._buffer
+        items = []
+        item_start = 0
+        position = self._position
+
+        if self._depth == 0:
+            stripped = buffer.lstrip()
+            if not stripped:
+                self._buffer = bytearray()
+                return []
+            if stripped[:1] != b"[":
+                raise ValueError("Expected a JSON array")
+            position = item_start = len(buffer) - len(stripped) + 1
+            self._depth = 1
+
+        for match in JSON_TOKENS.finditer(buffer, position):
+            token = match.group()
+            if len(token) > 1:
+                # A complete string
+                continue
+
+            position = match.start()
+            if token == b'"':
+                # The end of the string is in the next chunks
+                break
+
+            position = match.end()
+            if token in b"[{":
+                self._depth += 1
+            elif self._depth > 1:
+                if token in b"]}":
+                    self._depth -= 1
+            elif token in b",]":
+                item = bytes(buffer[item_start:match.start()]).strip()
+                if item:
+                    items.append(self._loads(item))
+                elif token == b",":
+                    raise ValueError("Unexpected ',' in JSON array")
+                item_start = position
+                if token == b"]":
+                    self._finished = True
+                    if buffer[position:].strip():
+                        raise ValueError("Unexpected content after the end of the JSON array")
+                    self._buffer = bytearray()
+                    self._position = 0
+                    return items
+            else:
+                raise ValueError("Unexpected '}' in JSON array")
+        else:
+            position = len(buffer)
+
+        # Only keep the item being received
+        del buffer[:item_start]
+        self._position = position - item_start
+        return items
+
+    def close(self):
+        if not self._finished:
+            raise ValueError("Incomplete JSON array")
+        return []
+
+class ShuttleStreamingResponse:
+    """
+    Response whose body is read from the server while it is being iterated,
+    rather than loaded in memory. The body can only be iterated once, and the
+    connection is released once the body is exhausted or the response closed.
+    """
+
+    def __init__(self, iter_chunks, status_code, headers, close, json_codec, service_name, source, readinto=None):
+        self._iter_chunks = iter_chunks
+        # Reads the body straight into a buffer, when the backend supports it
+        self._readinto = readinto
+        self._chunks = None
+        self._pending = memoryview(b"")
+        self._close = close
+        self._json_codec = json_codec
+        self._service_name = service_name
+        self._source = source
+        self.status_code = status_code
+        self.headers = headers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._close()
+
+    def iter_bytes(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        try:
+            yield from self._iter_chunks(chunk_size)
+        finally:
+            self.close()
+
+    def readinto(self, buffer):
+        """
+        Reads the next bytes of the body into a writable buffer, such as a slice
+        of a `mmap`, and returns their number, which is 0 at the end of the body.
+        """
+        if self._readinto is not None:
+            return self._readinto(buffer)
+        if not self._pending:
+            if self._chunks is None:
+                self._chunks = self._iter_chunks(DEFAULT_CHUNK_SIZE)
+            self._pending = memoryview(next(self._chunks, b""))
+        return self._copy_pending(buffer)
+
+    def _copy_pending(self, buffer):
+        read = min(len(buffer), len(self._pending))
+        buffer[:read] = self._pending[:read]
+        self._pending = self._pending[read:]
+        return read
+
+    def iter_ndjson(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        return self._iter_decoded(NDJSONDecoder(self._json_codec.loads), chunk_size)
+
+    def iter_json_array(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        return self._iter_decoded(JSONArrayDecoder(self._json_codec.loads), chunk_size)
+
+    def _iter_decoded(self, decoder, chunk_size):
+        try:
+            for chunk in self.iter_bytes(chunk_size):
+                yield from decoder.feed(chunk)
+            yield from decoder.close()
+        except ValueError as error:
+            raise APIError(self._service_name, self._source, error)
+        finally:
+            self.close()
+
+class AsyncShuttleStreamingResponse(ShuttleStreamingResponse):
+    """
+    asyncio flavour of ShuttleStreamingResponse, where the body is iterated with `async for`.
+    """
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        await self._close()
+
+    async def iter_bytes(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        try:
+            async for chunk in self._iter_chunks(chunk_size):
+                yield chunk
+        finally:
+            await self.close()
+
+    async def readinto(self, buffer):
+        if not self._pending:
+            if self._chunks is None:
+                self._chunks = self._iter_chunks(DEFAULT_CHUNK_SIZE)
+            try:
+                self._pending = memoryview(await self._chunks.__anext__())
+            except StopAsyncIteration:
+                return 0
+        return self._copy_pending(buffer)
+
+    async def _iter_decoded(self, decoder, chunk_size):
+        try:
+            async for chunk in self.iter_bytes(chunk_size):
+                for item in decoder.feed(chunk):
+                    yield item
+            for item in decoder.close():
+                yield item
+        except ValueError as error:
+            raise APIError(self._service_name, self._source, error)
+        finally:
+            await self.close()
@@ -0,0 +1,49 @@
+import json
+import requests
+
+from hubble_shuttle import AsyncShuttleAPI, ShuttleAPI
+from hubble_shuttle.exceptions import APIError
+from hubble_shuttle.http import ShuttleResponse
+
+SERVICE_NAME = "a-service-name"
+
+
+class ShuttleAPITestClient(ShuttleAPI):
+    api_endpoint = "http://test_http_server/"
+
+
+class AsyncShuttleAPITestClient(AsyncShuttleAPI):
+    api_endpoint = "http://test_http_server/"
+
+
+def http_error(error_class, status_code, headers=None):
+    return error_class(SERVICE_NAME, "/path", None, ShuttleResponse(None, status_code, headers or {}))
+
+def network_error():
+    return APIError(SERVICE_NAME, "/path", requests.exceptions.ConnectionError())
+
+def mock_response(status_code=200, headers=None, content=b""):
+    """
+    Returns a requests response, to be returned by a patched `requests.Session.request`.
+    """
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = content
+    return response
+
+def json_response(data, status_code=200, headers=None):
+    return mock_response(status_code, {"Content-Type": "application/json", **(headers or {})}, json.dumps(data).encode())
+
+
+class Clock:
+    """
+    Clock to inject in place of `time.monotonic` or `time.time`, moved forward
+    by the tests.
+    """
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
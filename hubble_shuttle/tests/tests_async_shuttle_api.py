@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+from unittest import IsolatedAsyncioTestCase
+
+import hubble_shuttle
+from hubble_shuttle import AsyncShuttleAPI
+
+
+class AsyncShuttleAPITestClient(AsyncShuttleAPI):
+    api_endpoint = "http://test_http_server/"
+
+
+class AsyncShuttleAPITest(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.client = AsyncShuttleAPITestClient()
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    async def test_get_request(self):
+        response = await self.client.http_get("/get")
+        self.assertEqual(200, response.status_code, "Returns the HTTP status code")
+        self.assertEqual({}, response.data['args'], "Parses the JSON response")
+
+    async def test_response_headers(self):
+        response = await self.client.http_get("/response-headers", query={"Test-Header": "test-value"})
+        self.assertEqual("test-value", response.headers["Test-Header"], "Returns the expected header value")
+
+    async def test_get_request_parse_response_text(self):
+        response = await self.client.http_get("/robots.txt")
+        self.assertEqual("User-agent: *\nDisallow: /deny\n", response.data, "Returns the text response as a string")
+
+    async def test_get_request_parse_response_default(self):
+        response = await self.client.http_get("/base64/SGVsbG8=")
+        self.assertEqual(b"Hello", response.data, "Returns the response as a binary string")
+
+    async def test_get_gzip_content_encoding(self):
+        response = await self.client.http_get("/gzip")
+        self.assertEqual(response.data['gzipped'], True, "Decodes the gzipped response content")
+
+    async def test_get_request_with_class_and_request_headers_conflict(self):
+        async with AsyncShuttleAPITestClient(headers={"Foo": "Bar", "Bar": "Baz"}, locale="en-us") as client:
+            response = await client.http_get("/get", headers={"Foo": "Baz"})
+        self.assertEqual("Baz", response.data['headers']['Foo'], "Sends the request-level headers")
+        self.assertEqual("Baz", response.data['headers']['Bar'], "Sends the client-level headers")
+        self.assertEqual("en-us", response.data['headers']['Accept-Language'], "Adds the locale as a header")
+
+    async def test_get_request_with_class_and_request_query_param_conflict(self):
+        async with AsyncShuttleAPITestClient(query={"foo": "bar", "bar": "baz"}) as client:
+            response = await client.http_get("/get", query={"foo": "baz"})
+        self.assertEqual("baz", response.data['args']['foo'], "Sends the request-level parameters")
+        self.assertEqual("baz", response.data['args']['bar'], "Sends the client-level parameters")
+
+    async def test_get_request_with_url_and_class_query_params(self):
+        async with AsyncShuttleAPITestClient(query={"foo": "bar"}) as client:
+            response = await client.http_get("/get?id=1")
+        self.assertEqual({"id": "1", "foo": "bar"}, response.data['args'], "Keeps the query string of the URL")
+
+        class QueryClient(AsyncShuttleAPITestClient):
+            query = {"foo": "bar"}
+
+        async with QueryClient() as client:
+            response = await client.http_get("/get?id=1", query={"bar": "baz"})
+            self.assertEqual({"id": "1", "foo": "bar", "bar": "baz"}, response.data['args'])
+            async with await client.http_get("/get?id=1", stream=True) as response:
+                content = b"".join([chunk async for chunk in response.iter_bytes()])
+            self.assertEqual({"id": "1", "foo": "bar"}, json.loads(content)['args'], "Keeps the query string of streamed requests")
+
+    async def test_post_request_with_data_form_urlencoded(self):
+        response = await self.client.http_post("/post", data={"foo": "bar", "bar": "baz"})
+        self.assertEqual({"foo": "bar", "bar": "baz"}, response.data['form'], "Sends the data in form format")
+
+    async def test_put_request_with_data_json(self):
+        response = await self.client.http_put("/put", content_type="application/json", data={"foo": "bar"})
+        self.assertEqual({"foo": "bar"}, response.data['json'], "Sends the data in JSON format")
+        self.assertEqual("application/json", response.data['headers']['Content-Type'], "Sets the appropriate content type header")
+
+    async def test_patch_request_with_data_unknown_content_type(self):
+        with self.assertRaises(ValueError):
+            await self.client.http_patch("/patch", content_type="application/bad-content-type", data={"foo": "bar"})
+
+    async def test_delete_request(self):
+        response = await self.client.http_delete("/delete")
+        self.assertEqual(200, response.status_code, "Returns the HTTP status code")
+
+    async def test_get_404_http_error(self):
+        with self.assertRaises(hubble_shuttle.exceptions.NotFoundError) as cm:
+            await self.client.http_get("/status/404")
+        self.assertEqual(404, cm.exception.internal_status_code, "Returns the error status code")
+        self.assertEqual("AsyncShuttleAPITestClient", cm.exception.service_name, "Sets the service name")
+        self.assertEqual("/status/404", cm.exception.source, "Sets the error source")
+
+    async def test_get_599_http_error(self):
+        with self.assertRaises(hubble_shuttle.exceptions.HTTPServerError) as cm:
+            await self.client.http_get("/status/599")
+        self.assertEqual(599, cm.exception.internal_status_code, "Returns the error status code")
+
+    async def test_get_generic_networking_error(self):
+        async with AsyncShuttleAPITestClient(api_endpoint='http://test_http_server:1234') as client:
+            with self.assertRaises(hubble_shuttle.exceptions.APIError) as cm:
+                await client.http_get("/get")
+        self.assertEqual("AsyncShuttleAPITestClient", cm.exception.service_name, "Sets the service name")
+        self.assertEqual("/get", cm.exception.source, "Sets the error source")
+
+    async def test_concurrent_requests(self):
+        responses = await asyncio.gather(*[
+            self.client.http_get("/get", query={"id": str(i)}) for i in range(50)
+        ])
+        self.assertEqual(
+            [str(i) for i in range(50)],
+            [response.data['args']['id'] for response in responses],
+            "Runs the requests concurrently over the shared pool",
+        )
+
+    async def test_batch_requests(self):
+        responses = await self.client.http_batch([
+            {"url": "/get", "query": {"id": "1"}},
+            "/status/404",
+            {"method": "post", "url": "/post", "data": {"id": "3"}},
+            "/delay/2",
+        ], concurrency=3, timeout=1)
+        self.assertEqual("1", responses[0].data['args']['id'], "Returns the results in order")
+        self.assertIsInstance(responses[1], hubble_shuttle.exceptions.NotFoundError, "Returns the mapped HTTP error")
+        self.assertEqual({"id": "3"}, responses[2].data['form'], "Uses the request method")
+        self.assertIsInstance(responses[3], hubble_shuttle.exceptions.DeadlineExceededError, "Returns an error for unfinished requests")
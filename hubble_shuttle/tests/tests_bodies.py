@@ -0,0 +1,189 @@
+import io
+import os
+import requests
+import tempfile
+import tracemalloc
+
+from email.parser import BytesParser
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+from hubble_shuttle import AsyncShuttleAPI, ShuttleAPI
+from hubble_shuttle.bodies import FileBody, MultipartEncoder, MultipartFile, body_length, is_replayable, request_body
+from hubble_shuttle.exceptions import HTTPServerError
+from hubble_shuttle.retry import RetryPolicy
+
+
+class ShuttleAPITestClient(ShuttleAPI):
+    api_endpoint = "http://test_http_server/"
+    request_content_type = "application/json"
+
+
+class AsyncShuttleAPITestClient(AsyncShuttleAPI):
+    api_endpoint = "http://test_http_server/"
+    request_content_type = "application/json"
+
+
+def temporary_file(content):
+    file = tempfile.NamedTemporaryFile(suffix=".csv", delete=False)
+    file.write(content)
+    file.close()
+    return file.name
+
+
+def parse_multipart(body):
+    message = BytesParser().parsebytes(b"Content-Type: " + body.content_type.encode() + b"\r\n\r\n" + b"".join(body))
+    return {part.get_param("name", header="content-disposition"): part for part in message.get_payload()}
+
+
+class RequestBodyTest(TestCase):
+
+    def test_request_body(self):
+        self.assertEqual(b"data", request_body(b"data"))
+        self.assertEqual(b"data", request_body(bytearray(b"data")).tobytes(), "Sends bytes-like objects as memory views")
+        self.assertEqual(4, body_length(request_body(memoryview(b"data").cast("H"))), "Measures views in bytes")
+        self.assertIsInstance(request_body(io.BytesIO(b"data")), FileBody)
+        for data in [{"id": 1}, [1, 2], "data", None]:
+            self.assertIsNone(request_body(data), "Encodes {!r}".format(data))
+
+    def test_file_body(self):
+        file = io.BytesIO(b"header,data")
+        file.read(7)
+        body = FileBody(file, chunk_size=2)
+        self.assertEqual(4, len(body))
+        self.assertEqual([b"da", b"ta"], list(body), "Reads the file in chunks from its position")
+        self.assertEqual(b"data", b"".join(body), "Reads the file again when sent again")
+
+    def test_unseekable_file(self):
+        read, write = os.pipe()
+        os.write(write, b"data")
+        os.close(write)
+        with open(read, "rb") as file:
+            body = request_body(file)
+            self.assertIsNone(body_length(body), "Doesn't know the length of pipes")
+            self.assertFalse(is_replayable(body))
+            self.assertEqual(b"data", b"".join(body))
+
+    def test_is_replayable(self):
+        self.assertTrue(is_replayable(b"data"))
+        self.assertTrue(is_replayable(FileBody(io.BytesIO(b"data"))))
+        self.assertFalse(is_replayable(iter([b"data"])), "Iterators are consumed when sent")
+
+
+class MultipartEncoderTest(TestCase):
+
+    def setUp(self):
+        self.path = temporary_file(b"id,name\n1,Shuttle\n")
+        self.addCleanup(os.unlink, self.path)
+
+    def test_encoding(self):
+        body = MultipartEncoder(
+            [("name", "Shuttle"), ("export", MultipartFile(self.path)), ("raw", MultipartFile(io.BytesIO(b"\x00\x01"), filename='a "b".bin'))],
+            chunk_size=4,
+        )
+        parts = parse_multipart(body)
+
+        self.assertEqual(b"Shuttle", parts["name"].get_payload(decode=True))
+        self.assertEqual(b"id,name\n1,Shuttle\n", parts["export"].get_payload(decode=True))
+        self.assertEqual(os.path.basename(self.path), parts["export"].get_filename(), "Uses the name of the file")
+        self.assertEqual("text/csv", parts["export"].get_content_type(), "Guesses the content type")
+        self.assertEqual("application/octet-stream", parts["raw"].get_content_type())
+        self.assertEqual("a %22b%22.bin", parts["raw"].get_filename(), "Escapes the quotes")
+
+    def test_length(self):
+        body = MultipartEncoder({"name": "Shuttle", "export": MultipartFile(self.path)})
+        self.assertEqual(len(b"".join(body)), len(body))
+        self.assertEqual(b"".join(body), b"".join(body), "Can be sent again")
+
+    def test_unseekable_file(self):
+        read, write = os.pipe()
+        os.close(write)
+        with open(read, "rb") as file, self.assertRaises(ValueError):
+            MultipartFile(file)
+
+
+class ShuttleAPIRequestBodyTest(TestCase):
+
+    def test_bytes(self):
+        response = ShuttleAPITestClient().http_post("/anything", data=memoryview(b"raw data"))
+        self.assertEqual("raw data", response.data["data"])
+        self.assertEqual("application/octet-stream", response.data["headers"]["Content-Type"], "Doesn't send raw bodies as JSON")
+
+    def test_file(self):
+        with io.BytesIO(b'{"id": 1}') as file:
+            response = ShuttleAPITestClient().http_put("/anything", data=file, content_type="application/json")
+        self.assertEqual({"id": 1}, response.data["json"])
+        self.assertEqual("9", response.data["headers"]["Content-Length"], "Sends the length of files")
+
+    def test_iterator(self):
+        response = ShuttleAPITestClient().http_patch("/anything", data=(chunk for chunk in [b"raw ", b"data"]))
+        self.assertEqual("raw data", response.data["data"])
+        self.assertEqual("chunked", response.data["headers"]["Transfer-Encoding"], "Uses chunked transfer encoding")
+
+    def test_multipart(self):
+        path = temporary_file(b"id,name\n1,Shuttle\n")
+        self.addCleanup(os.unlink, path)
+
+        response = ShuttleAPITestClient().http_post("/anything", data=MultipartEncoder({"name": "Shuttle", "export": MultipartFile(path)}))
+        self.assertEqual({"name": "Shuttle"}, response.data["form"])
+        self.assertEqual({"export": "id,name\n1,Shuttle\n"}, response.data["files"])
+
+    def test_memory(self):
+        path = temporary_file(b"")
+        self.addCleanup(os.unlink, path)
+        with open(path, "wb") as file:
+            file.truncate(32 * 1024 * 1024)
+
+        tracemalloc.start()
+        with open(path, "rb") as file:
+            ShuttleAPITestClient().http_post("/status/200", data=file)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.assertLess(peak, 2 * 1024 * 1024, "Doesn't read the file in memory")
+
+    @patch("time.sleep")
+    @patch.object(requests.Session, "request")
+    def test_retries(self, request, sleep):
+        sent = []
+
+        def send(method, url, data=None, **kwargs):
+            sent.append(b"".join(data))
+            response = requests.Response()
+            response.status_code = 503 if len(sent) == 1 else 200
+            response._content = b""
+            return response
+
+        class RetryingClient(ShuttleAPITestClient):
+            retry_policy = RetryPolicy(max_attempts=2, methods=["post"])
+
+        request.side_effect = send
+        with io.BytesIO(b"data") as file:
+            self.assertEqual(200, RetryingClient().http_post("/anything", data=file).status_code)
+        self.assertEqual([b"data", b"data"], sent, "Sends the file again")
+
+        sent.clear()
+        with self.assertRaises(HTTPServerError):
+            RetryingClient().http_post("/anything", data=iter([b"data"]))
+        self.assertEqual([b"data"], sent, "Doesn't retry iterators")
+
+
+class AsyncShuttleAPIRequestBodyTest(IsolatedAsyncioTestCase):
+
+    async def test_bodies(self):
+        async def chunks():
+            yield b"raw "
+            yield b"data"
+
+        async with AsyncShuttleAPITestClient() as client:
+            response = await client.http_post("/anything", data=io.BytesIO(b"raw data"))
+            self.assertEqual("raw data", response.data["data"], "Sends files")
+            self.assertEqual("8", response.data["headers"]["Content-Length"])
+
+            response = await client.http_post("/anything", data=memoryview(b"raw data"))
+            self.assertEqual("raw data", response.data["data"], "Sends buffers")
+
+            response = await client.http_post("/anything", data=chunks())
+            self.assertEqual("raw data", response.data["data"], "Sends asynchronous iterators")
+
+            response = await client.http_post("/anything", data=MultipartEncoder({"name": "Shuttle"}))
+            self.assertEqual({"name": "Shuttle"}, response.data["form"], "Sends multipart bodies")
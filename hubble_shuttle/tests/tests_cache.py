@@ -0,0 +1,277 @@
+import json
+import os
+import requests
+import socketserver
+import tempfile
+import threading
+import time
+
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import MagicMock, patch
+
+from requests.structures import CaseInsensitiveDict
+
+from hubble_shuttle import AsyncShuttleAPI
+from hubble_shuttle.cache import MemoryCacheBackend, RedisCacheBackend, ResponseCache, SQLiteCacheBackend, cache_key
+from hubble_shuttle.http import RequestsShuttleTransport, ShuttleResponse
+from hubble_shuttle.tests.helpers import json_response
+
+def build_transport(response_cache, **kwargs):
+    return RequestsShuttleTransport(
+        api_endpoint = "http://host",
+        headers = {},
+        query = {},
+        request_content_type = "application/json",
+        response_cache = response_cache,
+        **kwargs,
+    )
+
+def build_entry(cache, content=b"{}", headers=None):
+    return cache.entry_for(200, CaseInsensitiveDict({"Content-Type": "application/json", **(headers or {})}), content)
+
+def parse_content(status_code, headers, content):
+    return ShuttleResponse(json.loads(content), status_code, headers)
+
+class ResponseCacheTest(TestCase):
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(maxsize=2, default_ttl=60)
+        for key in ["a", "b"]:
+            cache.set(key, build_entry(cache, key.encode()))
+        cache.get("a")
+        cache.set("c", build_entry(cache, b"c"))
+
+        self.assertEqual(2, len(cache.backend), "Keeps at most maxsize entries")
+        self.assertIsNone(cache.get("b"), "Evicts the least recently used entry")
+        self.assertEqual(b"a", cache.get("a").content, "Keeps the recently used entries")
+
+    def test_entry_ttl(self):
+        cache = ResponseCache(default_ttl=60)
+        self.assertTrue(build_entry(cache).is_fresh(), "Uses the default TTL")
+        self.assertFalse(
+            build_entry(cache, headers={"Cache-Control": "max-age=0", "ETag": '"v1"'}).is_fresh(),
+            "Uses the max-age directive",
+        )
+        self.assertIsNone(
+            build_entry(cache, headers={"Cache-Control": "private, no-store"}),
+            "Doesn't cache no-store responses",
+        )
+        self.assertIsNone(cache.entry_for(404, {}, b""), "Doesn't cache errors")
+        self.assertIsNone(
+            build_entry(ResponseCache()),
+            "Doesn't cache responses that expire immediately and can't be revalidated",
+        )
+
+    def test_lazy_parsing(self):
+        cache = ResponseCache(default_ttl=60)
+        entry = build_entry(cache, b'{"id": 1}')
+        parse = MagicMock(side_effect=parse_content)
+
+        self.assertEqual({"id": 1}, entry.get_response(parse).data, "Parses the cached content")
+        entry.get_response(parse)
+        self.assertEqual(1, parse.call_count, "Only parses the content once")
+
+    def test_cache_key(self):
+        self.assertEqual(
+            cache_key("http://host/path", {"b": "2", "a": "1"}, {"Accept-Language": "en"}),
+            cache_key("http://host/path", {"a": "1", "b": "2"}, {"accept-language": "en"}),
+            "Doesn't depend on parameters order or header case",
+        )
+        self.assertNotEqual(
+            cache_key("http://host/path", {}, {"Accept-Language": "en"}),
+            cache_key("http://host/path", {}, {"Accept-Language": "fr"}),
+            "Depends on the headers",
+        )
+
+class CacheBackendTestMixin:
+
+    def test_set_and_get(self):
+        cache = ResponseCache(backend=self.backend, default_ttl=60)
+        cache.set("key", build_entry(cache, b'{"id": 1}', headers={"ETag": '"v1"'}))
+
+        entry = cache.get("key")
+        self.assertEqual(200, entry.status_code, "Stores the status code")
+        self.assertEqual('"v1"', entry.headers["etag"], "Stores the headers")
+        self.assertEqual({"id": 1}, entry.get_response(parse_content).data, "Stores the raw content")
+        self.assertIsNone(cache.get("another-key"), "Returns None for missing keys")
+
+    def test_expiry(self):
+        cache = ResponseCache(backend=self.backend, default_ttl=60)
+        entry = build_entry(cache)
+        self.backend.set("key", entry, 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("key"), "Doesn't return expired entries")
+
+    def test_delete_and_clear(self):
+        cache = ResponseCache(backend=self.backend, default_ttl=60)
+        for key in ["a", "b", "c"]:
+            cache.set(key, build_entry(cache))
+
+        cache.delete("a")
+        self.assertIsNone(cache.get("a"), "Deletes the entry")
+        self.assertIsNotNone(cache.get("b"), "Keeps the other entries")
+
+        cache.clear()
+        self.assertIsNone(cache.get("b"), "Deletes all the entries")
+        self.assertIsNone(cache.get("c"), "Deletes all the entries")
+
+class MemoryCacheBackendTest(CacheBackendTestMixin, TestCase):
+
+    def setUp(self):
+        self.backend = MemoryCacheBackend()
+
+class SQLiteCacheBackendTest(CacheBackendTestMixin, TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.backend = SQLiteCacheBackend(os.path.join(directory.name, "cache.db"), maxsize=2)
+
+    def test_shared_between_connections(self):
+        cache = ResponseCache(backend=self.backend, default_ttl=60)
+        cache.set("key", build_entry(cache, b'{"id": 1}'))
+
+        other_backend = SQLiteCacheBackend(self.backend.path)
+        self.assertEqual(b'{"id": 1}', other_backend.get("key").content, "Reads entries stored by other connections")
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(backend=self.backend, default_ttl=60)
+        for key in ["a", "b", "c"]:
+            cache.set(key, build_entry(cache))
+        self.assertEqual(2, len(self.backend), "Keeps at most maxsize entries")
+        self.assertIsNone(cache.get("a"), "Evicts the least recently used entry")
+
+class RedisCacheBackendTest(CacheBackendTestMixin, TestCase):
+
+    def setUp(self):
+        self.server = LocalRedisServer()
+        self.addCleanup(self.server.stop)
+        self.backend = RedisCacheBackend(port=self.server.port)
+        self.addCleanup(self.backend.close)
+
+    def test_server_unavailable(self):
+        self.server.stop()
+        cache = ResponseCache(backend=self.backend, default_ttl=60)
+        cache.set("key", build_entry(cache))
+        self.assertIsNone(cache.get("key"), "Treats networking errors as cache misses")
+
+class LocalRedisServer:
+    """
+    Minimal stand-in for a Redis server, supporting the commands used by RedisCacheBackend.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        data = self.data
+
+        class Handler(socketserver.StreamRequestHandler):
+
+            def handle(self):
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    args = []
+                    for _ in range(int(line[1:])):
+                        length = int(self.rfile.readline()[1:])
+                        args.append(self.rfile.read(length + 2)[:-2])
+                    self.wfile.write(self.execute(args[0].upper(), *args[1:]))
+
+            def execute(self, command, *args):
+                now = time.time()
+                for key, (value, expires) in list(data.items()):
+                    if expires <= now:
+                        del data[key]
+                if command == b"GET":
+                    value = data.get(args[0])
+                    return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value[0]), value[0])
+                if command == b"SET":
+                    data[args[0]] = (args[1], now + int(args[3]) / 1000)
+                    return b"+OK\r\n"
+                if command == b"DEL":
+                    return b":%d\r\n" % sum(data.pop(key, None) is not None for key in args)
+                if command == b"SCAN":
+                    pattern = args[2].rstrip(b"*")
+                    keys = [key for key in data if key.startswith(pattern)]
+                    return b"*2\r\n$1\r\n0\r\n*%d\r\n" % len(keys) + b"".join(
+                        b"$%d\r\n%s\r\n" % (len(key), key) for key in keys
+                    )
+                return b"-ERR unknown command\r\n"
+
+        return Handler
+
+class RequestsShuttleTransportCacheTest(TestCase):
+
+    @patch.object(requests.Session, "request")
+    def test_serves_fresh_responses_from_cache(self, request):
+        request.return_value = json_response({"id": 1}, headers={"Cache-Control": "max-age=60"})
+        transport = build_transport(ResponseCache())
+
+        first_response = transport.get("/plans")
+        second_response = transport.get("/plans")
+
+        self.assertEqual(1, request.call_count, "Only sends the request once")
+        self.assertIs(first_response, second_response, "Returns the cached response")
+
+        transport.get("/plans", query={"page": 2})
+        self.assertEqual(2, request.call_count, "Doesn't share responses between different requests")
+
+    @patch.object(requests.Session, "request")
+    def test_revalidates_stale_responses(self, request):
+        request.return_value = json_response(
+            {"id": 1},
+            headers={"Cache-Control": "no-cache", "ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"},
+        )
+        transport = build_transport(ResponseCache())
+        first_response = transport.get("/plans")
+
+        request.return_value = json_response(None, status_code=304, headers={"Cache-Control": "max-age=60"})
+        second_response = transport.get("/plans")
+
+        self.assertEqual('"v1"', request.call_args.kwargs["headers"]["If-None-Match"], "Sends the ETag")
+        self.assertEqual(
+            "Mon, 01 Jan 2024 00:00:00 GMT",
+            request.call_args.kwargs["headers"]["If-Modified-Since"],
+            "Sends the last modification date",
+        )
+        self.assertIs(first_response, second_response, "Reuses the cached response")
+
+        transport.get("/plans")
+        self.assertEqual(2, request.call_count, "Uses the new max-age after revalidation")
+
+    @patch.object(requests.Session, "request")
+    def test_does_not_cache_other_methods(self, request):
+        request.return_value = json_response({"id": 1}, headers={"Cache-Control": "max-age=60"})
+        transport = build_transport(ResponseCache())
+
+        transport.post("/plans")
+        transport.post("/plans")
+
+        self.assertEqual(2, request.call_count, "Sends all the requests")
+
+class AsyncShuttleAPICacheTest(IsolatedAsyncioTestCase):
+
+    async def test_cache(self):
+        class CachedClient(AsyncShuttleAPI):
+            api_endpoint = "http://test_http_server/"
+            response_cache = ResponseCache()
+
+        async with CachedClient() as client:
+            first_response = await client.http_get("/cache/60")
+            self.assertIs(first_response, await client.http_get("/cache/60"), "Serves fresh responses from the cache")
+            self.assertIsNot(first_response, await client.http_get("/cache/60", query={"page": 2}))
+
+            first_response = await client.http_get("/etag/v1")
+            with patch.object(client.http, "_raise_for_status", wraps=client.http._raise_for_status) as raise_for_status:
+                self.assertIs(first_response, await client.http_get("/etag/v1"), "Revalidates stale responses")
+            raise_for_status.assert_not_called()
@@ -0,0 +1,133 @@
+import requests
+
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from hubble_shuttle.circuit_breaker import CircuitBreaker
+from hubble_shuttle.exceptions import APIError, CircuitOpenError, HTTPServerError, NotFoundError
+from hubble_shuttle.tests.helpers import SERVICE_NAME, Clock, ShuttleAPITestClient, http_error, mock_response, network_error
+
+
+class CircuitBreakerTest(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = patch("time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def call_failing(self, breaker, error=None, service_name=SERVICE_NAME):
+        with self.assertRaises(APIError):
+            breaker.call(service_name, "/path", MagicMock(side_effect=error or network_error()))
+
+    def test_opens_on_failure_rate(self):
+        breaker = CircuitBreaker(failure_rate_threshold=0.5, minimum_calls=4)
+        breaker.call(SERVICE_NAME, "/path", MagicMock())
+        breaker.call(SERVICE_NAME, "/path", MagicMock())
+        self.call_failing(breaker)
+        self.assertEqual("closed", breaker.state(SERVICE_NAME), "Waits for the minimum number of calls")
+
+        self.call_failing(breaker, http_error(HTTPServerError, 503))
+        self.assertEqual("open", breaker.state(SERVICE_NAME), "Opens once the failure rate is reached")
+
+        function = MagicMock()
+        with self.assertRaises(CircuitOpenError) as cm:
+            breaker.call(SERVICE_NAME, "/path", function)
+        function.assert_not_called()
+        self.assertEqual(SERVICE_NAME, cm.exception.service_name, "Sets the service name")
+        self.assertEqual("/path", cm.exception.source, "Sets the error source")
+
+    def test_ignores_client_errors(self):
+        breaker = CircuitBreaker(minimum_calls=2)
+        for _ in range(5):
+            self.call_failing(breaker, http_error(NotFoundError, 404))
+        self.assertEqual("closed", breaker.state(SERVICE_NAME), "Doesn't count client errors as failures")
+
+    def test_slow_calls(self):
+        breaker = CircuitBreaker(minimum_calls=2, slow_call_threshold=1)
+
+        def slow_call():
+            self.clock.now += 2
+
+        breaker.call(SERVICE_NAME, "/path", slow_call)
+        breaker.call(SERVICE_NAME, "/path", slow_call)
+        self.assertEqual("open", breaker.state(SERVICE_NAME), "Counts slow calls as failures")
+
+    def test_rolling_window(self):
+        breaker = CircuitBreaker(minimum_calls=2, window=10)
+        self.call_failing(breaker)
+        self.clock.now += 10
+        self.call_failing(breaker)
+        self.assertEqual("closed", breaker.state(SERVICE_NAME), "Forgets the calls outside of the window")
+
+    def test_keyed_by_service(self):
+        breaker = CircuitBreaker(minimum_calls=1)
+        self.call_failing(breaker)
+        self.assertEqual("open", breaker.state(SERVICE_NAME))
+        self.assertEqual("closed", breaker.state("another-service"), "Keeps a circuit per service")
+
+    def test_half_open(self):
+        breaker = CircuitBreaker(minimum_calls=1, reset_timeout=30, half_open_probes=2)
+        self.call_failing(breaker)
+
+        self.clock.now += 30
+        self.call_failing(breaker)
+        self.assertEqual("open", breaker.state(SERVICE_NAME), "Opens again when a probe fails")
+
+        self.clock.now += 30
+        breaker.call(SERVICE_NAME, "/path", MagicMock())
+        self.assertEqual("half_open", breaker.state(SERVICE_NAME), "Waits for all the probes to succeed")
+        breaker.call(SERVICE_NAME, "/path", MagicMock())
+        self.assertEqual("closed", breaker.state(SERVICE_NAME), "Closes once the probes succeed")
+
+    def test_half_open_probes_limit(self):
+        breaker = CircuitBreaker(minimum_calls=1, reset_timeout=30, half_open_probes=1)
+        self.call_failing(breaker)
+        self.clock.now += 30
+
+        def probe():
+            with self.assertRaises(CircuitOpenError):
+                breaker.call(SERVICE_NAME, "/path", MagicMock())
+
+        breaker.call(SERVICE_NAME, "/path", probe)
+        self.assertEqual("closed", breaker.state(SERVICE_NAME), "Only lets the probes through while half-open")
+
+    def test_reset(self):
+        breaker = CircuitBreaker(minimum_calls=1)
+        self.call_failing(breaker)
+        breaker.reset(SERVICE_NAME)
+        self.assertEqual("closed", breaker.state(SERVICE_NAME), "Closes the circuit")
+
+
+class AsyncCircuitBreakerTest(IsolatedAsyncioTestCase):
+
+    async def test_call_async(self):
+        breaker = CircuitBreaker(minimum_calls=1)
+        with self.assertRaises(HTTPServerError):
+            await breaker.call_async(SERVICE_NAME, "/path", AsyncMock(side_effect=http_error(HTTPServerError, 500)))
+
+        function = AsyncMock()
+        with self.assertRaises(CircuitOpenError):
+            await breaker.call_async(SERVICE_NAME, "/path", function)
+        function.assert_not_awaited()
+
+
+class CircuitBreakerTestClient(ShuttleAPITestClient):
+    circuit_breaker = CircuitBreaker(minimum_calls=2)
+
+
+class ShuttleAPICircuitBreakerTest(TestCase):
+
+    def setUp(self):
+        CircuitBreakerTestClient.circuit_breaker.reset()
+
+    @patch.object(requests.Session, "request")
+    def test_shared_by_client_instances(self, request):
+        request.return_value = mock_response(503)
+        for _ in range(2):
+            with self.assertRaises(HTTPServerError):
+                CircuitBreakerTestClient().http_get("/path")
+
+        with self.assertRaises(CircuitOpenError):
+            CircuitBreakerTestClient().http_get("/path")
+        self.assertEqual(2, request.call_count, "Fails fast for all the instances of the client")
@@ -0,0 +1,110 @@
+import base64
+import gzip
+import json
+import zlib
+
+from unittest import IsolatedAsyncioTestCase, TestCase, skipIf
+from unittest.mock import patch
+
+from hubble_shuttle import AsyncShuttleAPI, ShuttleAPI
+from hubble_shuttle.compression import accept_encoding, brotli, compressor, zstandard
+
+
+class ShuttleAPITestClient(ShuttleAPI):
+    api_endpoint = "http://test_http_server/"
+    request_content_type = "application/json"
+    request_compression = "gzip"
+    request_compression_threshold = 100
+
+
+class AsyncShuttleAPITestClient(AsyncShuttleAPI):
+    api_endpoint = "http://test_http_server/"
+    request_content_type = "application/json"
+    request_compression = "gzip"
+    request_compression_threshold = 100
+
+
+def sent_body(response):
+    # httpbin echoes compressed bodies as a base64 data URL
+    return base64.b64decode(response.data["data"].partition(",")[2])
+
+
+class CompressionTest(TestCase):
+
+    def test_compressor(self):
+        data = b'{"id": 1}' * 100
+        self.assertEqual(data, gzip.decompress(compressor("gzip")(data)))
+        self.assertEqual(data, zlib.decompress(compressor("deflate")(data)), "Uses the zlib format for deflate")
+        with self.assertRaises(ValueError):
+            compressor("compress")
+
+    @skipIf(brotli is None, "Requires brotli")
+    def test_brotli(self):
+        data = b'{"id": 1}' * 100
+        self.assertEqual(data, brotli.decompress(compressor("br")(data)))
+
+    @skipIf(zstandard is not None, "Requires zstandard not to be installed")
+    def test_missing_library(self):
+        with self.assertRaises(ImportError):
+            compressor("zstd")
+
+    def test_accept_encoding(self):
+        self.assertEqual("br, gzip", accept_encoding(["zstd", "br", "gzip"], ["gzip", "deflate", "br"]), "Keeps the supported encodings")
+        self.assertEqual("identity", accept_encoding(["zstd"], ["gzip"]))
+
+
+class ShuttleAPICompressionTest(TestCase):
+
+    def test_request_compression(self):
+        data = {"items": list(range(100))}
+        response = ShuttleAPITestClient().http_post("/anything", data=data)
+        self.assertEqual("gzip", response.data["headers"]["Content-Encoding"], "Sets the content encoding")
+        self.assertEqual(data, json.loads(gzip.decompress(sent_body(response))), "Compresses the body")
+
+    def test_compression_threshold(self):
+        response = ShuttleAPITestClient().http_post("/anything", data={"id": 1})
+        self.assertNotIn("Content-Encoding", response.data["headers"], "Doesn't compress small bodies")
+        self.assertEqual({"id": 1}, response.data["json"])
+
+    def test_response_encodings(self):
+        class EncodingClient(ShuttleAPITestClient):
+            response_encodings = ["zstd", "deflate"]
+
+        response = EncodingClient().http_get("/headers")
+        self.assertEqual("deflate", response.data["headers"]["Accept-Encoding"], "Only accepts the supported encodings")
+        self.assertTrue(EncodingClient().http_get("/deflate").data["deflated"], "Decodes the response")
+
+    @skipIf(brotli is None, "Requires brotli")
+    def test_brotli_response(self):
+        class EncodingClient(ShuttleAPITestClient):
+            response_encodings = ["br"]
+
+        self.assertTrue(EncodingClient().http_get("/brotli").data["brotli"], "Decodes brotli responses")
+
+
+class AsyncShuttleAPICompressionTest(IsolatedAsyncioTestCase):
+
+    async def test_request_compression(self):
+        data = {"items": list(range(100))}
+        async with AsyncShuttleAPITestClient() as client:
+            response = await client.http_put("/anything", data=data)
+        self.assertEqual("gzip", response.data["headers"]["Content-Encoding"], "Sets the content encoding")
+        self.assertEqual(data, json.loads(gzip.decompress(sent_body(response))), "Compresses the body")
+
+    async def test_response_encodings(self):
+        class EncodingClient(AsyncShuttleAPITestClient):
+            response_encodings = ["zstd", "gzip"]
+
+        async with EncodingClient() as client:
+            response = await client.http_get("/headers")
+            self.assertEqual("gzip", response.data["headers"]["Accept-Encoding"], "Only accepts the supported encodings")
+            self.assertTrue((await client.http_get("/gzip")).data["gzipped"], "Decodes the response")
+
+    async def test_optional_response_encodings(self):
+        class EncodingClient(AsyncShuttleAPITestClient):
+            response_encodings = ["br", "gzip"]
+
+        async with EncodingClient() as client:
+            self.assertEqual("br, gzip" if brotli else "gzip", client.http._accept_encoding())
+            with patch("hubble_shuttle.compression.brotli", None):
+                self.assertEqual("gzip", client.http._accept_encoding(), "Only accepts brotli when it is installed")
@@ -0,0 +1,111 @@
+import requests
+
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+import hubble_shuttle
+from hubble_shuttle.content_types import ContentDecoders, decode_text, parse_media_type
+from hubble_shuttle.exceptions import HTTPClientError, NotFoundError, status_error_table
+from hubble_shuttle.tests.helpers import AsyncShuttleAPITestClient, ShuttleAPITestClient, mock_response
+
+
+class TooManyRequestsError(HTTPClientError):
+    pass
+
+
+class ClientError(HTTPClientError):
+    pass
+
+
+class ParseMediaTypeTest(TestCase):
+
+    def test_parse_media_type(self):
+        media_type = parse_media_type('Application/Problem+JSON; Charset="utf-8"')
+        self.assertEqual("application/problem+json", media_type.mime_type, "Lowercases the media type")
+        self.assertEqual("+json", media_type.suffix, "Parses the subtype suffix")
+        self.assertEqual("utf-8", media_type.charset, "Parses the parameters")
+
+        self.assertIsNone(parse_media_type("text/plain").suffix)
+        self.assertIsNone(parse_media_type("text/plain").charset)
+        self.assertEqual("", parse_media_type("").mime_type, "Supports missing content types")
+
+
+class ContentDecodersTest(TestCase):
+
+    def test_decode(self):
+        decoders = ContentDecoders({
+            "text/plain": decode_text,
+            "+xml": lambda content, media_type: ("xml", content),
+            "application/atom+xml": lambda content, media_type: ("atom", content),
+        })
+        self.assertEqual("é", decoders.decode("é".encode("utf-8"), "text/plain; charset=utf-8"), "Decodes by media type")
+        self.assertEqual("Ã©", decoders.decode("é".encode("utf-8"), "text/plain"), "Defaults to ISO-8859-1 for text")
+        self.assertEqual("é", decoders.decode("é".encode("utf-8"), "text/plain; charset=unknown"), "Falls back to UTF-8")
+        self.assertEqual(("xml", b"<a/>"), decoders.decode(b"<a/>", "application/rss+xml"), "Decodes by suffix")
+        self.assertEqual(("atom", b"<a/>"), decoders.decode(b"<a/>", "application/atom+xml"), "Prefers the exact media type")
+        self.assertEqual(b"raw", decoders.decode(b"raw", "application/octet-stream"), "Keeps the other bodies as bytes")
+
+
+class StatusErrorTableTest(TestCase):
+
+    def test_default_table(self):
+        table = status_error_table()
+        self.assertIs(NotFoundError, table[404])
+        self.assertIs(hubble_shuttle.exceptions.HTTPClientError, table[418], "Maps the 4xx codes")
+        self.assertIs(hubble_shuttle.exceptions.HTTPServerError, table[599], "Maps the 5xx codes")
+        self.assertNotIn(399, table)
+
+    def test_overrides(self):
+        table = status_error_table({429: TooManyRequestsError, range(400, 500): ClientError})
+        self.assertIs(TooManyRequestsError, table[429], "Overrides ranges with single status codes")
+        self.assertIs(ClientError, table[404], "Overrides the default status codes")
+        self.assertIs(hubble_shuttle.exceptions.InternalServerError, table[500], "Keeps the other defaults")
+
+
+class ShuttleAPIContentTypesTest(TestCase):
+
+    @patch.object(requests.Session, "request")
+    def test_json_suffix(self, request):
+        request.return_value = mock_response(200, {"Content-Type": "application/problem+json"}, b'{"title": "Not Found"}')
+        self.assertEqual({"title": "Not Found"}, ShuttleAPITestClient().http_get("/path").data, "Decodes +json media types")
+
+        request.return_value = mock_response(200, {"Content-Type": "Application/JSON"}, b'{"id": 1}')
+        self.assertEqual({"id": 1}, ShuttleAPITestClient().http_get("/path").data, "Ignores the case of media types")
+
+    def test_custom_decoders(self):
+        class CustomClient(ShuttleAPITestClient):
+            decoders = {"application/json": lambda content, media_type: "custom"}
+
+        self.assertEqual("custom", CustomClient().http_get("/get").data, "Uses the decoders of the client")
+        self.assertIsInstance(ShuttleAPITestClient().http_get("/get").data, dict, "Doesn't change other clients")
+
+    def test_decoder_error(self):
+        def decode(content, media_type):
+            raise ValueError("Invalid body")
+
+        class CustomClient(ShuttleAPITestClient):
+            decoders = {"application/json": decode}
+
+        response = CustomClient().http_get("/get")
+        with self.assertRaises(hubble_shuttle.exceptions.APIError):
+            response.data
+
+    def test_status_errors(self):
+        class CustomClient(ShuttleAPITestClient):
+            status_errors = {429: TooManyRequestsError}
+
+        with self.assertRaises(TooManyRequestsError):
+            CustomClient().http_get("/status/429")
+        with self.assertRaises(NotFoundError):
+            CustomClient().http_get("/status/404")
+
+
+class AsyncShuttleAPIContentTypesTest(IsolatedAsyncioTestCase):
+
+    async def test_status_errors(self):
+        class CustomClient(AsyncShuttleAPITestClient):
+            status_errors = {429: TooManyRequestsError}
+
+        async with CustomClient() as client:
+            with self.assertRaises(TooManyRequestsError):
+                await client.http_get("/status/429")
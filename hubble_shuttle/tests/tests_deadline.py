@@ -0,0 +1,117 @@
+import requests
+import time
+
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+from hubble_shuttle.deadline import deadline, time_remaining
+from hubble_shuttle.exceptions import APIError, DeadlineExceededError, HTTPServerError
+from hubble_shuttle.retry import RetryPolicy
+from hubble_shuttle.tests.helpers import AsyncShuttleAPITestClient, ShuttleAPITestClient, mock_response
+
+
+class DeadlineTest(TestCase):
+
+    def test_time_remaining(self):
+        self.assertIsNone(time_remaining(), "Returns None without a deadline")
+        with deadline(10):
+            self.assertAlmostEqual(10, time_remaining(), delta=0.1)
+            with deadline(5):
+                self.assertAlmostEqual(5, time_remaining(), delta=0.1, msg="Nested deadlines reduce the time left")
+            with deadline(20):
+                self.assertAlmostEqual(10, time_remaining(), delta=0.1, msg="Nested deadlines can't extend the time left")
+            with deadline(None):
+                self.assertAlmostEqual(10, time_remaining(), delta=0.1, msg="A None deadline keeps the current one")
+        self.assertIsNone(time_remaining(), "Restores the previous deadline")
+
+
+class ShuttleAPITimeoutTest(TestCase):
+
+    @patch.object(requests.Session, "request")
+    def test_timeouts(self, request):
+        request.return_value = mock_response(200)
+
+        class TimeoutClient(ShuttleAPITestClient):
+            connect_timeout = 1
+            read_timeout = 5
+
+        TimeoutClient().http_get("/get")
+        self.assertEqual((1, 5), request.call_args.kwargs["timeout"], "Sends the class timeouts")
+
+        TimeoutClient().http_post("/post", data={}, timeout=2)
+        self.assertEqual((2, 2), request.call_args.kwargs["timeout"], "Sends the request timeout")
+
+        ShuttleAPITestClient().http_get("/get")
+        self.assertNotIn("timeout", request.call_args.kwargs, "Doesn't time out by default")
+
+    @patch.object(requests.Session, "request")
+    def test_deadline(self, request):
+        request.return_value = mock_response(200)
+
+        class DeadlineClient(ShuttleAPITestClient):
+            read_timeout = 5
+            deadline_header = "X-Request-Deadline"
+
+        with deadline(2):
+            DeadlineClient().http_get("/get")
+        connect_timeout, read_timeout = request.call_args.kwargs["timeout"]
+        self.assertAlmostEqual(2, connect_timeout, delta=0.1, msg="Caps the timeouts to the time left")
+        self.assertAlmostEqual(2, read_timeout, delta=0.1, msg="Caps the timeouts to the time left")
+        self.assertAlmostEqual(2000, int(request.call_args.kwargs["headers"]["X-Request-Deadline"]), delta=100, msg="Sends the time left")
+
+    @patch.object(requests.Session, "request")
+    def test_expired_deadline(self, request):
+        with deadline(0):
+            with self.assertRaises(DeadlineExceededError) as cm:
+                ShuttleAPITestClient().http_get("/get")
+        request.assert_not_called()
+        self.assertEqual("/get", cm.exception.source, "Sets the error source")
+
+    @patch("time.sleep")
+    @patch.object(requests.Session, "request")
+    def test_retries_within_deadline(self, request, sleep):
+        request.return_value = mock_response(503)
+
+        class RetryClient(ShuttleAPITestClient):
+            retry_policy = RetryPolicy(max_attempts=5, backoff_factor=0)
+
+        with self.assertRaises(HTTPServerError):
+            RetryClient().http_get("/get")
+        self.assertEqual(5, request.call_count)
+
+        request.reset_mock()
+        request.return_value = mock_response(503)
+        request.return_value.headers["Retry-After"] = "10"
+        with deadline(5):
+            with self.assertRaises(HTTPServerError):
+                RetryClient().http_get("/get")
+        self.assertEqual(1, request.call_count, "Doesn't retry past the deadline")
+
+    def test_read_timeout(self):
+        with self.assertRaises(APIError) as cm:
+            ShuttleAPITestClient().http_get("/delay/2", timeout=0.5)
+        self.assertIs(APIError, type(cm.exception), "Raises a networking error")
+
+        with deadline(0.5):
+            with self.assertRaises(DeadlineExceededError):
+                ShuttleAPITestClient().http_get("/delay/2")
+
+    def test_batch_deadline(self):
+        start = time.monotonic()
+        with deadline(0.5):
+            responses = ShuttleAPITestClient().http_batch(["/status/200", "/delay/2"], timeout=10)
+        self.assertLess(time.monotonic() - start, 1.5, "Applies the current deadline to the batch")
+        self.assertIsInstance(responses[1], DeadlineExceededError)
+
+
+class AsyncShuttleAPITimeoutTest(IsolatedAsyncioTestCase):
+
+    async def test_deadline(self):
+        async with AsyncShuttleAPITestClient() as client:
+            with self.assertRaises(APIError) as cm:
+                await client.http_get("/delay/2", timeout=0.5)
+            self.assertIs(APIError, type(cm.exception), "Raises a networking error")
+
+            with deadline(0.5):
+                with self.assertRaises(DeadlineExceededError):
+                    await client.http_get("/delay/2")
@@ -0,0 +1,235 @@
+import io
+import mmap
+import os
+import requests
+import tempfile
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+from hubble_shuttle import AsyncShuttleAPI, ShuttleAPI
+from hubble_shuttle.downloads import content_range, is_resumable, split_ranges, validator
+from hubble_shuttle.exceptions import APIError, DownloadRangeError, HTTPClientError
+from hubble_shuttle.streaming import ShuttleStreamingResponse
+
+
+class ShuttleAPITestClient(ShuttleAPI):
+    api_endpoint = "http://test_http_server/"
+
+
+class AsyncShuttleAPITestClient(AsyncShuttleAPI):
+    api_endpoint = "http://test_http_server/"
+
+
+# httpbin serves the ranges of /range/<size>, but not of /bytes/<size>
+RANGE_URL = "/range/100000"
+BYTES_URL = "/bytes/5000?seed=1"
+
+
+def expected_content(url):
+    return requests.get("http://test_http_server" + url).content
+
+
+class RangeServer:
+    """
+    Local HTTP server serving `content` with range requests, validated by its `etag`.
+    """
+
+    def __init__(self, content):
+        self.content = content
+        self.etag = '"v1"'
+        self.ranges = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = "http://127.0.0.1:{}/".format(self.server.server_address[1])
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                content = server.content
+                requested = self.headers.get("Range")
+                server.ranges.append(requested)
+                headers = {"ETag": server.etag, "Accept-Ranges": "bytes"}
+                if requested is not None and self.headers.get("If-Range", server.etag) == server.etag:
+                    start, _, last = requested[len("bytes="):].partition("-")
+                    start, end = int(start), min(int(last) + 1, len(content))
+                    if start >= len(content):
+                        self._respond(416, b"", {**headers, "Content-Range": "bytes */{}".format(len(content))})
+                    else:
+                        self._respond(206, content[start:end], {**headers, "Content-Range": "bytes {}-{}/{}".format(start, end - 1, len(content))})
+                else:
+                    self._respond(200, content, headers)
+
+            def _respond(self, status, body, headers):
+                self.send_response(status)
+                for name, value in {**headers, "Content-Length": str(len(body))}.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class DownloadHelpersTest(TestCase):
+
+    def test_content_range(self):
+        self.assertEqual((0, 10, 100), content_range({"Content-Range": "bytes 0-9/100"}), "Returns an exclusive end")
+        self.assertEqual((10, 20, None), content_range({"Content-Range": "bytes 10-19/*"}), "Handles unknown sizes")
+        self.assertIsNone(content_range({"Content-Range": "bytes */100"}))
+        self.assertIsNone(content_range({}))
+
+    def test_split_ranges(self):
+        self.assertEqual([(10, 20), (20, 30), (30, 35)], split_ranges(10, 35, 10))
+        self.assertEqual([], split_ranges(35, 35, 10))
+
+    def test_is_resumable(self):
+        self.assertTrue(is_resumable(APIError("service", "/", ConnectionResetError())))
+        self.assertFalse(is_resumable(DownloadRangeError("service", "/", ValueError())), "Doesn't resume ranges of another resource")
+
+    def test_validator(self):
+        self.assertEqual('"v1"', validator({"ETag": '"v1"', "Last-Modified": "Sun, 18 Oct 2026 00:00:00 GMT"}))
+        self.assertEqual("Sun, 18 Oct 2026 00:00:00 GMT", validator({"ETag": 'W/"v1"', "Last-Modified": "Sun, 18 Oct 2026 00:00:00 GMT"}), "Ranges can't be validated with weak ETags")
+        self.assertIsNone(validator({}))
+
+
+class ShuttleAPIDownloadTest(TestCase):
+
+    def setUp(self):
+        self.content = expected_content(RANGE_URL)
+
+    def test_buffer(self):
+        buffer = bytearray(len(self.content))
+        download = ShuttleAPITestClient().http_download(RANGE_URL, buffer, part_size=16384)
+        self.assertEqual(self.content, buffer)
+        self.assertEqual(len(self.content), download.size)
+        self.assertEqual(7, download.parts, "Downloads the body in ranges")
+        self.assertEqual(206, download.status_code)
+
+    def test_mmap(self):
+        with mmap.mmap(-1, len(self.content)) as buffer:
+            ShuttleAPITestClient().http_download(RANGE_URL, buffer, part_size=16384, concurrency=2)
+            self.assertEqual(self.content, buffer[:])
+
+    def test_path(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "download.bin")
+        with open(path, "wb") as file:
+            file.write(b"previous content" * 10000)
+
+        ShuttleAPITestClient().http_download(RANGE_URL, path, part_size=16384)
+        with open(path, "rb") as file:
+            self.assertEqual(self.content, file.read(), "Replaces the content of the file")
+
+    def test_file_object(self):
+        file = io.BytesIO()
+        ShuttleAPITestClient().http_download(RANGE_URL, file, part_size=16384)
+        self.assertEqual(self.content, file.getvalue())
+
+    def test_without_ranges(self):
+        buffer = bytearray(8192)
+        download = ShuttleAPITestClient().http_download(BYTES_URL, buffer, part_size=1024)
+        self.assertEqual(expected_content(BYTES_URL), buffer[:download.size])
+        self.assertEqual(1, download.parts, "Downloads the whole body when the server doesn't support ranges")
+        self.assertEqual(200, download.status_code)
+
+    def test_target_too_small(self):
+        with self.assertRaises(ValueError):
+            ShuttleAPITestClient().http_download(RANGE_URL, bytearray(1000), part_size=16384)
+        with self.assertRaises(ValueError):
+            ShuttleAPITestClient().http_download(BYTES_URL, bytearray(1000))
+        with self.assertRaises(ValueError):
+            ShuttleAPITestClient().http_download(RANGE_URL, b"read only")
+
+    def test_http_error(self):
+        with self.assertRaises(HTTPClientError):
+            ShuttleAPITestClient().http_download("/status/404", bytearray(10))
+
+    def test_empty(self):
+        with RangeServer(b"") as server:
+            download = ShuttleAPI(api_endpoint=server.url).http_download("/", io.BytesIO(b"previous content"))
+        self.assertEqual(0, download.size, "Treats the 416 response to the first range as an empty download")
+        self.assertEqual(0, download.parts)
+
+    def test_resource_changed(self):
+        with RangeServer(bytes(range(100))) as server:
+            client = ShuttleAPI(api_endpoint=server.url)
+            http_get = client.http_get
+
+            def change_resource(url, **kwargs):
+                response = http_get(url, **kwargs)
+                server.content, server.etag = bytes(100), '"v2"'
+                return response
+
+            with patch.object(client, "http_get", side_effect=change_resource), self.assertRaises(DownloadRangeError):
+                client.http_download("/", bytearray(100), part_size=30, concurrency=1)
+        self.assertEqual(["bytes=0-29", "bytes=30-59"], server.ranges, "Doesn't retry ranges of another version of the resource")
+
+    def test_resume(self):
+        client = ShuttleAPITestClient()
+        readinto = ShuttleStreamingResponse.readinto
+        reads = []
+
+        def interrupted_readinto(response, buffer):
+            # Reads in small chunks, and fails once in the middle of the first range
+            reads.append(len(buffer))
+            if len(reads) == 20:
+                raise APIError(client.http.service_name, RANGE_URL, ConnectionResetError())
+            return readinto(response, buffer[:1000])
+
+        buffer = bytearray(len(self.content))
+        with patch.object(ShuttleStreamingResponse, "readinto", autospec=True, side_effect=interrupted_readinto), \
+                patch.object(client, "http_get", wraps=client.http_get) as http_get:
+            client.http_download(RANGE_URL, buffer, part_size=30000, concurrency=1)
+
+        self.assertEqual(self.content, buffer)
+        ranges = [call.kwargs["headers"]["Range"] for call in http_get.call_args_list]
+        self.assertEqual(["bytes=0-29999", "bytes=19000-29999", "bytes=30000-59999", "bytes=60000-89999", "bytes=90000-99999"], ranges, "Resumes the interrupted range")
+        self.assertEqual("range100000", http_get.call_args.kwargs["headers"]["If-Range"], "Validates the ranges")
+
+    def test_attempts(self):
+        client = ShuttleAPITestClient()
+        client.download_part_attempts = 2
+        error = APIError(client.http.service_name, RANGE_URL, ConnectionResetError())
+
+        with patch.object(ShuttleStreamingResponse, "readinto", side_effect=error) as readinto, self.assertRaises(APIError):
+            client.http_download(RANGE_URL, bytearray(len(self.content)), part_size=50000, concurrency=1)
+        self.assertEqual(2, readinto.call_count, "Gives up on the first range after its attempts")
+
+
+class AsyncShuttleAPIDownloadTest(IsolatedAsyncioTestCase):
+
+    async def test_download(self):
+        content = expected_content(RANGE_URL)
+        async with AsyncShuttleAPITestClient() as client:
+            buffer = bytearray(len(content))
+            download = await client.http_download(RANGE_URL, buffer, part_size=16384)
+            self.assertEqual(content, buffer)
+            self.assertEqual(7, download.parts)
+
+            file = io.BytesIO()
+            download = await client.http_download(BYTES_URL, file)
+            self.assertEqual(expected_content(BYTES_URL), file.getvalue(), "Downloads the whole body when the server doesn't support ranges")
+            self.assertEqual(1, download.parts)
+
+    async def test_empty(self):
+        with RangeServer(b"") as server:
+            async with AsyncShuttleAPI(api_endpoint=server.url) as client:
+                download = await client.http_download("/", bytearray(10))
+        self.assertEqual(0, download.size)
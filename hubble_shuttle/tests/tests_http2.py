@@ -0,0 +1,189 @@
+import json
+import socket
+import threading
+import time
+
+from unittest import IsolatedAsyncioTestCase, TestCase, skipIf
+from urllib.parse import parse_qs, urlsplit
+
+import hubble_shuttle
+from hubble_shuttle import AsyncShuttleAPI, ShuttleAPI
+from hubble_shuttle.http2 import HTTP2AsyncShuttleTransport, HTTP2ShuttleTransport, h2
+
+if h2 is not None:
+    import h2.config
+    import h2.connection
+    import h2.events
+
+
+class H2CServer:
+    """
+    Minimal HTTP/2 server over plain TCP, answering each stream with a JSON
+    description of the request. `/status/<code>` answers with that status, and
+    the `delay` query parameter delays the answer by that many seconds.
+    """
+
+    def __init__(self):
+        self._socket = socket.create_server(("127.0.0.1", 0))
+        self.connections = 0
+        self.max_concurrent_streams = 0
+        self._open_streams = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}/".format(self._socket.getsockname()[1])
+
+    def __enter__(self):
+        threading.Thread(target=self._serve, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self._socket.close()
+
+    def _serve(self):
+        while True:
+            try:
+                connection, _ = self._socket.accept()
+            except OSError:
+                return
+            with self._lock:
+                self.connections += 1
+            threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+
+    def _handle(self, connection):
+        h2_connection = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+        write_lock = threading.Lock()
+        h2_connection.initiate_connection()
+        connection.sendall(h2_connection.data_to_send())
+
+        headers, bodies = {}, {}
+        with connection:
+            while True:
+                try:
+                    data = connection.recv(65535)
+                except OSError:
+                    return
+                if not data:
+                    return
+                with write_lock:
+                    events = h2_connection.receive_data(data)
+                    for event in events:
+                        if isinstance(event, h2.events.RequestReceived):
+                            headers[event.stream_id] = dict(event.headers)
+                            bodies[event.stream_id] = b""
+                        elif isinstance(event, h2.events.DataReceived):
+                            bodies[event.stream_id] += event.data
+                            h2_connection.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                        elif isinstance(event, h2.events.StreamEnded):
+                            threading.Thread(
+                                target=self._respond,
+                                args=(connection, h2_connection, write_lock, event.stream_id, headers.pop(event.stream_id), bodies.pop(event.stream_id)),
+                                daemon=True,
+                            ).start()
+                    connection.sendall(h2_connection.data_to_send())
+
+    def _respond(self, connection, h2_connection, write_lock, stream_id, headers, body):
+        with self._lock:
+            self._open_streams += 1
+            self.max_concurrent_streams = max(self.max_concurrent_streams, self._open_streams)
+
+        path = urlsplit(headers[b":path"].decode())
+        query = parse_qs(path.query)
+        time.sleep(float(query.get("delay", ["0"])[0]))
+        status = path.path.split("/")[2] if path.path.startswith("/status/") else "200"
+        content = json.dumps({
+            "method": headers[b":method"].decode(),
+            "path": path.path,
+            "query": path.query,
+            "stream_id": stream_id,
+            "body": body.decode(),
+        }).encode()
+
+        with self._lock:
+            self._open_streams -= 1
+        with write_lock:
+            h2_connection.send_headers(stream_id, [
+                (":status", status),
+                ("content-type", "application/json"),
+                ("content-length", str(len(content))),
+            ])
+            h2_connection.send_data(stream_id, content, end_stream=True)
+            connection.sendall(h2_connection.data_to_send())
+
+
+@skipIf(h2 is None, "Requires h2")
+class HTTP2ShuttleTransportTest(TestCase):
+
+    def setUp(self):
+        self.server = H2CServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+
+        class HTTP2Client(ShuttleAPI):
+            transport = HTTP2ShuttleTransport
+            api_endpoint = self.server.url
+            request_content_type = "application/json"
+
+        self.client = HTTP2Client()
+        self.addCleanup(self.client.close)
+
+    def test_requests(self):
+        response = self.client.http_post("/users", data={"name": "Shuttle"})
+        self.assertIsInstance(response, hubble_shuttle.http.ShuttleResponse)
+        self.assertEqual("POST", response.data["method"])
+        self.assertEqual({"name": "Shuttle"}, json.loads(response.data["body"]), "Sends the request body")
+
+    def test_query(self):
+        class QueryClient(ShuttleAPI):
+            transport = HTTP2ShuttleTransport
+            api_endpoint = self.server.url
+            query = {"key": "value"}
+
+        with QueryClient() as client:
+            response = client.http_get("/users?page=2")
+        self.assertEqual({"page": ["2"], "key": ["value"]}, parse_qs(response.data["query"]), "Keeps the query string of the URL")
+
+    def test_errors(self):
+        with self.assertRaises(hubble_shuttle.exceptions.NotFoundError) as cm:
+            self.client.http_get("/status/404")
+        self.assertEqual("/status/404", cm.exception.response["path"], "Parses the error response")
+
+        with self.assertRaises(hubble_shuttle.exceptions.NotFoundError):
+            self.client.http_get("/status/404", stream=True)
+
+    def test_streaming(self):
+        with self.client.http_get("/users", stream=True) as response:
+            self.assertEqual("/users", json.loads(b"".join(response.iter_bytes()))["path"])
+
+    def test_multiplexing(self):
+        results = self.client.http_batch(["/users/{}?delay=0.2".format(index) for index in range(10)])
+        self.assertEqual(10, len({result.data["stream_id"] for result in results}))
+        self.assertEqual(1, self.server.connections, "Sends the requests on a single connection")
+        self.assertGreater(self.server.max_concurrent_streams, 1, "Multiplexes the requests")
+
+    def test_network_error(self):
+        class UnreachableClient(ShuttleAPI):
+            transport = HTTP2ShuttleTransport
+            api_endpoint = "http://127.0.0.1:1/"
+
+        with self.assertRaises(hubble_shuttle.exceptions.APIError):
+            UnreachableClient().http_get("/users")
+
+
+@skipIf(h2 is None, "Requires h2")
+class HTTP2AsyncShuttleTransportTest(IsolatedAsyncioTestCase):
+
+    async def test_multiplexing(self):
+        with H2CServer() as server:
+            class HTTP2Client(AsyncShuttleAPI):
+                transport = HTTP2AsyncShuttleTransport
+                api_endpoint = server.url
+
+            async with HTTP2Client() as client:
+                results = await client.http_batch(["/users/{}?delay=0.2".format(index) for index in range(10)])
+                with self.assertRaises(hubble_shuttle.exceptions.HTTPServerError):
+                    await client.http_get("/status/503")
+
+        self.assertEqual(["/users/{}".format(index) for index in range(10)], [result.data["path"] for result in results])
+        self.assertEqual(1, server.connections, "Sends the requests on a single connection")
+        self.assertGreater(server.max_concurrent_streams, 1, "Multiplexes the requests")
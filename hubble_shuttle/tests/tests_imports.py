@@ -0,0 +1,57 @@
+import json
+import subprocess
+import sys
+
+from unittest import TestCase
+from unittest.mock import patch
+
+
+def loaded_modules(statement, modules):
+    # Imports are cached per interpreter, so they are checked in a fresh one
+    output = subprocess.run(
+        [sys.executable, "-c", "import json, sys\n{}\nprint(json.dumps([name for name in {!r} if name in sys.modules]))".format(statement, modules)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output)
+
+
+class LazyImportTest(TestCase):
+
+    def test_exceptions(self):
+        self.assertEqual([], loaded_modules("import hubble_shuttle.exceptions", ["hubble_shuttle.api", "requests", "httpx"]), "Doesn't import the HTTP stack")
+
+    def test_client(self):
+        statement = "from hubble_shuttle import ShuttleAPI, AsyncShuttleAPI\nShuttleAPI(api_endpoint='http://test_http_server/')"
+        self.assertEqual([], loaded_modules(statement, ["requests", "urllib3", "httpx"]), "Imports the HTTP backends on the first request")
+
+    def test_first_request(self):
+        statement = "from hubble_shuttle import ShuttleAPI\nShuttleAPI(api_endpoint='http://test_http_server/').http_get('/get')"
+        self.assertEqual(["requests"], loaded_modules(statement, ["requests", "httpx"]))
+
+    def test_package_attributes(self):
+        import hubble_shuttle
+        from hubble_shuttle.api import ShuttleAPI
+
+        self.assertIs(ShuttleAPI, hubble_shuttle.ShuttleAPI)
+        self.assertEqual("APIError", hubble_shuttle.exceptions.APIError.__name__, "Imports submodules on access")
+        with self.assertRaises(AttributeError):
+            hubble_shuttle.missing
+
+    def test_custom_session(self):
+        import requests
+        from hubble_shuttle import ShuttleAPI
+        from hubble_shuttle.exceptions import NotFoundError
+        from hubble_shuttle.http import RequestsShuttleTransport
+
+        class CustomSessionTransport(RequestsShuttleTransport):
+            def _create_session(self):
+                return requests.Session()
+
+        class CustomSessionClient(ShuttleAPI):
+            api_endpoint = "http://test_http_server/"
+            transport = CustomSessionTransport
+            share_transport = False
+
+        # As if requests had only been imported by the overridden session
+        with patch("hubble_shuttle.http.requests", None), self.assertRaises(NotFoundError):
+            CustomSessionClient().http_get("/status/404")
@@ -0,0 +1,149 @@
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+import hubble_shuttle
+from hubble_shuttle import AsyncShuttleAPI, ShuttleAPI
+from hubble_shuttle.instrumentation import Instrumentation, LatencyHistograms, RequestEvent, path_template
+
+
+class RecordingInstrumentation(Instrumentation):
+
+    def __init__(self):
+        self.calls = []
+
+    def on_request(self, event):
+        self.calls.append(("request", event))
+
+    def on_response(self, event, response):
+        self.calls.append(("response", event))
+
+    def on_error(self, event, error):
+        self.calls.append(("error", event))
+
+    def on_parse(self, event, duration):
+        self.calls.append(("parse", event))
+
+
+class ShuttleAPITestClient(ShuttleAPI):
+    api_endpoint = "http://test_http_server/"
+
+
+class AsyncShuttleAPITestClient(AsyncShuttleAPI):
+    api_endpoint = "http://test_http_server/"
+
+
+class PathTemplateTest(TestCase):
+
+    def test_path_template(self):
+        self.assertEqual("/users/{id}/plans", path_template("/users/123/plans?page=2"), "Replaces numeric identifiers")
+        self.assertEqual("/users/{id}", path_template("/users/0b6f6ba4-0c5e-4d2b-9c1b-2f7f3e9f7c4a"), "Replaces UUIDs")
+        self.assertEqual("/users/me", path_template("/users/me"), "Keeps the other segments")
+
+
+class RequestEventTest(TestCase):
+
+    def test_span_attributes(self):
+        event = RequestEvent("a-service-name", "get", "/users/1", request_bytes=10)
+        event.status_code = 200
+        event.response_bytes = 20
+        event.duration = 0.5
+        event.timings["ttfb"] = 0.25
+        self.assertEqual(
+            {
+                "http.request.method": "GET",
+                "url.template": "/users/{id}",
+                "shuttle.service.name": "a-service-name",
+                "http.response.status_code": 200,
+                "http.request.body.size": 10,
+                "http.response.body.size": 20,
+                "shuttle.timing.total": 0.5,
+                "shuttle.timing.ttfb": 0.25,
+            },
+            event.span_attributes(),
+            "Returns OpenTelemetry HTTP attributes",
+        )
+
+
+class LatencyHistogramsTest(TestCase):
+
+    def test_percentiles(self):
+        histograms = LatencyHistograms(buckets=[0.1, 0.2, 0.5, 1])
+        for _ in range(90):
+            histograms.observe("service", "get", "/users", "total", 0.05)
+        for _ in range(10):
+            histograms.observe("service", "get", "/users", "total", 0.4)
+
+        percentiles = histograms.percentiles("service", "get", "/users")
+        self.assertAlmostEqual(0.1 * 50 / 90, percentiles["p50"], msg="Interpolates within the bucket")
+        self.assertAlmostEqual(0.2 + 0.3 * 5 / 10, percentiles["p95"])
+        self.assertAlmostEqual(0.2 + 0.3 * 9 / 10, percentiles["p99"])
+        self.assertIsNone(histograms.percentiles("service", "get", "/plans"), "Returns None for unknown endpoints")
+
+    def test_to_prometheus(self):
+        histograms = LatencyHistograms(buckets=[0.1, 1])
+        histograms.observe("service", "get", '/users/"{id}"', "total", 0.05)
+        histograms.observe("service", "get", '/users/"{id}"', "total", 2)
+        self.assertEqual(
+            "# HELP shuttle_request_duration_seconds Duration of the requests sent by Shuttle clients, by phase.\n"
+            "# TYPE shuttle_request_duration_seconds histogram\n"
+            'shuttle_request_duration_seconds_bucket{service="service",method="GET",endpoint="/users/\\"{id}\\"",phase="total",le="0.1"} 1\n'
+            'shuttle_request_duration_seconds_bucket{service="service",method="GET",endpoint="/users/\\"{id}\\"",phase="total",le="1.0"} 1\n'
+            'shuttle_request_duration_seconds_bucket{service="service",method="GET",endpoint="/users/\\"{id}\\"",phase="total",le="+Inf"} 2\n'
+            'shuttle_request_duration_seconds_sum{service="service",method="GET",endpoint="/users/\\"{id}\\"",phase="total"} 2.05\n'
+            'shuttle_request_duration_seconds_count{service="service",method="GET",endpoint="/users/\\"{id}\\"",phase="total"} 2\n',
+            histograms.to_prometheus(),
+            "Exports the histograms in the Prometheus text format",
+        )
+
+
+class ShuttleAPIInstrumentationTest(TestCase):
+
+    def test_hooks(self):
+        hooks = RecordingInstrumentation()
+        histograms = LatencyHistograms()
+
+        class InstrumentedClient(ShuttleAPITestClient):
+            instrumentation = [hooks, histograms]
+
+        response = InstrumentedClient().http_post("/post", data={"id": 1})
+        self.assertEqual(["request", "response"], [name for name, event in hooks.calls], "Notifies the request and response")
+
+        event = hooks.calls[0][1]
+        self.assertEqual(("InstrumentedClient", "post", "/post", 200), (event.service_name, event.method, event.path, event.status_code))
+        self.assertEqual(len(response.content), event.response_bytes, "Records the response size")
+        self.assertEqual({"ttfb", "download"}, set(event.timings), "Records the phase timings")
+        self.assertGreater(event.duration, 0, "Records the request duration")
+
+        response.data
+        self.assertEqual("parse", hooks.calls[-1][0], "Notifies the lazy parsing")
+        self.assertIsNotNone(histograms.percentiles("InstrumentedClient", "post", "/post", "parse"))
+        self.assertIsNotNone(histograms.percentiles("InstrumentedClient", "post", "/post", "ttfb"))
+
+    def test_error_hook(self):
+        hooks = RecordingInstrumentation()
+
+        class InstrumentedClient(ShuttleAPITestClient):
+            instrumentation = [hooks]
+
+        with self.assertRaises(hubble_shuttle.exceptions.NotFoundError):
+            InstrumentedClient().http_get("/status/404")
+        self.assertEqual(["request", "error"], [name for name, event in hooks.calls], "Notifies the error")
+        self.assertEqual(404, hooks.calls[1][1].status_code, "Records the error status")
+        self.assertEqual("/status/{id}", hooks.calls[1][1].path, "Records the templated path")
+
+
+class AsyncShuttleAPIInstrumentationTest(IsolatedAsyncioTestCase):
+
+    async def test_hooks(self):
+        hooks = RecordingInstrumentation()
+
+        class InstrumentedClient(AsyncShuttleAPITestClient):
+            instrumentation = [hooks]
+
+        async with InstrumentedClient() as client:
+            response = await client.http_get("/get")
+        self.assertEqual(["request", "response"], [name for name, event in hooks.calls], "Notifies the request and response")
+
+        event = hooks.calls[1][1]
+        self.assertEqual(200, event.status_code)
+        self.assertEqual(len(response.content), event.response_bytes, "Records the response size")
+        self.assertEqual({"connect", "ttfb", "download"}, set(event.timings), "Records the phase timings")
@@ -0,0 +1,92 @@
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import call, patch
+
+from hubble_shuttle import AsyncShuttleAPI, ShuttleAPI
+from hubble_shuttle.http import ShuttleResponse
+from hubble_shuttle.pagination import CursorPagination, OffsetPagination, parse_link_header
+
+
+class ShuttleAPITestClient(ShuttleAPI):
+    api_endpoint = "http://test_http_server/"
+
+
+class AsyncShuttleAPITestClient(AsyncShuttleAPI):
+    api_endpoint = "http://test_http_server/"
+
+
+LINK_PAGES = {
+    "/users": ShuttleResponse([1, 2], 200, {"Link": '<http://host/users?page=2>; rel="next"'}),
+    "http://host/users?page=2": ShuttleResponse([3, 4], 200, {"Link": '<http://host/users?page=3>; rel="next last"'}),
+    "http://host/users?page=3": ShuttleResponse([5], 200, {"Link": '<http://host/users>; rel="first"'}),
+}
+
+def get_link_page(url, **kwargs):
+    return LINK_PAGES[url]
+
+def get_cursor_page(url, query=None):
+    cursor = (query or {}).get("cursor")
+    if cursor is None:
+        return ShuttleResponse({"results": [1, 2], "next_cursor": "abc"}, 200, {})
+    return ShuttleResponse({"results": [3], "next_cursor": None}, 200, {})
+
+def get_offset_page(url, query=None):
+    items = list(range(5))
+    return ShuttleResponse({"results": items[query["offset"]:query["offset"] + query["limit"]]}, 200, {})
+
+
+class ParseLinkHeaderTest(TestCase):
+
+    def test_parse(self):
+        self.assertEqual(
+            {"next": "http://host/?page=2", "last": "http://host/?page=5", "prev": "/?page=1"},
+            parse_link_header('<http://host/?page=2>; rel="next", <http://host/?page=5>; rel=last, </?page=1>; title="x"; rel="prev"'),
+            "Returns the URLs by relation type",
+        )
+        self.assertEqual({}, parse_link_header(""), "Handles missing headers")
+
+
+class ShuttleAPIPaginationTest(TestCase):
+
+    def test_link_header_pagination(self):
+        client = ShuttleAPITestClient()
+        with patch.object(client, "http_get", side_effect=get_link_page) as http_get:
+            self.assertEqual([1, 2, 3, 4, 5], list(client.http_paginate("/users", query={"sort": "name"})), "Yields the items of all the pages")
+        self.assertEqual(call("/users", query={"sort": "name"}), http_get.call_args_list[0], "Sends the request arguments")
+        self.assertEqual(call("http://host/users?page=2"), http_get.call_args_list[1], "Follows the next link")
+
+    def test_cursor_pagination(self):
+        client = ShuttleAPITestClient()
+        with patch.object(client, "http_get", side_effect=get_cursor_page) as http_get:
+            self.assertEqual([1, 2, 3], list(client.http_paginate("/users", pagination=CursorPagination())), "Yields the items of all the pages")
+        self.assertEqual(call("/users", query={"cursor": "abc"}), http_get.call_args_list[1], "Sends the cursor")
+
+    def test_offset_pagination(self):
+        client = ShuttleAPITestClient()
+        with patch.object(client, "http_get", side_effect=get_offset_page) as http_get:
+            items = list(client.http_paginate("/users", pagination=OffsetPagination(limit=2)))
+        self.assertEqual([0, 1, 2, 3, 4], items, "Yields the items of all the pages")
+        self.assertEqual(3, http_get.call_count, "Stops after the last page")
+
+    def test_lazy_pages(self):
+        client = ShuttleAPITestClient()
+        with patch.object(client, "http_get", side_effect=get_link_page) as http_get:
+            items = client.http_paginate("/users")
+            next(items)
+            self.assertEqual(1, http_get.call_count, "Only requests the pages as needed")
+
+    def test_prefetch(self):
+        client = ShuttleAPITestClient()
+        with patch.object(client, "http_get", side_effect=get_link_page) as http_get:
+            items = client.http_paginate("/users", prefetch=True)
+            self.assertEqual([1, 2, 3, 4, 5], list(items), "Yields the items of all the pages")
+            self.assertEqual(3, http_get.call_count, "Requests each page once")
+
+
+class AsyncShuttleAPIPaginationTest(IsolatedAsyncioTestCase):
+
+    async def test_link_header_pagination(self):
+        client = AsyncShuttleAPITestClient()
+        for prefetch in [False, True]:
+            with patch.object(client, "http_get", side_effect=get_link_page):
+                items = [item async for item in client.http_paginate("/users", prefetch=prefetch)]
+            self.assertEqual([1, 2, 3, 4, 5], items, "Yields the items of all the pages")
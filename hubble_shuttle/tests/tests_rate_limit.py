@@ -0,0 +1,156 @@
+import os
+import requests
+import tempfile
+
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from hubble_shuttle.deadline import deadline
+from hubble_shuttle.exceptions import DeadlineExceededError, HTTPClientError, RateLimitExceededError
+from hubble_shuttle.http import ShuttleResponse
+from hubble_shuttle.rate_limit import Rate, RateLimiter, SQLiteBucketBackend
+from hubble_shuttle.tests.helpers import SERVICE_NAME, Clock, ShuttleAPITestClient, mock_response
+
+def response(headers=None):
+    return ShuttleResponse(None, 200, headers or {})
+
+
+class RateLimiterTest(TestCase):
+
+    def setUp(self):
+        # Also replaces the wall clock, so starts at a realistic timestamp
+        self.clock = Clock(1700000000.0)
+        for target in ["time.monotonic", "time.time"]:
+            patcher = patch(target, self.clock)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def delays(self, limiter, count, url="/path"):
+        buckets = limiter._buckets(SERVICE_NAME, url)
+        return [limiter.acquire(SERVICE_NAME, url, buckets) for _ in range(count)]
+
+    def test_token_bucket(self):
+        limiter = RateLimiter(10, burst=2)
+        self.assertEqual([0, 0], self.delays(limiter, 2), "Allows bursts")
+        self.assertAlmostEqual(0.1, self.delays(limiter, 1)[0], msg="Waits for the next token")
+        self.assertAlmostEqual(0.2, self.delays(limiter, 1)[0], msg="Queues the waiting requests")
+
+        self.clock.now += 10
+        self.assertEqual([0, 0], self.delays(limiter, 2), "Refills the bucket")
+
+    def test_period(self):
+        limiter = RateLimiter(60, period=60, burst=1)
+        self.assertEqual([0, 1], self.delays(limiter, 2), "Spreads the requests over the period")
+
+    def test_keyed_by_service(self):
+        limiter = RateLimiter(1)
+        limiter.acquire(SERVICE_NAME, "/path", limiter._buckets(SERVICE_NAME, "/path"))
+        self.assertEqual(0, limiter.acquire("another-service", "/path", limiter._buckets("another-service", "/path")))
+
+    def test_non_blocking(self):
+        limiter = RateLimiter(1, block=False)
+        self.delays(limiter, 1)
+        with self.assertRaises(RateLimitExceededError) as cm:
+            self.delays(limiter, 1)
+        self.assertEqual(SERVICE_NAME, cm.exception.service_name, "Sets the service name")
+        self.assertEqual("/path", cm.exception.source, "Sets the error source")
+
+        self.clock.now += 1
+        self.assertEqual([0], self.delays(limiter, 1), "Doesn't take tokens for rejected requests")
+
+    def test_max_wait(self):
+        limiter = RateLimiter(1, max_wait=1)
+        self.assertEqual([0, 1], self.delays(limiter, 2))
+        with self.assertRaises(RateLimitExceededError):
+            self.delays(limiter, 1)
+
+    def test_deadline(self):
+        limiter = RateLimiter(1)
+        self.delays(limiter, 1)
+        with deadline(0.5):
+            with self.assertRaises(DeadlineExceededError):
+                self.delays(limiter, 1)
+
+    def test_endpoints(self):
+        limiter = RateLimiter(10, burst=10, endpoints={r"^/search": Rate(1, period=10)}, block=False)
+        self.delays(limiter, 1, "/search?q=a")
+        with self.assertRaises(RateLimitExceededError):
+            self.delays(limiter, 1, "/search?q=b")
+        self.assertEqual([0] * 9, self.delays(limiter, 9, "/users"), "Keeps a bucket per endpoint pattern")
+        with self.assertRaises(RateLimitExceededError):
+            self.delays(limiter, 1, "/users")
+
+    def test_retry_after(self):
+        limiter = RateLimiter(10)
+        buckets = limiter._buckets(SERVICE_NAME, "/path")
+        limiter.update(buckets, {"Retry-After": "5"})
+        self.assertAlmostEqual(5.1, self.delays(limiter, 1)[0], msg="Waits for the Retry-After delay")
+
+    def test_rate_limit_headers(self):
+        limiter = RateLimiter(10)
+        buckets = limiter._buckets(SERVICE_NAME, "/path")
+        limiter.update(buckets, {"X-RateLimit-Remaining": "1"})
+        self.assertAlmostEqual([0, 0.1], self.delays(limiter, 2), msg="Uses the remaining quota")
+
+        limiter.reset()
+        limiter.update(buckets, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(int(self.clock.now) + 30)})
+        self.assertAlmostEqual(30.1, self.delays(limiter, 1)[0], msg="Waits until the quota is reset")
+
+    def test_call(self):
+        limiter = RateLimiter(10, burst=1)
+        with patch("time.sleep") as sleep:
+            limiter.call(SERVICE_NAME, "/path", MagicMock(return_value=response()))
+            sleep.assert_not_called()
+
+            error = HTTPClientError(SERVICE_NAME, "/path", None, ShuttleResponse(None, 429, {"Retry-After": "2"}))
+            with self.assertRaises(HTTPClientError):
+                limiter.call(SERVICE_NAME, "/path", MagicMock(side_effect=error))
+            self.assertAlmostEqual(0.1, sleep.call_args.args[0], msg="Waits for a token")
+            self.clock.now += 0.1
+
+            limiter.call(SERVICE_NAME, "/path", MagicMock(return_value=response()))
+            self.assertAlmostEqual(2.1, sleep.call_args.args[0], places=5, msg="Adapts to the error responses")
+
+
+class SQLiteBucketBackendTest(TestCase):
+
+    def test_shared_buckets(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "buckets.db")
+            limiter = RateLimiter(1, period=60, block=False, backend=SQLiteBucketBackend(path))
+            other_limiter = RateLimiter(1, period=60, block=False, backend=SQLiteBucketBackend(path))
+
+            limiter.acquire(SERVICE_NAME, "/path", limiter._buckets(SERVICE_NAME, "/path"))
+            with self.assertRaises(RateLimitExceededError):
+                other_limiter.acquire(SERVICE_NAME, "/path", other_limiter._buckets(SERVICE_NAME, "/path"))
+
+            limiter.reset()
+            self.assertEqual(0, other_limiter.acquire(SERVICE_NAME, "/path", other_limiter._buckets(SERVICE_NAME, "/path")))
+
+
+class AsyncRateLimiterTest(IsolatedAsyncioTestCase):
+
+    @patch("asyncio.sleep", new_callable=AsyncMock)
+    async def test_call_async(self, sleep):
+        limiter = RateLimiter(1, burst=1)
+        for _ in range(2):
+            await limiter.call_async(SERVICE_NAME, "/path", AsyncMock(return_value=response()))
+        self.assertEqual(1, sleep.await_count, "Waits for a token")
+
+
+class RateLimitedTestClient(ShuttleAPITestClient):
+    rate_limiter = RateLimiter(1, period=60, block=False)
+
+
+class ShuttleAPIRateLimitTest(TestCase):
+
+    def setUp(self):
+        RateLimitedTestClient.rate_limiter.reset()
+
+    @patch.object(requests.Session, "request")
+    def test_shared_by_client_instances(self, request):
+        request.return_value = mock_response(200)
+        RateLimitedTestClient().http_get("/path")
+        with self.assertRaises(RateLimitExceededError):
+            RateLimitedTestClient().http_get("/path")
+        self.assertEqual(1, request.call_count, "Doesn't send rate limited requests")
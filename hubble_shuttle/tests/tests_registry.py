@@ -0,0 +1,183 @@
+import gc
+import os
+
+from unittest import TestCase
+from unittest.mock import patch
+
+from hubble_shuttle import AsyncShuttleAPI, ShuttleAPI
+from hubble_shuttle.registry import TRANSPORTS, TransportOverlay, TransportRegistry, settings_key
+
+
+class ShuttleAPITestClient(ShuttleAPI):
+    api_endpoint = "http://test_http_server/"
+    headers = {"X-Client": "class", "X-Class-Only": "class"}
+
+
+class TransportRegistryTest(TestCase):
+
+    def test_get(self):
+        registry = TransportRegistry()
+        self.assertIs(registry.get(ShuttleAPITestClient, "key", object), registry.get(ShuttleAPITestClient, "key", object), "Creates the transport once")
+        self.assertIsNot(registry.get(ShuttleAPITestClient, "key", object), registry.get(ShuttleAPITestClient, "other-key", object))
+
+    def test_settings_changed(self):
+        registry = TransportRegistry()
+        transport = registry.get(ShuttleAPITestClient, "key", object, {"read_timeout": None})
+        self.assertIs(transport, registry.get(ShuttleAPITestClient, "key", object, {"read_timeout": None}))
+        self.assertIsNot(transport, registry.get(ShuttleAPITestClient, "key", object, {"read_timeout": 0.5}), "Replaces the transport")
+        self.assertEqual(1, len(registry._transports[ShuttleAPITestClient]))
+
+    def test_max_transports(self):
+        registry = TransportRegistry(max_transports=2)
+        first = registry.get(ShuttleAPITestClient, "first", object)
+        registry.get(ShuttleAPITestClient, "second", object)
+        registry.get(ShuttleAPITestClient, "third", object)
+        self.assertEqual(["second", "third"], list(registry._transports[ShuttleAPITestClient]), "Drops the oldest transport")
+        self.assertIsNot(first, registry.get(ShuttleAPITestClient, "first", object))
+
+    def test_settings_key(self):
+        self.assertEqual(settings_key({"a": [1, {"b": 2}]}), settings_key({"a": [1, {"b": 2}]}), "Compares dicts and lists by value")
+        hash(settings_key({"a": [1, {"b": 2}]}))
+
+    def test_dropped_with_class(self):
+        registry = TransportRegistry()
+
+        class TemporaryClient(ShuttleAPITestClient):
+            pass
+
+        registry.get(TemporaryClient, "key", object)
+        del TemporaryClient
+        gc.collect()
+        self.assertEqual(0, len(registry._transports), "Doesn't keep the client classes alive")
+
+
+class ShuttleAPISharedTransportTest(TestCase):
+
+    def test_shared_transport(self):
+        self.assertIs(ShuttleAPITestClient().http, ShuttleAPITestClient().http, "Shares the transport between instances")
+        self.assertIsNot(
+            ShuttleAPITestClient().http,
+            ShuttleAPITestClient(api_endpoint="http://other_server/").http,
+            "Keeps a transport per endpoint",
+        )
+
+    def test_not_shared_between_classes(self):
+        class OtherClient(ShuttleAPITestClient):
+            pass
+
+        self.assertIsNot(ShuttleAPITestClient().http, OtherClient().http)
+        self.assertEqual("OtherClient", OtherClient().http.service_name)
+
+    def test_instance_overlay(self):
+        client = ShuttleAPITestClient(headers={"X-Client": "instance"}, locale="fr-fr")
+        self.assertIsInstance(client.http, TransportOverlay)
+        self.assertIs(ShuttleAPITestClient().http, client.http.transport, "Uses the shared transport")
+
+        headers = client.http_get("/headers").data["headers"]
+        self.assertEqual("instance", headers["X-Client"], "Sends the instance headers")
+        self.assertEqual("fr-fr", headers["Accept-Language"], "Sends the instance locale")
+        self.assertNotIn("X-Class-Only", headers, "Replaces the class headers")
+
+        headers = ShuttleAPITestClient().http_get("/headers").data["headers"]
+        self.assertEqual("class", headers["X-Client"], "Doesn't change the shared transport")
+
+    def test_instance_query(self):
+        response = ShuttleAPITestClient(query={"page": "2"}).http_get("/get", query={"per_page": "10"})
+        self.assertEqual({"page": "2", "per_page": "10"}, response.data["args"])
+
+    def test_class_settings_changed(self):
+        class ConfiguredClient(ShuttleAPITestClient):
+            pass
+
+        transport = ConfiguredClient().http
+        ConfiguredClient.query = {"x": "1"}
+        self.assertEqual({"x": "1"}, ConfiguredClient().http_get("/get").data["args"], "Sends the new class query parameters")
+
+        ConfiguredClient.read_timeout = 0.5
+        self.assertEqual(0.5, ConfiguredClient().http.read_timeout)
+        self.assertIsNot(transport, ConfiguredClient().http)
+
+        with patch.object(ConfiguredClient, "headers", {"X-Client": "patched"}):
+            self.assertEqual("patched", ConfiguredClient().http_get("/headers").data["headers"]["X-Client"], "Sends the patched class headers")
+        self.assertEqual("class", ConfiguredClient().http_get("/headers").data["headers"]["X-Client"])
+
+    def test_property_defaults(self):
+        class PropertyClient(ShuttleAPITestClient):
+            def __init__(self, token, **kwargs):
+                self.token = token
+                super().__init__(**kwargs)
+
+            @property
+            def headers(self):
+                return {"Authorization": "Bearer {}".format(self.token)}
+
+            @property
+            def query(self):
+                return {"token": self.token}
+
+        client = PropertyClient("first")
+        self.assertIsInstance(client.http, TransportOverlay, "Sends the headers of the properties with an overlay")
+        self.assertIs(client.http.transport, PropertyClient("second").http.transport, "Shares the transport")
+        response = client.http_get("/anything")
+        self.assertEqual("Bearer first", response.data["headers"]["Authorization"])
+        self.assertEqual({"token": "first"}, response.data["args"])
+
+    def test_instance_settings(self):
+        class TimeoutClient(ShuttleAPITestClient):
+            def __init__(self, read_timeout=None, **kwargs):
+                if read_timeout is not None:
+                    self.read_timeout = read_timeout
+                super().__init__(**kwargs)
+
+        transport = TimeoutClient().http
+        short = TimeoutClient(read_timeout=0.5).http
+        self.assertEqual(0.5, short.read_timeout)
+        self.assertIsNot(transport, short)
+        self.assertIs(short, TimeoutClient(read_timeout=0.5).http, "Shares the transport between instances with the same settings")
+        self.assertIs(transport, TimeoutClient().http, "Doesn't replace the transport of the class")
+
+    def test_unhashable_instance_settings(self):
+        class XMLDecoder:
+            # Defining __eq__ without __hash__ makes the instances unhashable
+            def __eq__(self, other):
+                return isinstance(other, XMLDecoder)
+
+            def __call__(self, content, media_type):
+                return content
+
+        class UnhashableClient(ShuttleAPITestClient):
+            def __init__(self, **kwargs):
+                self.decoders = {"application/xml": XMLDecoder()}
+                super().__init__(**kwargs)
+
+        client = UnhashableClient()
+        self.assertIsNot(client.http, UnhashableClient().http, "Creates a transport for the instance")
+        client.close()
+        self.assertIsNone(client.http._session, "Releases the connections of the instance transport")
+
+    def test_not_shared(self):
+        class UnsharedClient(ShuttleAPITestClient):
+            share_transport = False
+
+        self.assertIsNot(UnsharedClient().http, UnsharedClient().http)
+        self.assertFalse(AsyncShuttleAPI.share_transport, "Doesn't share asynchronous transports")
+
+    def test_fork(self):
+        transport = ShuttleAPITestClient().http
+        session = transport._get_session()
+
+        with patch("os.getpid", return_value=os.getpid() + 1), patch.object(type(session), "close") as close:
+            self.assertIsNot(session, transport._get_session(), "Opens new connections in forked processes")
+            close.assert_not_called()
+
+    def test_close(self):
+        transport = ShuttleAPITestClient().http
+        session = transport._get_session()
+        with ShuttleAPITestClient(headers={"X-Client": "instance"}):
+            pass
+        ShuttleAPITestClient().close()
+        self.assertIs(session, transport._session, "Keeps the shared connections open when closing an instance")
+
+        TRANSPORTS.close()
+        self.assertIsNone(transport._session, "Releases the connections")
+        self.assertIs(transport, ShuttleAPITestClient().http, "Keeps the transports")
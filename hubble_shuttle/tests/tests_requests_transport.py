@@ -1,9 +1,13 @@
 import requests
+import urllib.request
 
 from unittest import TestCase
 from unittest.mock import MagicMock, patch
 
+from hubble_shuttle.exceptions import APIError, NotFoundError
 from hubble_shuttle.http import RequestsShuttleTransport
+from hubble_shuttle.json_codecs import OrjsonJSONCodec, StdlibJSONCodec
+from hubble_shuttle.tests.helpers import json_response, mock_response
 
 class ShuttleAPITest(TestCase):
 
@@ -38,3 +42,190 @@ class ShuttleAPITest(TestCase):
             RequestsShuttleTransport(api_endpoint = "http://host:123", **kwargs)._prepare_request_url("/path"),
             "Preserves the port number"
         )
+        self.assertEqual(
+            "http://host/other/file.json",
+            RequestsShuttleTransport(api_endpoint = "http://host/api/", **kwargs)._prepare_request_url("/../other/./file.json"),
+            "Resolves relative path segments"
+        )
+        self.assertEqual(
+            "https://other/path",
+            RequestsShuttleTransport(api_endpoint = "http://host/api/", **kwargs)._prepare_request_url("https://other/path"),
+            "Keeps absolute URLs"
+        )
+
+def build_transport(**kwargs):
+    return RequestsShuttleTransport(
+        api_endpoint = "http://host",
+        headers = {},
+        query = {},
+        request_content_type = "application/json",
+        **kwargs,
+    )
+
+class RequestsShuttleTransportPreparationTest(TestCase):
+
+    def test_client_level_arguments(self):
+        transport = RequestsShuttleTransport(
+            api_endpoint = "http://host",
+            headers = {"Authorization": "Bearer token"},
+            query = {"api_key": "key", "tags": ["a", "b"], "missing": None},
+            request_content_type = "application/json",
+        )
+
+        request_args = transport._prepare_request_args(headers=None, query=None)
+        self.assertEqual({"Authorization": "Bearer token"}, request_args["headers"], "Sends the client-level headers")
+        self.assertEqual("api_key=key&tags=a&tags=b", request_args["params"], "Sends the pre-encoded client-level query")
+        self.assertIs(
+            request_args["headers"],
+            transport._prepare_request_args(headers=None, query=None)["headers"],
+            "Reuses the client-level headers",
+        )
+
+        request_args = transport._prepare_request_args(headers={"Authorization": "Bearer other"}, query={"page": 2})
+        self.assertEqual({"Authorization": "Bearer other"}, request_args["headers"], "Overrides the client-level headers")
+        self.assertEqual({"api_key": "key", "tags": ["a", "b"], "missing": None, "page": 2}, request_args["params"], "Merges the query")
+        self.assertEqual({"Authorization": "Bearer token"}, transport.headers, "Doesn't modify the client-level headers")
+
+    @patch.object(requests.Session, "request")
+    def test_sends_encoded_query(self, request):
+        request.return_value = json_response(None)
+        transport = RequestsShuttleTransport(
+            api_endpoint = "http://host",
+            headers = {},
+            query = {"api_key": "key"},
+            request_content_type = "application/json",
+        )
+        transport.get("/path")
+        self.assertEqual("api_key=key", request.call_args.kwargs["params"], "Sends the encoded query")
+
+class RequestsShuttleTransportSessionTest(TestCase):
+
+    @patch.object(requests.Session, "request")
+    def test_reuses_session(self, request):
+        request.return_value = json_response({"foo": "bar"})
+        transport = build_transport()
+
+        transport.get("/path")
+        session = transport._session
+        transport.get("/path")
+
+        self.assertEqual(2, request.call_count, "Sends both requests")
+        self.assertIs(session, transport._session, "Keeps the same session between requests")
+
+    def test_pool_settings(self):
+        transport = build_transport(pool_connections=3, pool_maxsize=7)
+        adapter = transport._get_session().get_adapter("https://host/")
+        self.assertEqual(3, adapter._pool_connections, "Configures the number of pools")
+        self.assertEqual(7, adapter._pool_maxsize, "Configures the number of connections per pool")
+
+    def test_keepalive_timeout(self):
+        transport = build_transport(pool_keepalive_timeout=30)
+        session = transport._get_session()
+        self.assertIs(session, transport._get_session(), "Reuses the session while it is in use")
+
+        transport._session_last_used -= 60
+        self.assertIsNot(session, transport._get_session(), "Drops the session after being idle")
+
+    def test_does_not_store_cookies(self):
+        session = build_transport()._get_session()
+        cookie = requests.cookies.create_cookie("foo", "bar", domain="host")
+        session.cookies.set_cookie_if_ok(cookie, urllib.request.Request("http://host/path"))
+        self.assertEqual(0, len(session.cookies), "Doesn't store cookies between requests")
+
+    def test_close(self):
+        transport = build_transport()
+        with patch.object(requests.Session, "close") as close:
+            with transport:
+                transport._get_session()
+            close.assert_called_once()
+        self.assertIsNone(transport._session, "Drops the session")
+
+class RequestsShuttleTransportParsingTest(TestCase):
+
+    @patch.object(requests.Session, "request")
+    def test_parses_data_lazily(self, request):
+        request.return_value = json_response({"foo": "bar"})
+        json_codec = MagicMock(wraps=StdlibJSONCodec())
+        response = build_transport(json_codec=json_codec).get("/path")
+
+        self.assertEqual(b'{"foo": "bar"}', response.content, "Returns the raw content")
+        json_codec.loads.assert_not_called()
+        self.assertEqual({"foo": "bar"}, response.data, "Parses the data when accessed")
+        self.assertEqual({"foo": "bar"}, response.data, "Memoizes the parsed data")
+        json_codec.loads.assert_called_once_with(b'{"foo": "bar"}')
+
+    @patch.object(requests.Session, "request")
+    def test_invalid_json(self, request):
+        request.return_value = mock_response(headers={"Content-Type": "application/json"}, content=b"{invalid")
+        response = build_transport(service_name="a-service").get("/path")
+
+        with self.assertRaises(APIError) as cm:
+            response.data
+        self.assertEqual("a-service", cm.exception.service_name, "Sets the service name")
+        self.assertEqual("/path", cm.exception.source, "Sets the error source")
+
+    @patch.object(requests.Session, "request")
+    def test_error_response_content(self, request):
+        request.return_value = requests.Response()
+        request.return_value.status_code = 404
+        request.return_value.headers["Content-Type"] = "application/json"
+        request.return_value._content = b'{"error": "not found"}'
+
+        with self.assertRaises(NotFoundError) as cm:
+            build_transport().get("/path")
+        self.assertEqual(b'{"error": "not found"}', cm.exception.content, "Keeps the raw error content")
+        self.assertEqual({"error": "not found"}, cm.exception.response, "Parses the error content when accessed")
+
+class RequestsShuttleTransportJSONCodecTest(TestCase):
+
+    @patch.object(requests.Session, "request")
+    def test_encodes_json_body(self, request):
+        request.return_value = json_response({})
+        build_transport().post("/path", data={"foo": "bar"})
+
+        self.assertEqual(b'{"foo": "bar"}', request.call_args.kwargs["data"], "Encodes the body")
+        self.assertEqual("application/json", request.call_args.kwargs["headers"]["Content-Type"], "Sets the content type")
+
+    @patch.object(requests.Session, "request")
+    def test_keeps_content_type_header(self, request):
+        request.return_value = json_response({})
+        build_transport().post("/path", data={"foo": "bar"}, headers={"content-type": "application/vnd.api+json"})
+
+        self.assertEqual(
+            {"content-type": "application/vnd.api+json"},
+            request.call_args.kwargs["headers"],
+            "Doesn't override the content type header",
+        )
+
+    @patch.object(requests.Session, "request")
+    def test_custom_codec(self, request):
+        request.return_value = json_response({"foo": "bar"})
+        json_codec = MagicMock()
+        json_codec.dumps.return_value = b"encoded"
+        json_codec.loads.return_value = "decoded"
+        response = build_transport(json_codec=json_codec).post("/path", data={"foo": "bar"})
+
+        self.assertEqual(b"encoded", request.call_args.kwargs["data"], "Encodes the body with the codec")
+        self.assertEqual("decoded", response.data, "Decodes the response with the codec")
+
+    def test_codecs(self):
+        for json_codec in [StdlibJSONCodec(), OrjsonJSONCodec()]:
+            data = {"foo": ["bar", 1, 2.5, None, True], "unicode": "é"}
+            self.assertEqual(data, json_codec.loads(json_codec.dumps(data)), "Encodes and decodes JSON")
+            self.assertIsInstance(json_codec.dumps(data), bytes, "Encodes to bytes")
+            self.assertEqual({"1": "a"}, json_codec.loads(json_codec.dumps({1: "a"})), "Encodes non-string keys")
+            self.assertEqual([2 ** 70], json_codec.loads(json_codec.dumps([2 ** 70])), "Encodes integers beyond 64 bits")
+
+    @patch.object(requests.Session, "request")
+    def test_default_codec(self, request):
+        request.return_value = json_response({"id": 123456789012345678901234567890})
+        transport = build_transport()
+        self.assertIsInstance(transport.json_codec, StdlibJSONCodec, "Doesn't change the wire format when orjson is installed")
+
+        response = transport.post("/path", data={1: "a", "big": 2 ** 70})
+        self.assertEqual(b'{"1": "a", "big": 1180591620717411303424}', request.call_args.kwargs["data"], "Encodes like requests")
+        self.assertEqual({"id": 123456789012345678901234567890}, response.data, "Decodes large integers exactly")
+
+        with self.assertRaises(APIError) as context:
+            transport.post("/path", data={"nan": float("nan")})
+        self.assertEqual("/path", context.exception.source, "Doesn't send NaN, which isn't valid JSON")
@@ -0,0 +1,131 @@
+import requests
+import time
+
+from email.utils import formatdate
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from hubble_shuttle.exceptions import ConflictError, HTTPServerError, NotFoundError
+from hubble_shuttle.http import RequestsShuttleTransport
+from hubble_shuttle.retry import RetryPolicy, parse_retry_after
+from hubble_shuttle.tests.helpers import SERVICE_NAME, http_error, mock_response, network_error
+
+
+@patch("time.sleep")
+class RetryPolicyTest(TestCase):
+
+    def test_retries_transient_errors(self, sleep):
+        policy = RetryPolicy(max_attempts=3)
+        function = MagicMock(side_effect=[network_error(), http_error(HTTPServerError, 503), "response"])
+
+        self.assertEqual("response", policy.call("get", function), "Returns the successful response")
+        self.assertEqual(3, function.call_count, "Retries the request")
+        self.assertEqual(2, sleep.call_count, "Waits between attempts")
+
+    def test_max_attempts(self, sleep):
+        policy = RetryPolicy(max_attempts=2)
+        errors = [http_error(HTTPServerError, 502), http_error(HTTPServerError, 504)]
+        function = MagicMock(side_effect=errors)
+
+        with self.assertRaises(HTTPServerError) as cm:
+            policy.call("get", function)
+        self.assertIs(errors[1], cm.exception, "Raises the error of the last attempt")
+
+    def test_does_not_retry_other_errors(self, sleep):
+        policy = RetryPolicy()
+        for error in [http_error(NotFoundError, 404), http_error(ConflictError, 409), ValueError()]:
+            function = MagicMock(side_effect=error)
+            with self.assertRaises(type(error)):
+                policy.call("get", function)
+            self.assertEqual(1, function.call_count, "Doesn't retry {}".format(type(error).__name__))
+
+    def test_only_retries_idempotent_methods(self, sleep):
+        function = MagicMock(side_effect=[http_error(HTTPServerError, 503), "response"])
+        with self.assertRaises(HTTPServerError):
+            RetryPolicy().call("post", function)
+
+        function = MagicMock(side_effect=[http_error(HTTPServerError, 503), "response"])
+        self.assertEqual("response", RetryPolicy(methods=["POST"]).call("post", function), "Retries the configured methods")
+
+    def test_backoff(self, sleep):
+        policy = RetryPolicy(max_attempts=10, backoff_factor=1, max_backoff=5)
+        with patch("random.uniform", side_effect=lambda low, high: high):
+            delays = [policy.retry_delay("get", network_error(), attempt, 0) for attempt in range(1, 6)]
+        self.assertEqual([1, 2, 4, 5, 5], delays, "Uses capped exponential backoff")
+
+        for attempt in range(1, 6):
+            delay = policy.retry_delay("get", network_error(), attempt, 0)
+            self.assertTrue(0 <= delay <= min(5, 2 ** (attempt - 1)), "Uses full jitter")
+
+    def test_retry_after(self, sleep):
+        policy = RetryPolicy(backoff_factor=0)
+        error = http_error(HTTPServerError, 503, {"Retry-After": "3"})
+        self.assertEqual(3, policy.retry_delay("get", error, 1, 0), "Waits for the Retry-After delay")
+
+    def test_max_retry_after(self, sleep):
+        error = http_error(HTTPServerError, 503, {"Retry-After": "3600"})
+        self.assertIsNone(RetryPolicy().retry_delay("get", error, 1, 0), "Doesn't wait longer than max_backoff")
+        self.assertEqual(3600, RetryPolicy(max_retry_after=3600).retry_delay("get", error, 1, 0))
+
+    def test_total_timeout(self, sleep):
+        policy = RetryPolicy(max_attempts=10, backoff_factor=0, total_timeout=5)
+        self.assertEqual(0, policy.retry_delay("get", network_error(), 1, 4), "Retries within the time budget")
+        error = http_error(HTTPServerError, 503, {"Retry-After": "3"})
+        self.assertIsNone(policy.retry_delay("get", error, 1, 4), "Doesn't retry past the time budget")
+
+
+class ParseRetryAfterTest(TestCase):
+
+    def test_parse(self):
+        self.assertEqual(120, parse_retry_after("120"), "Parses a number of seconds")
+        self.assertAlmostEqual(60, parse_retry_after(formatdate(time.time() + 60, usegmt=True)), delta=2)
+        self.assertEqual(0, parse_retry_after(formatdate(time.time() - 60, usegmt=True)), "Doesn't return negative delays")
+        self.assertIsNone(parse_retry_after("invalid"), "Ignores invalid values")
+        self.assertIsNone(parse_retry_after(None), "Ignores missing values")
+
+
+class AsyncRetryPolicyTest(IsolatedAsyncioTestCase):
+
+    @patch("asyncio.sleep", new_callable=AsyncMock)
+    async def test_retries_transient_errors(self, sleep):
+        function = AsyncMock(side_effect=[http_error(HTTPServerError, 429), "response"])
+        self.assertEqual("response", await RetryPolicy().call_async("get", function), "Returns the successful response")
+        self.assertEqual(1, sleep.await_count, "Waits between attempts")
+
+
+@patch("time.sleep")
+class RequestsShuttleTransportRetryTest(TestCase):
+
+    @patch.object(requests.Session, "request")
+    def test_retries_requests(self, request, sleep):
+        request.side_effect = [
+            requests.exceptions.ConnectionError(),
+            mock_response(503, {"Retry-After": "1"}),
+            mock_response(200),
+        ]
+        transport = RequestsShuttleTransport(
+            api_endpoint = "http://host",
+            headers = {},
+            query = {},
+            request_content_type = "application/json",
+            retry_policy = RetryPolicy(max_attempts=3),
+        )
+
+        self.assertEqual(200, transport.get("/path").status_code, "Returns the successful response")
+        self.assertEqual(3, request.call_count, "Retries the request")
+        self.assertGreaterEqual(sleep.call_args_list[1].args[0], 1, "Honours the Retry-After header")
+
+    @patch.object(requests.Session, "request")
+    def test_maps_last_error(self, request, sleep):
+        request.side_effect = [mock_response(503), mock_response(500)]
+        transport = RequestsShuttleTransport(
+            api_endpoint = "http://host",
+            headers = {},
+            query = {},
+            request_content_type = "application/json",
+            retry_policy = RetryPolicy(max_attempts=2, status_codes=[500, 503]),
+        )
+
+        with self.assertRaises(HTTPServerError) as cm:
+            transport.get("/path")
+        self.assertEqual(500, cm.exception.internal_status_code, "Raises the mapped error of the last attempt")
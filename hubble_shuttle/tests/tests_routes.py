@@ -0,0 +1,81 @@
+from unittest import IsolatedAsyncioTestCase, TestCase
+from urllib.parse import urlsplit
+
+import hubble_shuttle
+from hubble_shuttle import AsyncShuttleAPI, ShuttleAPI
+from hubble_shuttle.instrumentation import Instrumentation
+from hubble_shuttle.rate_limit import Rate, RateLimiter
+from hubble_shuttle.routes import compile_route, join_url
+
+
+class ShuttleAPITestClient(ShuttleAPI):
+    api_endpoint = "http://test_http_server/"
+
+
+class AsyncShuttleAPITestClient(AsyncShuttleAPI):
+    api_endpoint = "http://test_http_server/"
+
+
+class RecordingInstrumentation(Instrumentation):
+
+    def __init__(self):
+        self.events = []
+
+    def on_response(self, event, response):
+        self.events.append(event)
+
+
+class RouteTest(TestCase):
+
+    def test_format(self):
+        route = compile_route("/users/{user_id}/plans/{plan_id}")
+        self.assertEqual("/users/1/plans/a%20b%2Fc", route.format({"user_id": 1, "plan_id": "a b/c"}), "Encodes the path parameters")
+        self.assertEqual("/users/{id}", compile_route("/users/{{id}}").format({}), "Supports escaped braces")
+
+    def test_missing_path_param(self):
+        with self.assertRaises(ValueError):
+            compile_route("/users/{id}").format({})
+
+    def test_compiled_once(self):
+        self.assertIs(compile_route("/users/{id}"), compile_route("/users/{id}"), "Caches the compiled routes")
+
+    def test_join_url(self):
+        self.assertEqual("http://host/api/users", join_url("http://host/api/", "//users"), "Joins relative paths to the endpoint")
+        self.assertEqual("http://other/users", join_url("http://host/api/", "http://other/users"), "Keeps absolute URLs")
+
+
+class ShuttleAPIRoutesTest(TestCase):
+
+    def test_path_params(self):
+        hooks = RecordingInstrumentation()
+
+        class RouteClient(ShuttleAPITestClient):
+            instrumentation = [hooks]
+
+        response = RouteClient().http_get("/anything/{id}", path_params={"id": "a b"}, query={"page": "2"})
+        self.assertEqual("/anything/a%20b", urlsplit(response.data["url"]).path, "Builds the URL from the template")
+        self.assertEqual({"page": "2"}, response.data["args"], "Sends the query parameters")
+        self.assertEqual("/anything/{id}", hooks.events[0].path, "Uses the route template as a label")
+        self.assertEqual("/anything/a%20b", hooks.events[0].url, "Records the URL")
+
+    def test_error_source(self):
+        with self.assertRaises(hubble_shuttle.exceptions.NotFoundError) as cm:
+            ShuttleAPITestClient().http_get("/status/{status}", path_params={"status": 404})
+        self.assertEqual("/status/404", cm.exception.source, "Sets the error source")
+
+    def test_rate_limit_route(self):
+        class RouteClient(ShuttleAPITestClient):
+            rate_limiter = RateLimiter(100, endpoints={r"^/anything/\{id\}$": Rate(1, period=60)}, block=False)
+
+        client = RouteClient()
+        client.http_get("/anything/{id}", path_params={"id": 1})
+        with self.assertRaises(hubble_shuttle.exceptions.RateLimitExceededError):
+            client.http_get("/anything/{id}", path_params={"id": 2})
+
+
+class AsyncShuttleAPIRoutesTest(IsolatedAsyncioTestCase):
+
+    async def test_path_params(self):
+        async with AsyncShuttleAPITestClient() as client:
+            response = await client.http_post("/anything/{id}", path_params={"id": 3}, data={"a": "b"})
+        self.assertEqual("/anything/3", urlsplit(response.data["url"]).path, "Builds the URL from the template")
@@ -700,3 +700,31 @@ class ShuttleAPITest(TestCase):
         with self.assertRaises(TypeError):
             ShuttleAPITestClient().http_delete("/delete", foo="bar")
 
+
+    def test_batch_requests(self):
+        responses = ShuttleAPITestClient().http_batch([
+            "/get?id=1",
+            {"url": "/get", "query": {"id": "2"}},
+            {"method": "post", "url": "/post", "content_type": "application/json", "data": {"id": "3"}},
+        ])
+        self.assertEqual("1", responses[0].data['args']['id'], "Returns the results in order")
+        self.assertEqual("2", responses[1].data['args']['id'], "Passes the request arguments")
+        self.assertEqual({"id": "3"}, responses[2].data['json'], "Uses the request method")
+
+    def test_batch_requests_errors(self):
+        client = ShuttleAPITestClient()
+        responses = client.http_batch(["/status/404", "/status/200", "/status/500"], concurrency=2)
+        self.assertIsInstance(responses[0], hubble_shuttle.exceptions.NotFoundError, "Returns the mapped HTTP error")
+        self.assertEqual(200, responses[1].status_code, "Returns the successful responses")
+        self.assertIsInstance(responses[2], hubble_shuttle.exceptions.InternalServerError, "Returns the mapped HTTP error")
+
+    def test_batch_requests_timeout(self):
+        responses = ShuttleAPITestClient().http_batch(["/status/200", "/delay/2"], timeout=1)
+        self.assertEqual(200, responses[0].status_code, "Returns the completed responses")
+        self.assertIsInstance(responses[1], hubble_shuttle.exceptions.DeadlineExceededError, "Returns an error for unfinished requests")
+        self.assertEqual("/delay/2", responses[1].source, "Sets the error source")
+
+    def test_batch_requests_timeout_queued(self):
+        responses = ShuttleAPITestClient().http_batch(["/delay/2"] * 3, concurrency=1, timeout=0.5)
+        for response in responses:
+            self.assertIsInstance(response, hubble_shuttle.exceptions.DeadlineExceededError, "Returns an error for requests still queued")
@@ -0,0 +1,162 @@
+import asyncio
+import requests
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import MagicMock, patch
+
+from requests.structures import CaseInsensitiveDict
+
+from hubble_shuttle.http import RequestsShuttleTransport
+from hubble_shuttle.singleflight import AsyncSingleFlight, SingleFlight
+
+def run_concurrently(count, function):
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        futures = [executor.submit(function) for _ in range(count)]
+    return futures
+
+class SingleFlightTest(TestCase):
+
+    def test_coalesces_concurrent_calls(self):
+        single_flight = SingleFlight()
+        started = threading.Barrier(5)
+        release = threading.Event()
+        calls = []
+
+        def call():
+            calls.append(1)
+            release.wait()
+            return {"id": 1}
+
+        def coalesced_call():
+            started.wait()
+            threading.Timer(0.1, release.set).start()
+            return single_flight.do("key", call)
+
+        futures = run_concurrently(5, coalesced_call)
+
+        self.assertEqual(1, len(calls), "Only runs the call once")
+        results = [future.result() for future in futures]
+        self.assertTrue(all(result is results[0] for result in results), "Shares the result")
+
+    def test_shares_errors(self):
+        single_flight = SingleFlight()
+        started = threading.Barrier(3)
+
+        def call():
+            raise ValueError("error")
+
+        def coalesced_call():
+            started.wait()
+            return single_flight.do("key", call)
+
+        futures = run_concurrently(3, coalesced_call)
+
+        for future in futures:
+            self.assertIsInstance(future.exception(), ValueError, "Raises the error to all callers")
+
+    def test_does_not_coalesce_sequential_calls(self):
+        single_flight = SingleFlight()
+        call = MagicMock(return_value=1)
+        single_flight.do("key", call)
+        single_flight.do("key", call)
+        self.assertEqual(2, call.call_count, "Runs the call again once finished")
+
+class AsyncSingleFlightTest(IsolatedAsyncioTestCase):
+
+    async def test_coalesces_concurrent_calls(self):
+        single_flight = AsyncSingleFlight()
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"id": 1}
+
+        results = await asyncio.gather(*[single_flight.do("key", call) for _ in range(5)])
+
+        self.assertEqual(1, len(calls), "Only runs the call once")
+        self.assertTrue(all(result is results[0] for result in results), "Shares the result")
+
+    async def test_caller_cancellation(self):
+        single_flight = AsyncSingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.01)
+            return 1
+
+        leader = asyncio.ensure_future(single_flight.do("key", call))
+        follower = asyncio.ensure_future(single_flight.do("key", call))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        self.assertEqual(1, await follower, "Keeps running the call for the other callers")
+
+class RequestsShuttleTransportCoalescingTest(TestCase):
+
+    @patch.object(requests.Session, "request")
+    def test_coalesces_get_requests(self, request):
+        started = threading.Barrier(5)
+
+        def send_request(*args, **kwargs):
+            threading.Event().wait(0.1)
+            response = MagicMock()
+            response.status_code = 200
+            response.headers = CaseInsensitiveDict({"Content-Type": "application/json"})
+            response.content = b'{"id": 1}'
+            return response
+
+        request.side_effect = send_request
+        transport = RequestsShuttleTransport(
+            api_endpoint = "http://host",
+            headers = {},
+            query = {},
+            request_content_type = "application/json",
+            coalesce_requests = True,
+        )
+
+        def get():
+            started.wait()
+            return transport.get("/plans")
+
+        futures = run_concurrently(5, get)
+
+        self.assertEqual(1, request.call_count, "Only sends the request once")
+        self.assertEqual({"id": 1}, futures[0].result().data, "Returns the response")
+
+    @patch.object(requests.Session, "request")
+    def test_does_not_coalesce_requests_of_other_transports(self, request):
+        started = threading.Barrier(2)
+
+        def send_request(*args, **kwargs):
+            threading.Event().wait(0.1)
+            response = MagicMock()
+            response.status_code = 200
+            response.headers = CaseInsensitiveDict({"Content-Type": "application/json"})
+            response.content = b'{"id": 1}'
+            return response
+
+        request.side_effect = send_request
+        transports = [
+            RequestsShuttleTransport(
+                api_endpoint = "http://host",
+                headers = {},
+                query = {},
+                request_content_type = "application/json",
+                coalesce_requests = True,
+                decoders = decoders,
+            )
+            for decoders in ({}, {"application/json": lambda content, media_type: content})
+        ]
+
+        def get(transport):
+            started.wait()
+            return transport.get("/plans")
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            responses = list(executor.map(get, transports))
+
+        self.assertEqual(2, request.call_count, "Sends the request of each transport")
+        self.assertEqual({"id": 1}, responses[0].data)
+        self.assertEqual(b'{"id": 1}', responses[1].data, "Decodes the response with the decoders of the transport")
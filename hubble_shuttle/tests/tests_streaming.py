@@ -0,0 +1,112 @@
+import json
+
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+import hubble_shuttle
+from hubble_shuttle import AsyncShuttleAPI, ShuttleAPI
+from hubble_shuttle.streaming import JSONArrayDecoder, NDJSONDecoder
+
+
+class ShuttleAPITestClient(ShuttleAPI):
+    api_endpoint = "http://test_http_server/"
+
+
+class AsyncShuttleAPITestClient(AsyncShuttleAPI):
+    api_endpoint = "http://test_http_server/"
+
+
+def decode_in_chunks(decoder, content, chunk_size):
+    items = []
+    for position in range(0, len(content), chunk_size):
+        items.extend(decoder.feed(content[position:position + chunk_size]))
+    items.extend(decoder.close())
+    return items
+
+
+class JSONArrayDecoderTest(TestCase):
+
+    def test_decode(self):
+        data = [
+            {"id": 1, "name": "a \"quoted\" [name], with {braces}", "tags": ["x", "y"]},
+            [1, [2, [3]]],
+            "back\\slash\\",
+            12.5,
+            None,
+            {},
+            [],
+        ]
+        content = json.dumps(data, indent=2).encode()
+
+        for chunk_size in [1, 2, 3, 7, 64, len(content)]:
+            self.assertEqual(
+                data,
+                decode_in_chunks(JSONArrayDecoder(json.loads), content, chunk_size),
+                "Decodes the items whatever the chunk size ({})".format(chunk_size),
+            )
+
+    def test_decode_empty_array(self):
+        self.assertEqual([], decode_in_chunks(JSONArrayDecoder(json.loads), b" [ ] ", 1), "Decodes an empty array")
+
+    def test_only_buffers_current_item(self):
+        decoder = JSONArrayDecoder(json.loads)
+        decoder.feed(b'[{"id": 1}, {"id": 2}, {"id"')
+        self.assertEqual(b' {"id"', bytes(decoder._buffer), "Discards the decoded items")
+
+    def test_invalid_content(self):
+        with self.assertRaises(ValueError):
+            JSONArrayDecoder(json.loads).feed(b'{"id": 1}')
+        with self.assertRaises(ValueError):
+            decode_in_chunks(JSONArrayDecoder(json.loads), b'[{"id": 1}', 4)
+        with self.assertRaises(ValueError):
+            decode_in_chunks(JSONArrayDecoder(json.loads), b'[1,,2]', 4)
+
+
+class NDJSONDecoderTest(TestCase):
+
+    def test_decode(self):
+        content = b'{"id": 1}\n\n{"id": 2}\r\n{"id": 3}'
+        for chunk_size in [1, 5, len(content)]:
+            self.assertEqual(
+                [{"id": 1}, {"id": 2}, {"id": 3}],
+                decode_in_chunks(NDJSONDecoder(json.loads), content, chunk_size),
+                "Decodes the records whatever the chunk size ({})".format(chunk_size),
+            )
+
+
+class ShuttleAPIStreamingTest(TestCase):
+
+    def test_stream_bytes(self):
+        with ShuttleAPITestClient().http_get("/stream-bytes/10000", query={"chunk_size": 100}, stream=True) as response:
+            self.assertEqual(200, response.status_code, "Returns the HTTP status code")
+            chunks = list(response.iter_bytes(chunk_size=1024))
+        self.assertEqual(10000, sum(len(chunk) for chunk in chunks), "Returns the whole body")
+
+    def test_stream_ndjson(self):
+        response = ShuttleAPITestClient().http_get("/stream/5", stream=True)
+        records = list(response.iter_ndjson())
+        self.assertEqual([0, 1, 2, 3, 4], [record["id"] for record in records], "Decodes each record")
+
+    def test_stream_http_error(self):
+        with self.assertRaises(hubble_shuttle.exceptions.NotFoundError) as cm:
+            ShuttleAPITestClient().http_get("/status/404", stream=True)
+        self.assertEqual("/status/404", cm.exception.source, "Sets the error source")
+
+    def test_stream_invalid_content(self):
+        response = ShuttleAPITestClient().http_get("/get", stream=True)
+        with self.assertRaises(hubble_shuttle.exceptions.APIError) as cm:
+            list(response.iter_json_array())
+        self.assertIsInstance(cm.exception.original_error, ValueError, "Raises an APIError for invalid content")
+
+
+class AsyncShuttleAPIStreamingTest(IsolatedAsyncioTestCase):
+
+    async def test_stream_ndjson(self):
+        async with AsyncShuttleAPITestClient() as client:
+            response = await client.http_get("/stream/5", stream=True)
+            records = [record async for record in response.iter_ndjson(chunk_size=16)]
+        self.assertEqual([0, 1, 2, 3, 4], [record["id"] for record in records], "Decodes each record")
+
+    async def test_stream_http_error(self):
+        async with AsyncShuttleAPITestClient() as client:
+            with self.assertRaises(hubble_shuttle.exceptions.NotFoundError):
+                await client.http_get("/status/404", stream=True)